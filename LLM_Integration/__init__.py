@@ -1,4 +1,25 @@
-from .ollama_parser import OllamaParser
-from .adapter import BikeDataEnricher
+import importlib
 
-__version__ = "0.1.0" 
\ No newline at end of file
+__version__ = "0.1.0"
+
+# Submodules are imported on first attribute access (PEP 562), so importing the
+# package stays cheap until the parser or the enricher is actually used
+_LAZY_ATTRIBUTES = {
+    "OllamaParser": ".ollama_parser",
+    "BikeDataEnricher": ".adapter",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
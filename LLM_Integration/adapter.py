@@ -1,27 +1,87 @@
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, Awaitable, List, Optional, Callable, Tuple, TypeVar
 from .ollama_parser import OllamaParser
+from .result_cache import DEFAULT_CACHE_PATH
+from .rules import extract_fields, merge_llm_fields
+import asyncio
+import concurrent.futures
+import hashlib
 import logging
 import json
 from pathlib import Path
-import pandas as pd
 import sys
 import os
+import time
 from dataclasses import asdict
 
 # Add parent directory to path to import OlxGravelScraper
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from olx_gravel_scraper import GravelBike, OlxGravelScraper
+from storage import BikeStorage
+from snapshots import atomic_open
 
 logger = logging.getLogger("llm_adapter")
 
+# Enrichment modes: three separate LLM calls per bike or a single combined call
+PIPELINE_MODE = "pipeline"
+COMBINED_MODE = "combined"
+DEFAULT_MODE = os.environ.get("LLM_ENRICHMENT_MODE", PIPELINE_MODE)
+# Rule-based extraction of parsed details (pipeline mode), disabled with LLM_RULES=0
+DEFAULT_USE_RULES = os.environ.get("LLM_RULES", "1") != "0"
+
+T = TypeVar("T")
+
+
+def _run_coroutine(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code.
+    
+    Uses a separate thread with its own event loop when called from inside a
+    running loop (e.g. from an async CLI command), where `asyncio.run` is not allowed.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+def analysis_fingerprint(bike: Dict[str, Any], prompt_version: str = OllamaParser.PROMPT_VERSION) -> str:
+    """
+    Fingerprint of the analysis inputs of a bike: URL, a hash of the title, description,
+    parameters and price, and the prompt version. A stored analysis with the same
+    fingerprint is still valid and the bike does not need to be analyzed again; a price
+    change alone invalidates it, because the value analysis depends on the price.
+    """
+    inputs = json.dumps([bike.get("title"), bike.get("description"), bike.get("parameters"), bike.get("price")],
+                        ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha256(inputs.encode("utf-8")).hexdigest()
+    return f"{bike.get('url')}|{digest}|{prompt_version}"
+
+
+def is_analysis_failed(ai_analysis: Optional[Dict[str, Any]]) -> bool:
+    """True if the analysis is missing or any of its sections holds an error (it should be retried)."""
+    if not ai_analysis or "error" in ai_analysis:
+        return True
+    return any(isinstance(section, dict) and "error" in section for section in ai_analysis.values())
+
+
 class BikeDataEnricher:
     """
     Adapter class that connects the OlxGravelScraper with OllamaParser
     to enrich bike data with AI analysis.
     """
     
-    def __init__(self, ollama_url: str = "http://localhost:11434"):
-        self.parser = OllamaParser(ollama_url=ollama_url)
+    def __init__(self, ollama_url: str = "http://localhost:11434", mode: str = DEFAULT_MODE,
+                 use_rules: bool = DEFAULT_USE_RULES, cache_path: Optional[str] = DEFAULT_CACHE_PATH):
+        if mode not in (PIPELINE_MODE, COMBINED_MODE):
+            raise ValueError(f"Unknown enrichment mode: {mode}")
+        # cache_path: persistent LLM result cache (None disables it)
+        self.parser = OllamaParser(ollama_url=ollama_url, cache_path=cache_path)
+        # "combined" gets parsed details, category and value in one generation per bike
+        self.mode = mode
+        # Fill parsed details from structured data first and ask the LLM only for missing fields
+        self.use_rules = use_rules
+        self.rule_stats = {"rules": 0, "lists": 0, "partial": 0, "llm": 0}
         self.progress_callback = None
         
     def set_progress_callback(self, callback: Callable[[int, int, str], None]):
@@ -33,6 +93,40 @@ class BikeDataEnricher:
         """
         self.progress_callback = callback
         
+    def run_summary(self) -> Dict[str, Any]:
+        """
+        Counters of this enricher's runs: LLM usage, cache hits, rule decisions and model tiers.
+        
+        Returns:
+            Dictionary with `usage` (generations, tokens, prompt/generation time, retries),
+            `cache` (memory/disk hits and misses), `rules` (parsing decisions) and `tiers`
+            (per-model calls and latency, per-task escalations and their reasons)
+        """
+        return {
+            "usage": self.parser.usage_snapshot(),
+            "cache": self.parser.cache_counters(),
+            "rules": dict(self.rule_stats),
+            "tiers": self.parser.tier_stats.snapshot(),
+        }
+
+    def log_run_summary(self) -> None:
+        """Log the counters of `run_summary()` so the tier policy and prompt budgets can be tuned."""
+        summary = self.run_summary()
+        usage, cache = summary["usage"], summary["cache"]
+        logger.info(f"LLM usage: {usage['requests']} generations ({usage['estimated']} estimated), "
+                    f"{usage['prompt_tokens']} prompt tokens in {usage['prompt_seconds']:.1f}s, "
+                    f"{usage['completion_tokens']} completion tokens in {usage['generation_seconds']:.1f}s, "
+                    f"{usage['retries']} retries, {usage['aborted']} aborted, {usage['early_stops']} early stops")
+        logger.info(f"LLM cache: memory {cache['memory_hits']} hits / {cache['memory_misses']} misses, "
+                    f"disk {cache['disk_hits']} hits / {cache['disk_misses']} misses; rules: {summary['rules']}")
+        for model, stats in summary["tiers"]["models"].items():
+            logger.info(f"Model {model}: {stats['calls']} calls ({stats['failed']} failed), "
+                        f"avg {stats['avg_seconds']:.2f}s, p50 {stats['p50_seconds']:.2f}s, "
+                        f"p90 {stats['p90_seconds']:.2f}s, p99 {stats['p99_seconds']:.2f}s")
+        for kind, stats in summary["tiers"]["tasks"].items():
+            logger.info(f"Task {kind}: {stats['requests']} requests, {stats['escalated']} escalated, "
+                        f"answered by tier {stats['answered_by_tier']}, reasons {stats['reasons']}")
+
     def _report_progress(self, current: int, total: int, status: str):
         """
         Report progress through the callback if set.
@@ -55,15 +149,71 @@ class BikeDataEnricher:
         Returns:
             List of enriched bike data dictionaries
         """
-        enriched_bikes = []
+        return _run_coroutine(self.enrich_bikes_async(bikes))
+    
+    async def enrich_bikes_async(self, bikes: List[GravelBike],
+                                 on_result: Optional[Callable[[GravelBike, Dict[str, Any]], None]] = None,
+                                 max_in_flight: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Enrich bikes concurrently, keeping up to `max_in_flight` LLM requests in flight.
+        
+        Each worker takes the next bike and runs its analysis steps, so bikes finish
+        roughly in input order and results can be saved while the run continues.
+        Progress is reported through the progress callback as bikes complete.
+        
+        `on_result` and the progress callback run in one background thread, in the
+        order bikes complete: they may block on I/O (database writes, the job store)
+        without stalling the streamed generations on the event loop.
         
-        for bike in bikes:
-            enriched_bike = self._enrich_bike(bike)
-            enriched_bikes.append(enriched_bike)
+        Args:
+            bikes: List of GravelBike objects
+            on_result: Optional callback called with each bike and its enriched data as soon as it is ready
+            max_in_flight: Number of concurrent requests (default: OllamaParser.MAX_IN_FLIGHT,
+                set from OLLAMA_NUM_PARALLEL to match the server's parallel slots)
             
-        return enriched_bikes
+        Returns:
+            List of enriched bike data dictionaries in the same order as `bikes`
+        """
+        total_bikes = len(bikes)
+        slots = max_in_flight or self.parser.MAX_IN_FLIGHT
+        results: List[Optional[Dict[str, Any]]] = [None] * total_bikes
+        queue: "asyncio.Queue[int]" = asyncio.Queue()
+        for index in range(total_bikes):
+            queue.put_nowait(index)
+        completed = 0
+        
+        self._report_progress(0, total_bikes, "Rozpoczynam analizę rowerów...")
+        
+        loop = asyncio.get_running_loop()
+        callback_runs: List[asyncio.Future] = []
+        
+        def finish(bike: GravelBike, enriched_bike: Dict[str, Any], done: int):
+            if on_result is not None:
+                on_result(bike, enriched_bike)
+            self._report_progress(done, total_bikes, f"Analiza roweru {done}/{total_bikes}: {bike.title[:30]}...")
+        
+        async def worker(callbacks: concurrent.futures.Executor):
+            nonlocal completed
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                bike = bikes[index]
+                results[index] = await self._aenrich_bike(bike)
+                completed += 1
+                # The worker moves on to the next bike while the callbacks run
+                callback_runs.append(loop.run_in_executor(callbacks, finish, bike, results[index], completed))
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as callbacks:
+            async with self.parser.async_client(slots):
+                await asyncio.gather(*(worker(callbacks) for _ in range(min(slots, total_bikes))))
+            await asyncio.gather(*callback_runs)
+        
+        self._report_progress(total_bikes, total_bikes, "Zakończono analizę wszystkich rowerów")
+        return results
     
-    def _enrich_bike(self, bike: GravelBike) -> Dict[str, Any]:
+    async def _aenrich_bike(self, bike: GravelBike) -> Dict[str, Any]:
         """
         Enrich a single bike with AI analysis.
         
@@ -84,18 +234,29 @@ class BikeDataEnricher:
             bike_dict["ai_analysis"] = {"error": "No description available"}
             return bike_dict
         
-        # Parse description using LLM
+        if self.mode == COMBINED_MODE:
+            try:
+                bike_dict["ai_analysis"] = await self.parser.aanalyze_bike_combined(bike.title, bike.description)
+            except Exception as e:
+                logger.error(f"Error during AI analysis for bike {bike.title[:50]}: {str(e)}")
+                bike_dict["ai_analysis"] = {"error": f"Analysis error: {str(e)}"}
+            return bike_dict
+        
+        # Parse description (rules first, LLM only for what is missing)
         try:
-            parsed_data = self.parser.parse_bike_description(bike.description)
+            parsed_data, extraction = await self._aparse_details(bike)
             # If parsing succeeded, categorize the bike
             if "error" not in parsed_data:
-                category_data = self.parser.categorize_bike(bike.title, bike.description)
+                category_data = await self.parser.acategorize_bike(bike.title, bike.description)
                 
                 # If both succeeded, analyze value
                 if "error" not in category_data:
                     # Combine parsed data and category data for value analysis
                     combined_data = {**parsed_data, **category_data}
-                    value_data = self.parser.identify_bike_value(combined_data)
+                    if not combined_data.get("price"):
+                        # Rule-based details have no price - value the listing at its asking price
+                        combined_data["price"] = {"amount": bike.price, "currency": "PLN"}
+                    value_data = await self.parser.aidentify_bike_value(combined_data)
                     
                     # Create the full AI analysis
                     bike_dict["ai_analysis"] = {
@@ -115,6 +276,8 @@ class BikeDataEnricher:
                     "category": {"error": "Could not categorize due to parsing error"},
                     "value": {"error": "Could not analyze value due to parsing error"}
                 }
+            if extraction is not None:
+                bike_dict["ai_analysis"]["extraction"] = extraction
                 
         except Exception as e:
             logger.error(f"Error during AI analysis for bike {bike.title[:50]}: {str(e)}")
@@ -122,6 +285,41 @@ class BikeDataEnricher:
             
         return bike_dict
     
+    async def _aparse_details(self, bike: GravelBike) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Get parsed details of a bike, using the LLM only for fields the rules did not find.
+        
+        Returns:
+            Parsed details and the extraction summary (None when rules are disabled)
+        """
+        if not self.use_rules:
+            return await self.parser.aparse_bike_description(bike.description), None
+        
+        extraction = extract_fields(bike)
+        missing = extraction.missing()
+        if not missing and not extraction.needs_lists:
+            self.rule_stats["rules"] += 1
+            return extraction.parsed_details(), extraction.summary("rules")
+        
+        if not extraction.fields:
+            # Nothing found - the full parsing prompt also returns the optional fields
+            self.rule_stats["llm"] += 1
+            parsed_data = await self.parser.aparse_bike_description(bike.description)
+            return parsed_data, extraction.summary("llm", missing)
+        
+        # With every field known the shortened prompt asks only for accessories, issues and upgrades
+        source = "partial" if missing else "lists"
+        self.rule_stats[source] += 1
+        llm_result = await self.parser.aparse_missing_fields(bike.description, extraction.fields, missing)
+        if "error" in llm_result:
+            # Keep what the rules found; the error marks the analysis as failed so the
+            # next incremental run asks for the missing fields and lists again
+            logger.warning(f"LLM parsing failed for bike {bike.title[:50]}, using rule-based fields only")
+            summary = extraction.summary("rules_fallback", missing)
+            summary["error"] = llm_result["error"]
+            return extraction.parsed_details(), summary
+        return merge_llm_fields(extraction, llm_result, missing), extraction.summary(source, missing)
+    
     def analyze_raw_descriptions(self, descriptions: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         """
         Analyze a list of raw bike descriptions.
@@ -181,16 +379,20 @@ class BikeDataEnricher:
                 
         return results
     
-    def process_bikes_from_json(self, json_file_path: str, output_file_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    def process_bikes_from_json(self, json_file_path: str, output_file_path: Optional[str] = None,
+                                incremental: bool = False) -> List[Dict[str, Any]]:
         """
         Process bikes from a JSON file and save enriched data.
         
         Args:
             json_file_path: Path to JSON file with bike data
             output_file_path: Path to save enriched data (optional)
+            incremental: Reuse results from `output_file_path` for bikes whose analysis
+                fingerprint (URL, inputs hash, prompt version) did not change and analyze
+                only new, changed or previously failed bikes
             
         Returns:
-            List of enriched bike data
+            List of enriched bike data (in the order of the input file)
         """
         try:
             # Load bikes from JSON
@@ -205,28 +407,33 @@ class BikeDataEnricher:
                     bikes.append(GravelBike(**item))
                 elif isinstance(item, GravelBike):
                     bikes.append(item)
-            print(bikes_data[0])
             
-            # Report initial progress
-            total_bikes = len(bikes)
-            self._report_progress(0, total_bikes, "Rozpoczynam analizę rowerów...")
+            # Results of the previous run that are still valid, by fingerprint
+            previous: Dict[str, Dict[str, Any]] = {}
+            if incremental and output_file_path and os.path.exists(output_file_path):
+                with open(output_file_path, 'r', encoding='utf-8') as f:
+                    for enriched in json.load(f):
+                        fingerprint = enriched.get("analysis_fingerprint")
+                        if fingerprint and not is_analysis_failed(enriched.get("ai_analysis")):
+                            previous[fingerprint] = enriched
             
-            # Process each bike
-            enriched_bikes = []
-            for i, bike in enumerate(bikes):
-                # Report progress for current bike
-                self._report_progress(i, total_bikes, f"Analiza roweru {i+1}/{total_bikes}: {bike.title[:30]}...")
-                
-                # Enrich the bike
-                enriched_bike = self._enrich_bike(bike)
-                enriched_bikes.append(enriched_bike)
+            fingerprints = [analysis_fingerprint(asdict(bike)) for bike in bikes]
+            pending = [index for index, fingerprint in enumerate(fingerprints) if fingerprint not in previous]
+            if incremental:
+                logger.info(f"Incremental analysis: {len(pending)} new or changed of {len(bikes)} bikes")
             
-            # Report completion
-            self._report_progress(total_bikes, total_bikes, "Zakończono analizę wszystkich rowerów")
+            # Enrich bikes concurrently (progress is reported as bikes complete)
+            analyzed = _run_coroutine(self.enrich_bikes_async([bikes[index] for index in pending]))
+            
+            enriched_bikes = [previous.get(fingerprint) for fingerprint in fingerprints]
+            for index, enriched in zip(pending, analyzed):
+                if not is_analysis_failed(enriched["ai_analysis"]):
+                    enriched["analysis_fingerprint"] = fingerprints[index]
+                enriched_bikes[index] = enriched
             
             # Save to file if output path provided
             if output_file_path:
-                with open(output_file_path, 'w', encoding='utf-8') as f:
+                with atomic_open(output_file_path, 'w', encoding='utf-8') as f:
                     json.dump(enriched_bikes, f, ensure_ascii=False, indent=2)
             
             return enriched_bikes
@@ -237,6 +444,67 @@ class BikeDataEnricher:
             self._report_progress(0, 0, f"Błąd podczas analizy: {str(e)}")
             raise
     
+    def process_bikes_from_storage(self, storage: BikeStorage, batch_size: int = 20,
+                                   flush_interval: float = 1.0, incremental: bool = False) -> int:
+        """
+        Enrich bikes kept in the storage and save results back to it.
+        
+        In incremental mode only bikes without a valid stored analysis are sent to
+        the LLM: new bikes, bikes whose title, description or parameters changed,
+        bikes analyzed with an older prompt version and failed analyses.
+        
+        Results are written in batches (one transaction each), so readers see
+        progress without waiting for the whole run and nothing is rewritten in full.
+        A batch is also flushed once `flush_interval` seconds have passed since the
+        last save, so clients of the live feed get new results within about a second.
+        
+        Args:
+            storage: BikeStorage with scraped bikes
+            batch_size: Maximum number of results saved per transaction
+            flush_interval: Maximum time (seconds) a finished result waits in the batch
+            incremental: Skip bikes whose stored analysis fingerprint is still valid
+            
+        Returns:
+            Number of enriched bikes
+        """
+        try:
+            # Load the list up front - analysis takes long and should not keep a read transaction open
+            bikes = [GravelBike(**item) for item in storage.iter_bikes()]
+            fingerprints = {bike.url: analysis_fingerprint(asdict(bike)) for bike in bikes}
+            if incremental:
+                stored = storage.enrichment_fingerprints()
+                total = len(bikes)
+                bikes = [bike for bike in bikes if stored.get(bike.url) != fingerprints[bike.url]]
+                logger.info(f"Incremental analysis: {len(bikes)} new or changed of {total} bikes")
+            
+            batch = []
+            last_flush = time.monotonic()
+            
+            # Called in the callback thread of enrich_bikes_async - the blocking writes
+            # (BEGIN IMMEDIATE, busy timeout) do not stall generations on the event loop
+            def save_result(bike: GravelBike, enriched_bike: Dict[str, Any]):
+                nonlocal batch, last_flush
+                ai_analysis = enriched_bike["ai_analysis"]
+                fingerprint = None if is_analysis_failed(ai_analysis) else fingerprints[bike.url]
+                batch.append((bike.url, ai_analysis, fingerprint))
+                if len(batch) >= batch_size or time.monotonic() - last_flush >= flush_interval:
+                    storage.save_enrichments(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+            
+            enriched_bikes = _run_coroutine(self.enrich_bikes_async(bikes, on_result=save_result))
+            
+            if batch:
+                storage.save_enrichments(batch)
+            
+            self.log_run_summary()
+            return len(enriched_bikes)
+        
+        except Exception as e:
+            logger.error(f"Error processing bikes from storage: {str(e)}")
+            self._report_progress(0, 0, f"Błąd podczas analizy: {str(e)}")
+            raise
+    
     def process_bikes_from_csv(self, csv_file_path: str, output_file_path: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Process bikes from a CSV file and save enriched data.
@@ -248,6 +516,9 @@ class BikeDataEnricher:
         Returns:
             List of enriched bike data
         """
+        # pandas is only needed for CSV import/export - load it on first use
+        import pandas as pd
+        
         try:
             # Load bikes from CSV
             df = pd.read_csv(csv_file_path)
@@ -273,7 +544,7 @@ class BikeDataEnricher:
             # Save to output file if specified
             if output_file_path:
                 if output_file_path.endswith('.json'):
-                    with open(output_file_path, 'w', encoding='utf-8') as f:
+                    with atomic_open(output_file_path, 'w', encoding='utf-8') as f:
                         json.dump(enriched_bikes, f, ensure_ascii=False, indent=2)
                 elif output_file_path.endswith('.csv'):
                     # Flatten the nested AI analysis for CSV format
@@ -308,8 +579,9 @@ class BikeDataEnricher:
                                 
                         flat_data.append(flat_bike)
                     
-                    # Convert to DataFrame and save as CSV
-                    pd.DataFrame(flat_data).to_csv(output_file_path, index=False)
+                    # Convert to DataFrame and save as CSV (atomically, like the JSON output)
+                    with atomic_open(output_file_path, 'w', encoding='utf-8', newline='') as f:
+                        pd.DataFrame(flat_data).to_csv(f, index=False)
                     
                 logger.info(f"Saved enriched data to {output_file_path}")
                 
@@ -18,6 +18,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from olx_gravel_scraper import OlxGravelScraper
 from LLM_Integration import BikeDataEnricher
+from LLM_Integration.result_cache import DEFAULT_CACHE_PATH, ResultCache
 
 async def scrape_and_analyze(search_query: str = "gravel", max_pages: int = 3):
     """
@@ -69,9 +70,12 @@ async def scrape_and_analyze(search_query: str = "gravel", max_pages: int = 3):
     
     return enriched_bikes
 
-async def analyze_existing_data(json_file_path: str):
+async def analyze_existing_data(json_file_path: str, full: bool = False):
     """
     Analyze existing bike data from a JSON file
+    
+    Unless `full` is set, only bikes that are new or changed since the previous
+    run (or whose analysis failed) are sent to the LLM.
     """
     logger.info(f"Analyzing existing data from: {json_file_path}")
     
@@ -80,7 +84,7 @@ async def analyze_existing_data(json_file_path: str):
     
     # Process the data
     output_path = f"{os.path.splitext(json_file_path)[0]}_enriched.json"
-    enriched_bikes = enricher.process_bikes_from_json(json_file_path, output_path)
+    enriched_bikes = enricher.process_bikes_from_json(json_file_path, output_path, incremental=not full)
     
     logger.info(f"Analyzed {len(enriched_bikes)} bike listings")
     logger.info(f"Saved enriched data to {output_path}")
@@ -118,6 +122,16 @@ def analyze_raw_text(title: str, description: str):
     
     return results
 
+def manage_cache(cache_path: str, prompt_version: str = None, clear: bool = False):
+    """
+    Show statistics of the persistent LLM result cache or remove stored results
+    """
+    cache = ResultCache(cache_path)
+    if prompt_version is not None or clear:
+        removed = cache.invalidate(prompt_version=prompt_version)
+        logger.info(f"Removed {removed} cached results")
+    logger.info(f"Cache stats: {cache.stats()}")
+
 if __name__ == "__main__":
     import argparse
     
@@ -132,19 +146,28 @@ if __name__ == "__main__":
     # Analyze existing data command
     analyze_parser = subparsers.add_parser("analyze", help="Analyze existing bike data from a file")
     analyze_parser.add_argument("file", type=str, help="Path to JSON file with bike data")
+    analyze_parser.add_argument("--full", action="store_true", help="Re-analyze all bikes, not only new or changed ones")
     
     # Analyze raw text command
     text_parser = subparsers.add_parser("text", help="Analyze a raw bike description")
     text_parser.add_argument("--title", type=str, required=True, help="Bike listing title")
     text_parser.add_argument("--description", type=str, required=True, help="Bike listing description")
     
+    # Persistent result cache command
+    cache_parser = subparsers.add_parser("cache", help="Show or invalidate the persistent LLM result cache")
+    cache_parser.add_argument("--path", type=str, default=DEFAULT_CACHE_PATH, help="Path to the cache database")
+    cache_parser.add_argument("--invalidate-version", type=str, help="Remove results of this prompt version")
+    cache_parser.add_argument("--clear", action="store_true", help="Remove all cached results")
+    
     args = parser.parse_args()
     
     if args.command == "scrape":
         asyncio.run(scrape_and_analyze(args.query, args.pages))
     elif args.command == "analyze":
-        asyncio.run(analyze_existing_data(args.file))
+        asyncio.run(analyze_existing_data(args.file, args.full))
     elif args.command == "text":
         analyze_raw_text(args.title, args.description)
+    elif args.command == "cache":
+        manage_cache(args.path, args.invalidate_version, args.clear)
     else:
         parser.print_help() 
\ No newline at end of file
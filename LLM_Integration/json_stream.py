@@ -0,0 +1,217 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+# Limits used to recognise generations that will not produce a usable JSON object
+MAX_OUTPUT_CHARS = 20000  # Answers are a few KB - anything longer is a runaway generation
+MAX_PREAMBLE_CHARS = 300  # Text allowed before the opening brace (e.g. a ```json fence)
+MAX_WHITESPACE_RUN = 200  # JSON mode sometimes degenerates into endless newlines
+
+# Time limits of a streamed generation (seconds)
+FIRST_TOKEN_TIMEOUT = 120  # Model loading and prompt evaluation happen before the first token
+TOKEN_STALL_TIMEOUT = 20  # Maximum gap between two chunks once tokens are flowing
+MAX_GENERATION_SECONDS = 600  # Hard cap for a single generation
+# Wait for the final `done` chunk (token counts and durations) after the object is complete.
+# In JSON mode Ollama usually ends right after the closing brace; a model that keeps going is cut off
+DONE_GRACE_SECONDS = 1
+
+_CLOSING = {"}": "{", "]": "["}
+
+
+class StreamAborted(Exception):
+    """The streamed output is malformed or the generation went over its limits."""
+
+
+class JSONStreamParser:
+    """
+    Incremental scanner that detects when the first top-level JSON object is complete.
+
+    Text is fed in chunks as the model produces it. The scanner tracks nesting
+    and string state only (no full parsing), so it can stop the generation as
+    soon as the closing brace arrives and abort on output that cannot become
+    a valid object: mismatched brackets, long prose before the object, runaway
+    whitespace or output over the size limit. `<think>` blocks of reasoning
+    models are skipped.
+    """
+
+    def __init__(self, max_chars: int = MAX_OUTPUT_CHARS, max_preamble: int = MAX_PREAMBLE_CHARS,
+                 max_whitespace_run: int = MAX_WHITESPACE_RUN):
+        self.max_chars = max_chars
+        self.max_preamble = max_preamble
+        self.max_whitespace_run = max_whitespace_run
+        self.text = ""
+        self.complete = False
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._whitespace_run = 0
+        self._in_think = False
+        self._preamble = 0
+
+    @property
+    def result(self) -> Optional[str]:
+        """Text of the complete object (None until it is complete)."""
+        if not self.complete:
+            return None
+        return self.text[self._start:self._end]
+
+    def feed(self, chunk: str) -> bool:
+        """Consume the next piece of output; returns True once the object is complete."""
+        if self.complete or not chunk:
+            return self.complete
+        self.text += chunk
+        if len(self.text) > self.max_chars:
+            raise StreamAborted(f"output exceeded {self.max_chars} characters")
+
+        text = self.text
+        while self._pos < len(text):
+            if self._start is None:
+                if not self._scan_preamble():
+                    break
+                continue
+
+            char = text[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char.isspace():
+                self._whitespace_run += 1
+                if self._whitespace_run > self.max_whitespace_run:
+                    raise StreamAborted("runaway whitespace in output")
+                continue
+            self._whitespace_run = 0
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack or self._stack.pop() != _CLOSING[char]:
+                    raise StreamAborted(f"unbalanced '{char}' in output")
+                if not self._stack:
+                    self._end = self._pos
+                    self.complete = True
+                    return True
+        return False
+
+    def _scan_preamble(self) -> bool:
+        """Advance through text before the object; returns False when more input is needed."""
+        text = self.text
+        if self._in_think:
+            end = text.find("</think>", self._pos)
+            if end == -1:
+                # Keep the tail in case the closing tag is split between chunks
+                self._pos = max(self._pos, len(text) - len("</think>"))
+                return False
+            self._pos = end + len("</think>")
+            self._in_think = False
+            return True
+
+        char = text[self._pos]
+        if char == "{":
+            self._start = self._pos
+            return True
+        if text.startswith("<think>", self._pos):
+            self._in_think = True
+            self._pos += len("<think>")
+            return True
+        if char == "<" and "<think>".startswith(text[self._pos:]):
+            # Possibly the beginning of a <think> tag - wait for more input
+            return False
+        self._pos += 1
+        if not char.isspace():
+            self._preamble += 1
+            if self._preamble > self.max_preamble:
+                raise StreamAborted("no JSON object at the start of the output")
+        return True
+
+
+class GenerationStream:
+    """
+    Consumer of an Ollama `/api/generate` NDJSON stream.
+
+    Feeds the response chunks to a `JSONStreamParser` and decides when to stop
+    reading: when the server reports `done`, when the object has been complete
+    for `DONE_GRACE_SECONDS` without the final chunk (early stop - closing the
+    connection cancels the rest of the generation), or with `StreamAborted` on
+    malformed output, an error chunk or when the generation runs over
+    `MAX_GENERATION_SECONDS`.
+
+    Only the final chunk carries token counts and durations. After an early
+    stop `usage()` estimates them: prompt tokens from `prompt_tokens` (an
+    estimate from the prompt length), prompt time as the wait for the first
+    chunk (the stream is created before the request is sent) and generation
+    time as the time until the object was complete.
+    """
+
+    def __init__(self, max_seconds: float = MAX_GENERATION_SECONDS, prompt_tokens: int = 0,
+                 done_grace: float = DONE_GRACE_SECONDS):
+        self.json = JSONStreamParser()
+        self.max_seconds = max_seconds
+        self.prompt_tokens = prompt_tokens
+        self.done_grace = done_grace
+        self.started = time.monotonic()
+        self.first_chunk_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.chunks = 0
+        self.final: Optional[Dict[str, Any]] = None
+
+    @property
+    def stopped_early(self) -> bool:
+        return self.json.complete and self.final is None
+
+    def read_timeout(self, timeout: float) -> float:
+        """Timeout of the next read: `timeout`, or what is left of the grace period once the object is complete."""
+        if self.completed_at is None:
+            return timeout
+        return max(0.0, min(timeout, self.completed_at + self.done_grace - time.monotonic()))
+
+    def feed_line(self, line: bytes) -> bool:
+        """Process one NDJSON line; returns True when reading should stop."""
+        if not line.strip():
+            return False
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise StreamAborted(f"server error: {chunk['error']}")
+        now = time.monotonic()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        self.chunks += 1
+        if self.json.feed(chunk.get("response", "")) and self.completed_at is None:
+            self.completed_at = now
+        if chunk.get("done"):
+            self.final = chunk
+            return True
+        if self.completed_at is not None:
+            return now - self.completed_at >= self.done_grace
+        if now - self.started > self.max_seconds:
+            raise StreamAborted(f"generation exceeded {self.max_seconds} s")
+        return False
+
+    def usage(self) -> Dict[str, Any]:
+        """
+        Token counts and durations (ns) like in Ollama's final chunk.
+
+        Without the final chunk the values are estimated and `estimated` is True.
+        """
+        if self.final is not None:
+            return self.final
+        first_chunk = self.first_chunk_at or time.monotonic()
+        end = self.completed_at or time.monotonic()
+        return {
+            "prompt_eval_count": self.prompt_tokens,
+            "eval_count": self.chunks,
+            "prompt_eval_duration": int((first_chunk - self.started) * 1e9),
+            "eval_duration": int(max(0.0, end - first_chunk) * 1e9),
+            "estimated": True,
+        }
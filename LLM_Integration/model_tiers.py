@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+# Model roles resolved by the parser at call time (`OllamaParser.small_llm_model` / `llm_model`)
+SMALL = "small"
+LARGE = "large"
+
+# Default tiers of every task: the small model first, the large one for escalated results.
+# Override per task with LLM_MODEL_TIERS, e.g. '{"bike_value": ["large"]}' (roles or model names)
+DEFAULT_TIERS = {
+    "bike_desc": [SMALL, LARGE],
+    "bike_desc_partial": [SMALL, LARGE],
+    "bike_cat": [SMALL, LARGE],
+    "bike_value": [SMALL, LARGE],
+    "bike_combined": [SMALL, LARGE],
+}
+
+# Results with a self-reported confidence (1-10) below this value go to the next tier
+MIN_CONFIDENCE = float(os.environ.get("LLM_ESCALATION_CONFIDENCE", 6))
+
+# Keys a result must contain and where the model reports its confidence, per task
+SCHEMAS = {
+    "bike_desc": {"keys": ("brand", "frame_material", "parameters"),
+                  "confidence": [("parameters", "confidence_score")]},
+    "bike_desc_partial": {"keys": ("parameters",),
+                          "confidence": [("parameters", "confidence_score")]},
+    "bike_cat": {"keys": ("primary_category", "subcategory", "intended_use", "price_category"),
+                 "confidence": [("confidence",)]},
+    "bike_value": {"keys": ("value_analysis", "selling_points", "concerns"),
+                   "confidence": [("confidence",)]},
+    "bike_combined": {"keys": ("parsed_details", "category", "value"),
+                      "confidence": [("parsed_details", "parameters", "confidence_score"),
+                                     ("category", "confidence"), ("value", "confidence")]},
+}
+
+# Latest call latencies kept per model for percentiles
+LATENCY_SAMPLES = 10000
+
+# Escalation reasons
+ERROR = "error"
+SCHEMA = "schema"
+LOW_CONFIDENCE = "low_confidence"
+
+
+def load_tiers(overrides: Optional[str] = None) -> Dict[str, List[str]]:
+    """Default tiers updated with a JSON mapping of task -> list of roles or model names."""
+    tiers = {kind: list(models) for kind, models in DEFAULT_TIERS.items()}
+    overrides = overrides if overrides is not None else os.environ.get("LLM_MODEL_TIERS")
+    if overrides:
+        for kind, models in json.loads(overrides).items():
+            tiers[kind] = list(models)
+    return tiers
+
+
+def _lookup(result: Dict[str, Any], path: Iterable[str]) -> Any:
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def reported_confidence(kind: str, result: Dict[str, Any]) -> Optional[float]:
+    """Lowest confidence the model reported in the result (None if it reported none)."""
+    values = []
+    for path in SCHEMAS.get(kind, {}).get("confidence", []):
+        try:
+            values.append(float(_lookup(result, path)))
+        except (TypeError, ValueError):
+            continue
+    return min(values) if values else None
+
+
+def escalation_reason(kind: str, result: Dict[str, Any], min_confidence: float = MIN_CONFIDENCE) -> Optional[str]:
+    """
+    Why a result should be passed to the next tier, or None when it is good enough.
+
+    Failed generations, results missing keys of the task schema and results with
+    a low (or unreported) confidence are escalated.
+    """
+    if not result or "error" in result:
+        return ERROR
+    schema = SCHEMAS.get(kind)
+    if schema is None:
+        return None
+    if any(key not in result for key in schema["keys"]):
+        return SCHEMA
+    confidence = reported_confidence(kind, result)
+    if confidence is None or confidence < min_confidence:
+        return LOW_CONFIDENCE
+    return None
+
+
+class TierStats:
+    """Thread-safe counters of the cascade: calls and latency per model, escalations per task."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, float]] = {}
+        self._latencies: Dict[str, deque] = {}
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+
+    def record_call(self, model: str, seconds: float, failed: bool) -> None:
+        """Record one generation of a model (cache hits are not recorded)."""
+        with self._lock:
+            stats = self._models.setdefault(model, {"calls": 0, "failed": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["failed"] += failed
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            self._latencies.setdefault(model, deque(maxlen=LATENCY_SAMPLES)).append(seconds)
+
+    def record_result(self, kind: str, tier: int, escalations: List[str]) -> None:
+        """Record a finished cascade: the tier that produced the answer and the reasons of escalations."""
+        with self._lock:
+            stats = self._tasks.setdefault(kind, {"requests": 0, "escalated": 0, "answered_by_tier": {},
+                                                  "reasons": {}})
+            stats["requests"] += 1
+            stats["escalated"] += bool(escalations)
+            stats["answered_by_tier"][tier] = stats["answered_by_tier"].get(tier, 0) + 1
+            for reason in escalations:
+                stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-model call counts and latency (mean and percentiles), per-task escalation rates."""
+        with self._lock:
+            models = {}
+            for model, stats in self._models.items():
+                latencies = sorted(self._latencies.get(model, ()))
+                models[model] = {**stats, "avg_seconds": stats["seconds"] / stats["calls"] if stats["calls"] else None}
+                for name, fraction in (("p50_seconds", 0.5), ("p90_seconds", 0.9), ("p99_seconds", 0.99)):
+                    models[model][name] = (latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+                                           if latencies else None)
+            tasks = {
+                kind: {**stats, "answered_by_tier": dict(stats["answered_by_tier"]), "reasons": dict(stats["reasons"]),
+                       "escalation_rate": stats["escalated"] / stats["requests"] if stats["requests"] else None}
+                for kind, stats in self._tasks.items()
+            }
+        return {"models": models, "tasks": tasks}
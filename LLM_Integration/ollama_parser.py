@@ -1,12 +1,27 @@
 import requests
+import aiohttp
+import asyncio
+import hashlib
+import heapq
 import json
+import sys
 import time
 import re
 import logging
-from typing import Dict, Any, List, Optional, Union
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
 import threading
 
+from .json_stream import FIRST_TOKEN_TIMEOUT, TOKEN_STALL_TIMEOUT, GenerationStream, StreamAborted
+from .prompt_budget import (DESCRIPTION_TOKEN_BUDGET, VALUE_DATA_TOKEN_BUDGET, compact_json, estimate_tokens,
+                            prepare_description)
+from .model_tiers import LARGE, SMALL, TierStats, escalation_reason, load_tiers
+from .result_cache import DEFAULT_CACHE_PATH, ResultCache
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -15,61 +30,137 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ollama_parser")
 
+def cache_key(kind: str, model: str, prompt: str, prompt_version: str = "1") -> str:
+    """Stable cache key: SHA-256 over the model, prompt template version and the full prompt.
+
+    Unlike the built-in `hash()` it is the same in every process and it covers
+    the whole prompt, so two listings only share an entry if the model would
+    see exactly the same input.
+    """
+    digest = hashlib.sha256(f"{model}\0{prompt_version}\0{prompt}".encode("utf-8")).hexdigest()
+    return f"{kind}_{digest}"
+
+
+def _estimate_size(key: str, value: Any) -> int:
+    """Approximate memory cost of a cache entry in bytes (JSON size of the value)."""
+    try:
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        size = sys.getsizeof(value)
+    return size + len(key)
+
+
+def _set_read_timeout(response: requests.Response, seconds: float) -> None:
+    """Change the read timeout of a streamed response for the following reads (if the socket is reachable)."""
+    connection = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        # Zero would switch the socket to non-blocking mode
+        sock.settimeout(max(seconds, 0.01))
+
+
 class LRUCache:
-    """Limited size cache with time expiration"""
-    def __init__(self, capacity: int = 100, ttl: int = 60):
-        self.capacity = capacity
+    """Size-limited LRU cache with time expiration.
+
+    Entries live in an OrderedDict kept in recency order, so lookups, inserts
+    and LRU evictions are O(1). Expiry times are kept in a min-heap; expired
+    entries are dropped from the top of the heap on insert (O(log n)). The
+    capacity is a budget in bytes, estimated from the JSON size of each value.
+    """
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: int = 60):
+        self.max_bytes = max_bytes
         self.ttl = ttl  # Time to live in seconds
-        self.cache = {}
-        self.timestamps = {}
+        self.cache: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
         self.lock = threading.RLock()
     
     def get(self, key: str) -> Optional[Any]:
         """Get an item from the cache if it exists and is not expired"""
         with self.lock:
-            if key not in self.cache:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
                 return None
             
-            current_time = time.time()
-            if current_time - self.timestamps[key] > self.ttl:
-                # Item expired
-                del self.cache[key]
-                del self.timestamps[key]
+            value, expires_at, _ = entry
+            if time.time() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
                 return None
             
-            # Move to front of LRU (by updating timestamp)
-            self.timestamps[key] = current_time
-            return self.cache[key]
+            # Mark as most recently used
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return value
     
     def put(self, key: str, value: Any) -> None:
-        """Put an item in the cache"""
+        """Put an item in the cache, evicting expired and least recently used entries"""
+        size = _estimate_size(key, value)
         with self.lock:
-            current_time = time.time()
-            
-            # If key exists, just update
             if key in self.cache:
-                self.cache[key] = value
-                self.timestamps[key] = current_time
+                self._remove(key)
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit
                 return
             
-            # If at capacity, remove oldest item
-            if len(self.cache) >= self.capacity:
-                oldest_key = min(self.timestamps, key=self.timestamps.get)
-                del self.cache[oldest_key]
-                del self.timestamps[oldest_key]
+            expires_at = time.time() + self.ttl
+            self.cache[key] = (value, expires_at, size)
+            self.size_bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
             
-            # Add new item
-            self.cache[key] = value
-            self.timestamps[key] = current_time
+            self._purge_expired()
+            while self.size_bytes > self.max_bytes:
+                oldest_key, (_, _, oldest_size) = self.cache.popitem(last=False)
+                self.size_bytes -= oldest_size
+                self.evictions += 1
+            
+            # Heap entries of replaced or evicted keys are dropped lazily - compact when they pile up
+            if len(self._expiry_heap) > 2 * len(self.cache) + 64:
+                self._expiry_heap = [(entry[1], k) for k, entry in self.cache.items()]
+                heapq.heapify(self._expiry_heap)
+    
+    def _remove(self, key: str) -> None:
+        _, _, size = self.cache.pop(key)
+        self.size_bytes -= size
+    
+    def _purge_expired(self) -> None:
+        now = time.time()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            entry = self.cache.get(key)
+            # Skip heap entries left behind by a replaced or evicted key
+            if entry is not None and entry[1] == expires_at:
+                self._remove(key)
+                self.expirations += 1
     
     def invalidate(self, pattern: str) -> int:
-        """Invalidate all cache entries that match a pattern"""
+        """Invalidate all cache entries that match a pattern (e.g. a key kind like "bike_desc")"""
         with self.lock:
             keys_to_delete = [k for k in self.cache.keys() if pattern in k]
             for key in keys_to_delete:
-                del self.cache[key]
-                del self.timestamps[key]
+                self._remove(key)
             return len(keys_to_delete)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.cache),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
 
 class OllamaParser:
     """
@@ -78,18 +169,47 @@ class OllamaParser:
     # Configure retry parameters
     MAX_RETRIES = 3
     RETRY_BACKOFF = [1, 3, 5]  # Seconds between retries
-    REQUEST_TIMEOUT = 10  # Seconds
+    REQUEST_TIMEOUT = 10  # Seconds (connecting and short API calls)
+    # Generations are streamed and limited by token progress instead of a fixed wall-clock timeout
+    FIRST_TOKEN_TIMEOUT = FIRST_TOKEN_TIMEOUT
+    TOKEN_STALL_TIMEOUT = TOKEN_STALL_TIMEOUT
+    CACHE_MAX_BYTES = 16 * 1024 * 1024  # In-memory result cache budget
+    # Requests kept in flight by the async client - match the Ollama server's parallel slots
+    MAX_IN_FLIGHT = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+    # Version of the prompt templates - bump it whenever a prompt changes so cached results are not reused
+    PROMPT_VERSION = "2"
     
-    def __init__(self, ollama_url="http://localhost:11434"):
+    def __init__(self, ollama_url="http://localhost:11434", cache_path: Optional[str] = DEFAULT_CACHE_PATH):
         self.ollama_url = ollama_url
-        self.llm_model = "deepseek-r1:14b"  # Primary LLM for text analysis
+        self.llm_model = os.environ.get("LLM_MODEL", "deepseek-r1:14b")  # Primary (large) LLM for text analysis
         self.fallback_llm_model = "deepseek-r1:14b"  # Fallback if primary unavailable
+        # Small fast model tried first; results it is not sure about are escalated to the large model
+        self.small_llm_model = os.environ.get("LLM_SMALL_MODEL", "qwen2.5:3b")
+        # Models tried for each task, in order (roles "small"/"large" or model names)
+        self.model_tiers = load_tiers()
+        self.tier_stats = TierStats()
         
-        # Initialize caching system
-        self.analysis_cache = LRUCache(capacity=200, ttl=600)  # 10 minute TTL
+        # Initialize caching system: a fast in-memory layer in front of the persistent one
+        # (cache_path=None disables the disk cache)
+        self.analysis_cache = LRUCache(max_bytes=self.CACHE_MAX_BYTES, ttl=600)  # 10 minute TTL
+        self.result_cache = ResultCache(cache_path) if cache_path else None
         
         # Session for connection pooling
         self.session = requests.Session()
+        # Tokens processed by the model (reported by Ollama), e.g. for comparing prompt modes.
+        # `estimated` counts generations stopped before Ollama's final chunk, whose numbers are estimates
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                      "prompt_seconds": 0.0, "generation_seconds": 0.0,
+                      "early_stops": 0, "estimated": 0, "aborted": 0, "retries": 0}
+        # Token budgets of the description and of the structured data embedded in prompts
+        self.description_token_budget = DESCRIPTION_TOKEN_BUDGET
+        self.value_data_token_budget = VALUE_DATA_TOKEN_BUDGET
+        self._usage_lock = threading.Lock()
+        
+        # Async client and its request slots, set inside `async_client()`
+        self._aio_session: Optional[aiohttp.ClientSession] = None
+        self._aio_cache_thread: Optional[ThreadPoolExecutor] = None
+        self._aio_slots: Optional[asyncio.Semaphore] = None
         
         # Check available models and set up
         self.available_models = self._get_available_models()
@@ -124,6 +244,21 @@ class OllamaParser:
         # Log warnings for missing models
         if not self.is_llm_available:
             logger.warning(f"LLM model {self.llm_model} is not available. Text analysis will be disabled.")
+        elif self.small_llm_model not in self.available_models:
+            logger.info(f"Small LLM {self.small_llm_model} not available, tasks use {self.llm_model} only")
+
+    def models_for(self, kind: str) -> List[str]:
+        """
+        Models tried for a task, in order: the configured tiers that are available,
+        ending with the primary model if no configured tier is available.
+        """
+        roles = {SMALL: self.small_llm_model, LARGE: self.llm_model}
+        models = []
+        for tier in self.model_tiers.get(kind, [LARGE]):
+            model = roles.get(tier, tier)
+            if model in self.available_models and model not in models:
+                models.append(model)
+        return models or [self.llm_model]
 
     def parse_bike_description(self, description: str) -> Dict[str, Any]:
         """
@@ -138,54 +273,18 @@ class OllamaParser:
         if not self.is_llm_available:
             return {"error": "LLM model is unavailable"}
 
-        # Check cache
-        cache_key = f"bike_desc_{hash(description[:250])}"
-        cached_result = self.analysis_cache.get(cache_key)
-        if cached_result:
-            logger.debug("Using cached bike description parsing result")
-            return cached_result
-
         prompt = self._create_bike_parsing_prompt(description)
-        
-        # Try multiple times with backoff
-        for attempt in range(self.MAX_RETRIES):
-            try:
-                data = {
-                    "model": self.llm_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-                
-                response = self.session.post(
-                    f"{self.ollama_url}/api/generate", 
-                    json=data,
-                    timeout=self.REQUEST_TIMEOUT
-                )
-                
-                if response.status_code == 200:
-                    result = self._parse_ollama_response(response.json().get("response", "{}"))
-                    if result:
-                        # Cache successful result
-                        self.analysis_cache.put(cache_key, result)
-                        return result
-                else:
-                    logger.warning(f"API error (attempt {attempt+1}): {response.status_code}")
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout (attempt {attempt+1})")
-            except Exception as e:
-                logger.error(f"Error parsing bike description (attempt {attempt+1}): {str(e)}")
-            
-            # Sleep before retry (except on last attempt)
-            if attempt < self.MAX_RETRIES - 1:
-                time.sleep(self.RETRY_BACKOFF[attempt])
-        
-        return {"error": "Failed to parse bike description"}
+        return self._generate_json(prompt, "bike_desc", "parsing bike description", "Failed to parse bike description")
+
+    def _prepare_description(self, description: str) -> str:
+        """Normalized description cut to the token budget (see `prompt_budget.py`)."""
+        return prepare_description(description or "", self.description_token_budget)
 
     def _create_bike_parsing_prompt(self, description: str) -> str:
         """
         Create a structured prompt for parsing bike descriptions.
         """
+        description = self._prepare_description(description)
         return f"""
         === BICYCLE LISTING PARSING REQUEST ===
         
@@ -261,28 +360,49 @@ class OllamaParser:
         For confidence_score in parameters, rate how confident you are in your overall extraction from 1-10.
         """
 
-    def categorize_bike(self, title: str, description: str) -> Dict[str, Any]:
+    def _create_missing_fields_prompt(self, description: str, known: Dict[str, Any], fields: List[str]) -> str:
         """
-        Categorize the bike based on title and description.
+        Create a shortened parsing prompt asking only for the fields not known from structured data.
+        """
+        description = self._prepare_description(description)
+        known_flat = json.dumps({name: value for name, value in known.items() if name not in fields},
+                                ensure_ascii=False, sort_keys=True)
+        field_lines = "".join((f'"{name}": string or null' if name != "year" else '"year": number or null') +
+                              ",\n            " for name in fields)
+        task = ("Extract only the fields listed below from the description, plus accessories,\n        "
+                "issues and upgrades mentioned by the seller." if fields else
+                "Extract the accessories, issues and upgrades mentioned by the seller.")
+        return f"""
+        === BICYCLE LISTING PARSING REQUEST ===
         
-        Args:
-            title: The title of the listing
-            description: The description of the listing
-            
-        Returns:
-            A dictionary with category information
+        === TEXT DESCRIPTION ===
+        {description}
+        
+        === ALREADY KNOWN ===
+        {known_flat}
+        
+        === TASK ===
+        {task}
+        
+        === REQUIRED JSON FORMAT ===
+        {{
+            {field_lines}"parameters": {{
+                "accessories": [string],
+                "issues": [string],
+                "upgrades": [string],
+                "confidence_score": number
+            }}
+        }}
+        
+        Format your entire response as valid JSON only. If you're unsure about any field, use null.
         """
-        if not self.is_llm_available:
-            return {"error": "LLM model is unavailable"}
-
-        # Check cache
-        cache_key = f"bike_cat_{hash(title + description[:100])}"
-        cached_result = self.analysis_cache.get(cache_key)
-        if cached_result:
-            logger.debug("Using cached bike categorization result")
-            return cached_result
 
-        prompt = f"""
+    def _create_categorization_prompt(self, title: str, description: str) -> str:
+        """
+        Create a structured prompt for categorizing a bike listing.
+        """
+        description = self._prepare_description(description)
+        return f"""
         === BICYCLE CATEGORIZATION REQUEST ===
         
         === LISTING ===
@@ -304,64 +424,14 @@ class OllamaParser:
         
         Format your response as valid JSON only. If you're unsure about any field, provide your best guess.
         """
-        
-        # Try multiple times with backoff
-        for attempt in range(self.MAX_RETRIES):
-            try:
-                data = {
-                    "model": self.llm_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-                
-                response = self.session.post(
-                    f"{self.ollama_url}/api/generate", 
-                    json=data,
-                    timeout=self.REQUEST_TIMEOUT
-                )
-                
-                if response.status_code == 200:
-                    result = self._parse_ollama_response(response.json().get("response", "{}"))
-                    if result:
-                        # Cache successful result
-                        self.analysis_cache.put(cache_key, result)
-                        return result
-                else:
-                    logger.warning(f"API error (attempt {attempt+1}): {response.status_code}")
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout (attempt {attempt+1})")
-            except Exception as e:
-                logger.error(f"Error categorizing bike (attempt {attempt+1}): {str(e)}")
-            
-            # Sleep before retry (except on last attempt)
-            if attempt < self.MAX_RETRIES - 1:
-                time.sleep(self.RETRY_BACKOFF[attempt])
-        
-        return {"error": "Failed to categorize bike"}
 
-    def identify_bike_value(self, bike_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _create_value_prompt(self, bike_data: Dict[str, Any]) -> str:
         """
-        Analyze a bike to identify its market value and key selling points.
-        
-        Args:
-            bike_data: Structured bike data
-            
-        Returns:
-            Value analysis information
+        Create a structured prompt for the value analysis of structured bike data.
         """
-        if not self.is_llm_available:
-            return {"error": "LLM model is unavailable"}
-
-        # Check cache
-        bike_data_flat = json.dumps(bike_data)
-        cache_key = f"bike_value_{hash(bike_data_flat)}"
-        cached_result = self.analysis_cache.get(cache_key)
-        if cached_result:
-            logger.debug("Using cached bike value analysis result")
-            return cached_result
-
-        prompt = f"""
+        # Compact, size-limited JSON with sorted keys (a stable prompt and cache key for the same data)
+        bike_data_flat = compact_json(bike_data, self.value_data_token_budget)
+        return f"""
         === BICYCLE VALUE ANALYSIS REQUEST ===
         
         === BIKE DATA ===
@@ -393,41 +463,522 @@ class OllamaParser:
         
         Format your response as valid JSON only.
         """
+
+    def _create_combined_prompt(self, title: str, description: str) -> str:
+        """
+        Create a single prompt returning parsed details, category and value analysis at once.
+        """
+        description = self._prepare_description(description)
+        return f"""
+        === BICYCLE LISTING ANALYSIS REQUEST ===
+        
+        === LISTING ===
+        Title: {title}
+        
+        Description: {description}
+        
+        === TASK ===
+        Analyze this bicycle listing in three parts:
+        1. parsed_details - extract brand, model, year, condition, frame, groupset, brakes, wheels,
+           accessories, issues and upgrades from the description
+        2. category - categorize the bicycle (category, subcategory, intended use, price category)
+        3. value - estimate the fair market value range, key selling points and concerns,
+           and whether the listed price is fair, high or low
+        
+        === REQUIRED JSON FORMAT ===
+        {{
+            "parsed_details": {{
+                "brand": string or null,
+                "model": string or null,
+                "year": number or null,
+                "condition": string or null,
+                "color": string or null,
+                "seller_type": string or null,
+                "bike_type": string or null,
+                "size": string or null,
+                "frame_size_desc": string or null,
+                "frame_material": string or null,
+                "wheel_size": string or null,
+                "derailleur_type": string or null,
+                "gears": string or null,
+                "brake_type": string or null,
+                "weight": string or null,
+                "suspension": string or null,
+                "price": {{
+                    "amount": number,
+                    "currency": string,
+                    "negotiable": boolean
+                }},
+                "parameters": {{
+                    "accessories": [string],
+                    "issues": [string],
+                    "upgrades": [string],
+                    "is_shipping_available": boolean,
+                    "confidence_score": number
+                }}
+            }},
+            "category": {{
+                "primary_category": string (e.g., "road", "gravel", "mtb", "city", "trekking", "kids", "electric", "other"),
+                "subcategory": string (e.g., "race", "endurance", "hardtail", "full-suspension", etc.),
+                "intended_use": string (e.g., "racing", "commuting", "touring", "all-road", etc.),
+                "price_category": string (e.g., "budget", "mid-range", "high-end", "premium"),
+                "confidence": number (1-10)
+            }},
+            "value": {{
+                "value_analysis": {{
+                    "estimated_value_range": {{
+                        "low": number,
+                        "high": number,
+                        "currency": string
+                    }},
+                    "value_assessment": string (e.g., "fair", "overpriced", "underpriced", "unknown"),
+                    "price_difference_percent": number or null (compared to estimated fair value)
+                }},
+                "selling_points": [list of strings],
+                "concerns": [list of strings],
+                "overall_recommendation": string,
+                "confidence": number (1-10)
+            }}
+        }}
+        
+        Format your entire response as valid JSON only. If you're unsure about any field, use null.
+        """
+
+    def _split_combined_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Turn a combined generation into the `ai_analysis` shape of the three-call pipeline.
+        
+        Sections missing from the model output are replaced with errors, like
+        failed steps of the pipeline.
+        """
+        if "error" in result:
+            return {
+                "parsed_details": result,
+                "category": {"error": "Could not categorize due to parsing error"},
+                "value": {"error": "Could not analyze value due to parsing error"}
+            }
+        analysis = {}
+        for section in ("parsed_details", "category", "value"):
+            value = result.get(section)
+            analysis[section] = value if isinstance(value, dict) and value else {"error": f"Missing {section} in combined analysis"}
+        return analysis
+
+    def analyze_bike_combined(self, title: str, description: str) -> Dict[str, Any]:
+        """
+        Parse, categorize and value a bike in a single generation.
+        
+        Args:
+            title: The title of the listing
+            description: The description of the listing
+            
+        Returns:
+            A dictionary with "parsed_details", "category" and "value" sections
+            (the same shape as the three separate calls)
+        """
+        if not self.is_llm_available:
+            return self._split_combined_result({"error": "LLM model is unavailable"})
+
+        prompt = self._create_combined_prompt(title, description)
+        result = self._generate_json(prompt, "bike_combined", "analyzing bike", "Failed to analyze bike")
+        return self._split_combined_result(result)
+
+    def parse_missing_fields(self, description: str, known: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+        """
+        Parse only the given fields from the description (the rest is known from structured data).
+        
+        Args:
+            description: Raw text description from the OLX listing
+            known: Fields already extracted by rules (sent as context)
+            fields: Names of the fields to extract
+            
+        Returns:
+            A dictionary with the requested fields and "parameters"
+        """
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+
+        prompt = self._create_missing_fields_prompt(description, known, fields)
+        return self._generate_json(prompt, "bike_desc_partial", "parsing bike description", "Failed to parse bike description")
+
+    def categorize_bike(self, title: str, description: str) -> Dict[str, Any]:
+        """
+        Categorize the bike based on title and description.
+        
+        Args:
+            title: The title of the listing
+            description: The description of the listing
+            
+        Returns:
+            A dictionary with category information
+        """
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+
+        prompt = self._create_categorization_prompt(title, description)
+        return self._generate_json(prompt, "bike_cat", "categorizing bike", "Failed to categorize bike")
+
+    def identify_bike_value(self, bike_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze a bike to identify its market value and key selling points.
+        
+        Args:
+            bike_data: Structured bike data
+            
+        Returns:
+            Value analysis information
+        """
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+
+        prompt = self._create_value_prompt(bike_data)
+        return self._generate_json(prompt, "bike_value", "analyzing bike value", "Failed to analyze bike value")
+
+    def _generate_json(self, prompt: str, kind: str, label: str, error: str) -> Dict[str, Any]:
+        """
+        Run a JSON-mode generation through the model tiers of the task.
+        
+        The first (smallest) model answers most requests; a result that failed,
+        does not match the task schema or has a low self-reported confidence is
+        passed to the next tier. The last tier's result is returned as is.
+        
+        Args:
+            prompt: Full prompt sent to the model
+            kind: Task and cache key prefix (e.g. "bike_desc")
+            label: Description of the operation used in log messages
+            error: Error message returned when all attempts fail
+            
+        Returns:
+            Parsed JSON result or {"error": error}
+        """
+        models = self.models_for(kind)
+        escalations = []
+        for tier, model in enumerate(models):
+            final = tier == len(models) - 1
+            # Only the last tier retries - a failing smaller model is escalated instead
+            result = self._generate_with_model(prompt, kind, label, error, model,
+                                               self.MAX_RETRIES if final else 1)
+            reason = None if final else escalation_reason(kind, result)
+            if reason is None:
+                self.tier_stats.record_result(kind, tier, escalations)
+                return result
+            logger.debug(f"Escalating {kind} from {model}: {reason}")
+            escalations.append(reason)
+        return {"error": error}
+
+    def _generate_with_model(self, prompt: str, kind: str, label: str, error: str, model: str,
+                             attempts: int) -> Dict[str, Any]:
+        """Run a JSON-mode generation on one model with caching and retries."""
+        key = cache_key(kind, model, prompt, self.PROMPT_VERSION)
+        cached_result = self._get_cached(key, kind)
+        if cached_result:
+            return cached_result
         
         # Try multiple times with backoff
-        for attempt in range(self.MAX_RETRIES):
+        for attempt in range(attempts):
+            if attempt:
+                self._record_retry()
+            started = time.perf_counter()
+            result = None
+            # Created before the request: prompt evaluation happens before the first chunk (and the headers)
+            stream = GenerationStream(prompt_tokens=estimate_tokens(prompt))
             try:
-                data = {
-                    "model": self.llm_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-                
-                response = self.session.post(
+                # Same deadlines as the async path: the read timeout limits the wait for the
+                # first token, then it is shortened to the gap allowed between chunks and to
+                # the wait for the final chunk once the object is complete
+                with self.session.post(
                     f"{self.ollama_url}/api/generate", 
-                    json=data,
-                    timeout=self.REQUEST_TIMEOUT
-                )
-                
-                if response.status_code == 200:
-                    result = self._parse_ollama_response(response.json().get("response", "{}"))
-                    if result:
-                        # Cache successful result
-                        self.analysis_cache.put(cache_key, result)
-                        return result
-                else:
-                    logger.warning(f"API error (attempt {attempt+1}): {response.status_code}")
+                    json=self._generation_request(prompt, model),
+                    stream=True,
+                    timeout=(self.REQUEST_TIMEOUT, self.FIRST_TOKEN_TIMEOUT)
+                ) as response:
+                    if response.status_code == 200:
+                        try:
+                            for line in response.iter_lines():
+                                if stream.feed_line(line):
+                                    break
+                                _set_read_timeout(response, stream.read_timeout(self.TOKEN_STALL_TIMEOUT))
+                        except requests.exceptions.RequestException:
+                            # A timeout or a dropped connection after the closing brace keeps the object
+                            if not stream.json.complete:
+                                raise
+                        result = self._finish_stream(stream)
+                    else:
+                        logger.warning(f"API error (attempt {attempt+1}): {response.status_code}")
             except requests.exceptions.Timeout:
                 logger.warning(f"Request timeout (attempt {attempt+1})")
+            except StreamAborted as e:
+                self._record_abort(label, attempt, e)
             except Exception as e:
-                logger.error(f"Error analyzing bike value (attempt {attempt+1}): {str(e)}")
+                logger.error(f"Error {label} (attempt {attempt+1}): {str(e)}")
+            self.tier_stats.record_call(model, time.perf_counter() - started, not result)
+            if result:
+                # Cache successful result
+                self._store_cached(key, kind, result, model)
+                return result
             
             # Sleep before retry (except on last attempt)
-            if attempt < self.MAX_RETRIES - 1:
+            if attempt < attempts - 1:
                 time.sleep(self.RETRY_BACKOFF[attempt])
         
-        return {"error": "Failed to analyze bike value"}
+        return {"error": error}
+
+    def _generation_request(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Body of a streamed JSON-mode generation request."""
+        return {
+            "model": model or self.llm_model,
+            "prompt": prompt,
+            "stream": True,
+            "format": "json"
+        }
+
+    def _finish_stream(self, stream: GenerationStream) -> Optional[Dict[str, Any]]:
+        """Record usage of a finished stream and parse its JSON object."""
+        self._record_usage(stream.usage())
+        if stream.stopped_early:
+            with self._usage_lock:
+                self.usage["early_stops"] += 1
+        if stream.json.complete:
+            try:
+                return json.loads(stream.json.result)
+            except json.JSONDecodeError:
+                pass
+        return self._parse_ollama_response(stream.json.text or "{}")
+
+    def _record_abort(self, label: str, attempt: int, error: Exception) -> None:
+        with self._usage_lock:
+            self.usage["aborted"] += 1
+        logger.warning(f"Aborted generation while {label} (attempt {attempt+1}): {str(error)}")
+
+    def usage_snapshot(self) -> Dict[str, Any]:
+        """Copy of the generation counters in `self.usage`."""
+        with self._usage_lock:
+            return dict(self.usage)
+
+    def cache_counters(self) -> Dict[str, int]:
+        """Hits and misses of the in-memory and the persistent result cache."""
+        counters = {"memory_hits": self.analysis_cache.hits, "memory_misses": self.analysis_cache.misses,
+                    "disk_hits": 0, "disk_misses": 0}
+        if self.result_cache is not None:
+            counters["disk_hits"] = self.result_cache.hits
+            counters["disk_misses"] = self.result_cache.misses
+        return counters
+
+    def _record_retry(self) -> None:
+        with self._usage_lock:
+            self.usage["retries"] += 1
+
+    def _record_usage(self, payload: Dict[str, Any]) -> None:
+        """Add token counts and prompt/generation time (reported in ns) of a finished generation to `self.usage`."""
+        prompt_tokens = payload.get("prompt_eval_count") or 0
+        completion_tokens = payload.get("eval_count") or 0
+        prompt_seconds = (payload.get("prompt_eval_duration") or 0) / 1e9
+        generation_seconds = (payload.get("eval_duration") or 0) / 1e9
+        estimated = bool(payload.get("estimated"))
+        logger.debug(f"Generation{' (estimated)' if estimated else ''}: {prompt_tokens} prompt tokens in "
+                     f"{prompt_seconds:.2f}s, {completion_tokens} completion tokens in {generation_seconds:.2f}s")
+        with self._usage_lock:
+            self.usage["requests"] += 1
+            self.usage["estimated"] += estimated
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["completion_tokens"] += completion_tokens
+            self.usage["prompt_seconds"] += prompt_seconds
+            self.usage["generation_seconds"] += generation_seconds
+
+    def _get_cached(self, key: str, kind: str) -> Optional[Dict[str, Any]]:
+        """Look up a result in the in-memory cache, then in the persistent one."""
+        cached_result = self.analysis_cache.get(key)
+        if cached_result:
+            logger.debug(f"Using cached {kind} result")
+            return cached_result
+        return self._get_stored(key, kind)
+
+    def _get_stored(self, key: str, kind: str) -> Optional[Dict[str, Any]]:
+        """Look up a result in the persistent cache and keep it in memory."""
+        if self.result_cache is None:
+            return None
+        cached_result = self.result_cache.get(key)
+        if cached_result:
+            logger.debug(f"Using stored {kind} result")
+            self.analysis_cache.put(key, cached_result)
+            return cached_result
+        return None
+
+    def _store_cached(self, key: str, kind: str, result: Dict[str, Any], model: str) -> None:
+        """Save a successful result in both cache layers."""
+        self.analysis_cache.put(key, result)
+        self._store_persistent(key, kind, result, model)
+
+    def _store_persistent(self, key: str, kind: str, result: Dict[str, Any], model: str) -> None:
+        """Save a successful result in the persistent cache (if enabled)."""
+        if self.result_cache is not None:
+            self.result_cache.put(key, result, kind, model, self.PROMPT_VERSION)
+
+    async def _aget_cached(self, key: str, kind: str) -> Optional[Dict[str, Any]]:
+        """Async version of `_get_cached`; the persistent cache is read on the cache thread."""
+        cached_result = self.analysis_cache.get(key)
+        if cached_result:
+            logger.debug(f"Using cached {kind} result")
+            return cached_result
+        if self.result_cache is None:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._aio_cache_thread, self._get_stored, key, kind)
+
+    async def _astore_cached(self, key: str, kind: str, result: Dict[str, Any], model: str) -> None:
+        """Async version of `_store_cached`; the persistent cache is written on the cache thread."""
+        self.analysis_cache.put(key, result)
+        if self.result_cache is None:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._aio_cache_thread, self._store_persistent, key, kind, result, model)
+
+    @asynccontextmanager
+    async def async_client(self, max_in_flight: Optional[int] = None):
+        """
+        Open the pooled async HTTP client used by the `a*` methods.
+        
+        At most `max_in_flight` generation requests (default `MAX_IN_FLIGHT`) are
+        sent at once; further requests wait for a free slot before their timeout
+        starts, so queueing never counts against `REQUEST_TIMEOUT`.
+        
+        Usage:
+            async with parser.async_client(4):
+                results = await asyncio.gather(*(parser.acategorize_bike(t, d) for t, d in items))
+        """
+        slots = max_in_flight or self.MAX_IN_FLIGHT
+        connector = aiohttp.TCPConnector(limit=slots)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self._aio_session = session
+            self._aio_slots = asyncio.Semaphore(slots)
+            # SQLite reads and writes of the persistent cache (busy waits, evictions) must not
+            # stall the event loop that drives every in-flight stream
+            self._aio_cache_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+            try:
+                yield self
+            finally:
+                self._aio_session = None
+                self._aio_slots = None
+                self._aio_cache_thread.shutdown(wait=True)
+                self._aio_cache_thread = None
+
+    async def aparse_bike_description(self, description: str) -> Dict[str, Any]:
+        """Async version of `parse_bike_description` (requires `async_client()`)."""
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+        prompt = self._create_bike_parsing_prompt(description)
+        return await self._agenerate_json(prompt, "bike_desc", "parsing bike description", "Failed to parse bike description")
+
+    async def aparse_missing_fields(self, description: str, known: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+        """Async version of `parse_missing_fields` (requires `async_client()`)."""
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+        prompt = self._create_missing_fields_prompt(description, known, fields)
+        return await self._agenerate_json(prompt, "bike_desc_partial", "parsing bike description", "Failed to parse bike description")
+
+    async def acategorize_bike(self, title: str, description: str) -> Dict[str, Any]:
+        """Async version of `categorize_bike` (requires `async_client()`)."""
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+        prompt = self._create_categorization_prompt(title, description)
+        return await self._agenerate_json(prompt, "bike_cat", "categorizing bike", "Failed to categorize bike")
+
+    async def aidentify_bike_value(self, bike_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of `identify_bike_value` (requires `async_client()`)."""
+        if not self.is_llm_available:
+            return {"error": "LLM model is unavailable"}
+        prompt = self._create_value_prompt(bike_data)
+        return await self._agenerate_json(prompt, "bike_value", "analyzing bike value", "Failed to analyze bike value")
+
+    async def aanalyze_bike_combined(self, title: str, description: str) -> Dict[str, Any]:
+        """Async version of `analyze_bike_combined` (requires `async_client()`)."""
+        if not self.is_llm_available:
+            return self._split_combined_result({"error": "LLM model is unavailable"})
+        prompt = self._create_combined_prompt(title, description)
+        result = await self._agenerate_json(prompt, "bike_combined", "analyzing bike", "Failed to analyze bike")
+        return self._split_combined_result(result)
+
+    async def _agenerate_json(self, prompt: str, kind: str, label: str, error: str) -> Dict[str, Any]:
+        """Async version of `_generate_json` sharing its caches, tiers and retry policy."""
+        if self._aio_session is None:
+            raise RuntimeError("Async generation requires an open client: use `async with parser.async_client():`")
+        
+        models = self.models_for(kind)
+        escalations = []
+        for tier, model in enumerate(models):
+            final = tier == len(models) - 1
+            result = await self._agenerate_with_model(prompt, kind, label, error, model,
+                                                      self.MAX_RETRIES if final else 1)
+            reason = None if final else escalation_reason(kind, result)
+            if reason is None:
+                self.tier_stats.record_result(kind, tier, escalations)
+                return result
+            logger.debug(f"Escalating {kind} from {model}: {reason}")
+            escalations.append(reason)
+        return {"error": error}
+
+    async def _agenerate_with_model(self, prompt: str, kind: str, label: str, error: str, model: str,
+                                    attempts: int) -> Dict[str, Any]:
+        """Async version of `_generate_with_model`."""
+        key = cache_key(kind, model, prompt, self.PROMPT_VERSION)
+        cached_result = await self._aget_cached(key, kind)
+        if cached_result:
+            return cached_result
+        
+        data = self._generation_request(prompt, model)
+        for attempt in range(attempts):
+            if attempt:
+                self._record_retry()
+            result = None
+            try:
+                async with self._aio_slots:
+                    # Latency is measured once a slot is free (queueing is not the model's time)
+                    started = time.perf_counter()
+                    stream = GenerationStream(prompt_tokens=estimate_tokens(prompt))
+                    try:
+                        async with self._aio_session.post(
+                            f"{self.ollama_url}/api/generate",
+                            json=data,
+                            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.REQUEST_TIMEOUT)
+                        ) as response:
+                            if response.status == 200:
+                                # Deadline is based on token progress: long wait for the first chunk,
+                                # short gaps between the following ones, then a short wait for the
+                                # final chunk once the object is complete
+                                timeout = self.FIRST_TOKEN_TIMEOUT
+                                while True:
+                                    try:
+                                        line = await asyncio.wait_for(response.content.readline(),
+                                                                      stream.read_timeout(timeout))
+                                    except asyncio.TimeoutError:
+                                        if stream.json.complete:
+                                            break
+                                        raise
+                                    if not line or stream.feed_line(line):
+                                        break
+                                    timeout = self.TOKEN_STALL_TIMEOUT
+                                if stream.stopped_early:
+                                    # Closing the connection makes Ollama cancel the rest of the generation
+                                    response.close()
+                                result = self._finish_stream(stream)
+                            else:
+                                logger.warning(f"API error (attempt {attempt+1}): {response.status}")
+                    finally:
+                        self.tier_stats.record_call(model, time.perf_counter() - started, not result)
+            except asyncio.TimeoutError:
+                logger.warning(f"Request timeout (attempt {attempt+1})")
+            except StreamAborted as e:
+                self._record_abort(label, attempt, e)
+            except Exception as e:
+                logger.error(f"Error {label} (attempt {attempt+1}): {str(e)}")
+            if result:
+                await self._astore_cached(key, kind, result, model)
+                return result
+            
+            # Sleep before retry (except on last attempt)
+            if attempt < attempts - 1:
+                await asyncio.sleep(self.RETRY_BACKOFF[attempt])
+        
+        return {"error": error}
 
     def _parse_ollama_response(self, response_text: str) -> Optional[Dict[str, Any]]:
         """Parse Ollama response text into a JSON object"""
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+from typing import Any, Dict, List
+
+# Token budgets of the inputs embedded in prompts (estimated tokens)
+DESCRIPTION_TOKEN_BUDGET = int(os.environ.get("LLM_DESCRIPTION_TOKENS", 400))
+VALUE_DATA_TOKEN_BUDGET = int(os.environ.get("LLM_VALUE_DATA_TOKENS", 400))
+
+# Average characters per token of Polish listing text in common LLM tokenizers
+CHARS_PER_TOKEN = 3.5
+
+# Contact details - useless for the analysis and noise for the model
+_CONTACT_PATTERNS = [
+    re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE),
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),
+    re.compile(r"(?:\+?48[\s-]?)?(?<!\d)\d{3}[\s-]?\d{3}[\s-]?\d{3}(?!\d)"),
+]
+# Lines that carry no information about the bike (greetings, invitations, store ads)
+_BOILERPLATE_LINE = re.compile(
+    r"^\W*(zapraszam\w*|pozdrawiam\w*|pozdrowienia|serdecznie|kontakt\w*|dzwo[nń]\w*|telefon\w*|"
+    r"tel\.?|więcej (ogłoszeń|rowerów|ofert)|zobacz (też|inne|pozostałe)|sprawdź (też|inne|pozostałe)|"
+    r"proszę o kontakt)\b.*$",
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r"[ \t ]+")
+
+# Words of lines that describe the bike itself; such lines are kept first when truncating
+_INFORMATIVE = re.compile(
+    r"ram[aąęy]|karbon|carbon|alu|stal|tytan|shimano|sram|campagnolo|grx|105|ultegra|tiagra|sora|claris|apex|rival|"
+    r"force|hamul|tarcz|hydraul|koł[aoe]|obręcz|opon|widel|napęd|kaset|korb|przerzut|manetk|siodł|sztyc|kierownic|"
+    r"rozmiar|wzrost|rok|rocznik|stan|przebieg|km\b|wymian|serwis|uszkodz|rys|wgniec|pękn|usterk|gwarancj|"
+    r"faktur|waga|kg\b|\d+\s?(mm|cm|\"|cali)",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text (no tokenizer needed)."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def normalize_description(text: str) -> str:
+    """
+    Clean a listing description before it is embedded in a prompt.
+
+    Removes contact details and boilerplate lines, collapses whitespace and
+    drops repeated lines (sellers often paste the same block twice).
+    """
+    if not text:
+        return ""
+    for pattern in _CONTACT_PATTERNS:
+        text = pattern.sub(" ", text)
+    lines: List[str] = []
+    seen = set()
+    for line in text.splitlines():
+        line = _WHITESPACE.sub(" ", line).strip(" -*•|")
+        if not line or (_BOILERPLATE_LINE.match(line) and not _INFORMATIVE.search(line)):
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _line_score(index: int, line: str) -> float:
+    """Information score of a line: bike vocabulary and numbers, with a bonus for the opening lines."""
+    score = len(_INFORMATIVE.findall(line)) + 0.2 * sum(char.isdigit() for char in line[:200]) ** 0.5
+    if index < 3:
+        score += 3 - index
+    # Prefer dense lines - a long line has to carry more to be kept
+    return score / (1 + estimate_tokens(line) / 40)
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Shorten a normalized text to about `max_tokens`, keeping the most informative lines.
+
+    Lines are ranked by their score and the best ones that fit the budget are
+    kept in their original order. A single line over the budget is cut.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = text.splitlines()
+    ranked = sorted(range(len(lines)), key=lambda index: _line_score(index, lines[index]), reverse=True)
+    budget = max_tokens
+    kept = set()
+    for index in ranked:
+        cost = estimate_tokens(lines[index]) + 1
+        if cost <= budget:
+            kept.add(index)
+            budget -= cost
+    if not kept:
+        return text[:int(max_tokens * CHARS_PER_TOKEN)]
+    return "\n".join(lines[index] for index in sorted(kept))
+
+
+def prepare_description(text: str, max_tokens: int = DESCRIPTION_TOKEN_BUDGET) -> str:
+    """Normalize a description and fit it to the token budget."""
+    return truncate_to_budget(normalize_description(text), max_tokens)
+
+
+def _prune(value: Any, max_items: int, max_chars: int) -> Any:
+    if isinstance(value, dict):
+        pruned = {key: _prune(item, max_items, max_chars) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_prune(item, max_items, max_chars) for item in value[:max_items]]
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars]
+    return value
+
+
+def compact_json(data: Dict[str, Any], max_tokens: int = VALUE_DATA_TOKEN_BUDGET) -> str:
+    """
+    Serialize structured data for a prompt within a token budget.
+
+    Empty values are dropped and the output has no indentation; while it is
+    over the budget, lists and long strings are shortened step by step.
+    Keys are sorted so the same data always gives the same prompt.
+    """
+    max_items, max_chars = 20, 400
+    while True:
+        text = json.dumps(_prune(data, max_items, max_chars), ensure_ascii=False, sort_keys=True,
+                          separators=(",", ":"))
+        if estimate_tokens(text) <= max_tokens or (max_items <= 1 and max_chars <= 20):
+            return text
+        max_items, max_chars = max(max_items // 2, 1), max(max_chars // 2, 20)
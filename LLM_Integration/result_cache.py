@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Default location of the persistent LLM result cache
+DEFAULT_CACHE_PATH = os.path.join("data", "llm_cache.db")
+
+# Default size budget of the stored results
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# The size budget is enforced every N inserts (summing sizes scans the table)
+EVICTION_CHECK_INTERVAL = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used_at);
+CREATE INDEX IF NOT EXISTS results_prompt_version ON results (prompt_version);
+"""
+
+
+class ResultCache:
+    """
+    Persistent, disk-backed cache of LLM results stored in SQLite.
+
+    Entries are keyed by a hash of the model name, prompt template version and
+    the full prompt (see `ollama_parser.cache_key`), so results survive server
+    restarts and are shared by every process using the same file. The total
+    size of stored results is bounded; least recently used entries are evicted
+    first. Bumping the prompt version makes old results unreachable and
+    `invalidate(prompt_version=...)` removes them.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._inserts = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection.executescript(SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Per-thread connection to the cache database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the stored result for the key (and mark it as recently used) or None."""
+        row = self.connection.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.connection.execute("UPDATE results SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any, kind: str, model: str, prompt_version: str) -> None:
+        """Store a result; evicts least recently used entries when over the size budget."""
+        result = json.dumps(value, ensure_ascii=False)
+        size = len(result.encode("utf-8")) + len(key)
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, kind, model, prompt_version, result, size, "
+                "created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, str(prompt_version), result, size, now, now),
+            )
+        with self._lock:
+            self._inserts += 1
+            check = self._inserts % EVICTION_CHECK_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the total size fits the budget."""
+        with self.transaction() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            excess = total - self.max_bytes
+            if excess <= 0:
+                return 0
+            keys = []
+            for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used_at"):
+                keys.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM results WHERE key = ?", keys)
+        with self._lock:
+            self.evictions += len(keys)
+        return len(keys)
+
+    def invalidate(self, prompt_version: Optional[str] = None, model: Optional[str] = None,
+                   kind: Optional[str] = None) -> int:
+        """Remove results matching all given filters (no filters clears the cache)."""
+        conditions, params = [], []
+        for column, value in (("prompt_version", prompt_version), ("model", model), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(str(value))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.transaction() as conn:
+            return conn.execute(f"DELETE FROM results{where}", params).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, stored size and hit/miss/eviction counters of this process."""
+        entries, size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+            }
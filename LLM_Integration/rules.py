@@ -0,0 +1,275 @@
+"""
+Deterministic extraction of bike details from structured listing data.
+
+Most of what the description-parsing prompt asks for is already known before
+the LLM runs: the OLX parameter table fills brand, condition, frame material,
+wheel size, brake type and frame size, and simple patterns find the rest in
+the title or description. The extractor fills these fields with a per-field
+confidence, so the LLM is only asked for what is missing - or not at all.
+
+Accessories, issues and upgrades cannot be read reliably with patterns. The
+extractor only decides whether the description may mention them; if so, the
+LLM is still asked for these lists.
+"""
+import re
+from dataclasses import asdict, dataclass, field, is_dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prompt_budget import normalize_description
+
+# Fields the parsing step must provide; when all are known with enough confidence the LLM call is skipped
+REQUIRED_FIELDS = ("brand", "year", "condition", "frame_material", "wheel_size", "brake_type", "size")
+# Other structured fields copied into the parsed details when known
+OPTIONAL_FIELDS = ("color", "derailleur_type", "gears", "weight", "suspension", "seller_type",
+                   "bike_type", "frame_size_desc")
+
+# Minimum confidence of a field to be trusted without asking the LLM
+MIN_FIELD_CONFIDENCE = 0.6
+
+# Confidence by source of the value
+PARAMETER_CONFIDENCE = 0.95  # OLX parameter table (chosen by the seller from a fixed list)
+TITLE_CONFIDENCE = 0.8
+DESCRIPTION_CONFIDENCE = 0.7
+SCRAPED_CONFIDENCE = 0.5  # Set by the scraper from free text (source unknown) - verified by the LLM
+
+# OLX parameter table keys of the required fields
+PARAMETER_KEYS = {
+    "brand": "Marka",
+    "condition": "Stan",
+    "frame_material": "Materiał ramy",
+    "wheel_size": "Rozmiar koła",
+    "brake_type": "Typ hamulca",
+    "size": "Rozmiar ramy",
+}
+# Parameter table values that carry no information ("other")
+UNKNOWN_PARAMETER_VALUES = {"Inny", "Inna"}
+
+BRANDS = [
+    "Specialized", "Trek", "Cannondale", "Giant", "Liv", "Kross", "Cube", "Merida", "Scott", "Orbea",
+    "Canyon", "Focus", "Bombtrack", "Ridley", "Marin", "GT", "Rondo", "Diamant", "BMC", "B'Twin",
+    "Kellys", "NS Bikes", "Vitus", "Cervelo", "Cinelli", "Fuji", "Genesis", "Pinnacle", "Ribble", "Salsa",
+    "Santa Cruz", "Surly", "Norco", "Wilier", "Ragley", "Lauf", "Niner", "Jamis", "Felt", "Polygon",
+    "Saracen", "Romet", "Rose", "Bianchi", "Kona", "Lapierre", "Radon", "Accent", "Unibike", "Arkus",
+    "Author", "Ghost", "Haibike", "Stevens", "Boardman", "3T", "Open", "Basso", "Colnago", "Pinarello",
+]
+# Model names that identify the brand
+MODEL_BRANDS = {
+    "diverge": "Specialized", "crux": "Specialized", "checkpoint": "Trek", "topstone": "Cannondale",
+    "revolt": "Giant", "grizl": "Canyon", "grail": "Canyon", "aspero": "Cervelo", "kanzo": "Ridley",
+    "nuroad": "Cube", "silex": "Merida", "addict gravel": "Scott", "terra": "Orbea", "triban": "B'Twin",
+}
+
+_BRAND_PATTERNS = [(re.compile(rf"(?<![\w-]){re.escape(brand)}(?![\w-])", re.IGNORECASE), brand)
+                   for brand in BRANDS]
+_MODEL_PATTERNS = [(re.compile(rf"\b{re.escape(model)}\b", re.IGNORECASE), brand)
+                   for model, brand in MODEL_BRANDS.items()]
+
+_MATERIAL_PATTERNS = [
+    (re.compile(r"\b(karbon\w*|carbon\w*|włókn\w* węglow\w*)", re.IGNORECASE), "Karbon"),
+    (re.compile(r"\b(alu\b|alumin\w*)", re.IGNORECASE), "Aluminium"),
+    (re.compile(r"\b(tytan\w*|titan\w*)", re.IGNORECASE), "Tytan"),
+    (re.compile(r"\b(stal\w*|steel|chromoly|cr-?mo)\b", re.IGNORECASE), "Stal"),
+]
+_WHEEL_PATTERNS = [
+    (re.compile(r"\b(28\s*(\"|”|cali|cal\b|'')|700\s*c)", re.IGNORECASE), '28"'),
+    (re.compile(r"\b(27[.,]5\s*(\"|”|cali|'')?|650\s*b)", re.IGNORECASE), '27.5"'),
+    (re.compile(r"\b29\s*(\"|”|cali|er\b|'')", re.IGNORECASE), '29"'),
+    (re.compile(r"\b26\s*(\"|”|cali|'')", re.IGNORECASE), '26"'),
+]
+_BRAKE_PATTERNS = [
+    (re.compile(r"hydraul\w*", re.IGNORECASE), "Tarczowe hydrauliczne"),
+    (re.compile(r"tarcz\w*\s+mechani\w*|mechani\w*\s+(hamulc\w*\s+)?tarcz\w*", re.IGNORECASE),
+     "Tarczowe mechaniczne"),
+    (re.compile(r"v-?brake|szczęk\w*", re.IGNORECASE), "Szczękowe"),
+]
+_YEAR_EXPLICIT = re.compile(r"(?:rok\s*produkcji|rocznik|model\s*(?:z\s*)?roku?|z\s+roku)[:\s]*(20[0-3]\d|19[89]\d)"
+                            r"|\b(20[0-3]\d|19[89]\d)\s*(?:r\.|rok\w*)", re.IGNORECASE)
+_YEAR_ANY = re.compile(r"\b(20[0-3]\d)\b")
+_SIZE_PATTERN = re.compile(r"(?:rozmiar(?:\s+ramy)?|rama)[:\s]*(\d{2}(?:[.,]\d)?\s?cm|\d{1,2}(?:[.,]\d)?\s?(?:\"|”|cali)"
+                           r"|XXS|XS|S|M|L|XL|XXL)\b", re.IGNORECASE)
+# Any mention of a year or a frame size - without one the LLM cannot answer either
+_YEAR_HINT = re.compile(r"\b(19[89]\d|20[0-3]\d)\b")
+_SIZE_HINT = re.compile(r"rozmiar|\bram[aęy]\b|\b\d{2}(?:[.,]\d)?\s?cm\b|\b(?:XXS|XS|XL|XXL)\b|(?-i:\b[SML]\b)|wzrost",
+                        re.IGNORECASE)
+_SHIPPING_PATTERN = re.compile(r"wysył\w*|wysyl\w*|przesył\w*|kurier\w*", re.IGNORECASE)
+
+# Phrases that introduce accessories sold with the bike, issues or upgrades. Part names
+# of the specification ("pedały", "bidon") and a bare "nowy" are left out - they are
+# mostly specification and advert wording, not lists
+_LIST_HINT = re.compile(
+    r"\b(?:w zestawie|w komplecie|gratis|dorzuc\w*|dołącz\w*|dolacz\w*|dodatki\s*:|"
+    r"dodatkow[aey]\s+(?!opłat|oplat|koszt)\w+|dodatkowo\s+(?:oddaj|sprzedaj|do roweru)\w*|"
+    r"z rowerem\s+(?:sprzedaj|oddaj|idzie|idą)\w*|torb[aęy]\b|sakw\w*|lampk\w*|koszyk\w*|licznik\w*|"
+    r"błotnik\w*|blotnik\w*|bagażnik\w*|bagaznik\w*|"
+    r"do wymiany|do naprawy|wymaga\w*\s+(?:wymiany|naprawy|regulacji|serwisu)|uszkodz\w*|pęknię\w*|peknie\w*|"
+    r"wgniec\w*|wgniot\w*|usterk\w*|defekt\w*|luz(?:y|u)?\b|skrzyp\w*|korozj\w*|rdz[ay]\b|rdzewie\w*|"
+    r"rys(?:a|y|ka|ki|ek|ami)?\b|zarysowa\w*|odprys\w*|"
+    r"(?:wy|z)mienion\w*|(?:wy|z)mieni(?:łem|łam|lem|lam|liśmy|ono)\b|upgrade\w*|zamontowan\w*|założon\w*|zalozon\w*|"
+    r"dokupion\w*|now[aeyio]\w*\s+(?:opon|łańcuch|lancuch|kaset|siod|owijk|klock|link|pancerz|koł|kol[aey]|tarcz|"
+    r"napęd|naped|zębat|zebat|korb|sztyc|kierownic|mostek|pedał|pedal)\w*)",
+    re.IGNORECASE,
+)
+# "bez rys", "nie wymaga naprawy", "brak uszkodzeń", "mocowania pod błotniki" - such a hint does not count
+_NOT_A_LIST = re.compile(r"\b(?:bez|nie|żadn\w*|zadn\w*|brak\w*|mocowa\w*|otwor\w*|miejsc\w*)\W+(?:\w+\W+){0,2}$",
+                         re.IGNORECASE)
+
+
+@dataclass
+class RuleExtraction:
+    """Fields extracted without the LLM, with the confidence (0-1) and source of each value."""
+    fields: Dict[str, Any] = field(default_factory=dict)
+    confidence: Dict[str, float] = field(default_factory=dict)
+    sources: Dict[str, str] = field(default_factory=dict)
+    shipping: bool = False
+    # The description may mention accessories, issues or upgrades (only the LLM can list them)
+    needs_lists: bool = False
+
+    def set(self, name: str, value: Any, confidence: float, source: str) -> None:
+        if value in (None, "") or self.confidence.get(name, 0) >= confidence:
+            return
+        self.fields[name] = value
+        self.confidence[name] = confidence
+        self.sources[name] = source
+
+    def set_absent(self, name: str, confidence: float) -> None:
+        """Record that the listing does not contain the field at all (nothing to ask the LLM for)."""
+        if self.confidence.get(name, 0) < confidence:
+            self.confidence[name] = confidence
+            self.sources[name] = "absent"
+
+    def missing(self, min_confidence: float = MIN_FIELD_CONFIDENCE) -> List[str]:
+        """Required fields that are unknown or not trusted enough."""
+        return [name for name in REQUIRED_FIELDS if self.confidence.get(name, 0) < min_confidence]
+
+    @property
+    def completeness(self) -> float:
+        """Share of required fields that are known."""
+        return sum(1 for name in REQUIRED_FIELDS if name in self.fields) / len(REQUIRED_FIELDS)
+
+    @property
+    def score(self) -> float:
+        """Overall confidence: mean confidence of the required fields (0 for missing ones)."""
+        return sum(self.confidence.get(name, 0) for name in REQUIRED_FIELDS) / len(REQUIRED_FIELDS)
+
+    def parsed_details(self) -> Dict[str, Any]:
+        """
+        Fields in the shape of the LLM parsing result.
+
+        The lists are empty only when the description cannot mention them;
+        otherwise they are None (unknown) until the LLM fills them. No model
+        reported a confidence, so `confidence_score` is None - the rules'
+        confidence is in the summary.
+        """
+        details = {name: self.fields.get(name) for name in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+        lists = None if self.needs_lists else []
+        details["parameters"] = {
+            "accessories": lists,
+            "issues": lists,
+            "upgrades": lists,
+            "is_shipping_available": self.shipping,
+            "confidence_score": None,
+        }
+        return details
+
+    def summary(self, source: str, llm_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Extraction metadata stored next to the analysis."""
+        return {
+            "source": source,
+            "completeness": round(self.completeness, 2),
+            "confidence": round(self.score, 2),
+            "llm_fields": llm_fields or [],
+        }
+
+
+def _first_match(patterns: List[Tuple[re.Pattern, str]], text: str) -> Optional[str]:
+    for pattern, value in patterns:
+        if pattern.search(text):
+            return value
+    return None
+
+
+def _find_brand(text: str) -> Optional[str]:
+    return _first_match(_BRAND_PATTERNS, text) or _first_match(_MODEL_PATTERNS, text)
+
+
+def _find_year(text: str) -> Tuple[Optional[int], float]:
+    match = _YEAR_EXPLICIT.search(text)
+    if match:
+        return int(match.group(1) or match.group(2)), DESCRIPTION_CONFIDENCE
+    match = _YEAR_ANY.search(text)
+    if match:
+        # A bare number may also be a part number or a date - trust it less
+        return int(match.group(1)), SCRAPED_CONFIDENCE
+    return None, 0.0
+
+
+def extract_fields(bike: Any) -> RuleExtraction:
+    """
+    Extract bike details from a GravelBike (or its dict) without the LLM.
+
+    Values from the OLX parameter table are trusted most, then values found
+    in the title, then in the description. Fields set by the scraper from
+    free text are kept with a lower confidence.
+    """
+    data = asdict(bike) if is_dataclass(bike) else dict(bike)
+    parameters = data.get("parameters") or {}
+    title = data.get("title") or ""
+    description = data.get("description") or ""
+    extraction = RuleExtraction()
+
+    for name, key in PARAMETER_KEYS.items():
+        value = parameters.get(key)
+        if value not in UNKNOWN_PARAMETER_VALUES:
+            extraction.set(name, value, PARAMETER_CONFIDENCE, "parameters")
+
+    for name, patterns in (("frame_material", _MATERIAL_PATTERNS), ("wheel_size", _WHEEL_PATTERNS),
+                           ("brake_type", _BRAKE_PATTERNS)):
+        extraction.set(name, _first_match(patterns, title), TITLE_CONFIDENCE, "title")
+        # Descriptions also name the material of other parts (carbon fork, aluminium wheels)
+        confidence = SCRAPED_CONFIDENCE if name == "frame_material" else DESCRIPTION_CONFIDENCE
+        extraction.set(name, _first_match(patterns, description), confidence, "description")
+
+    extraction.set("brand", _find_brand(title), TITLE_CONFIDENCE, "title")
+    extraction.set("brand", _find_brand(description), DESCRIPTION_CONFIDENCE, "description")
+
+    year, confidence = _find_year(f"{title}\n{description}")
+    extraction.set("year", year, confidence, "description")
+
+    size_match = _SIZE_PATTERN.search(description)
+    extraction.set("size", size_match.group(1) if size_match else None, DESCRIPTION_CONFIDENCE, "description")
+
+    if not _YEAR_HINT.search(f"{title}\n{description}"):
+        extraction.set_absent("year", DESCRIPTION_CONFIDENCE)
+    if not _SIZE_HINT.search(description):
+        extraction.set_absent("size", DESCRIPTION_CONFIDENCE)
+
+    # Values the scraper set from free text (the source is unknown)
+    for name in REQUIRED_FIELDS:
+        extraction.set(name, data.get(name), SCRAPED_CONFIDENCE, "scraper")
+    for name in OPTIONAL_FIELDS:
+        extraction.set(name, data.get(name), SCRAPED_CONFIDENCE, "scraper")
+
+    extraction.shipping = bool(_SHIPPING_PATTERN.search(description))
+    extraction.needs_lists = needs_list_extraction(description)
+    return extraction
+
+
+def needs_list_extraction(description: str) -> bool:
+    """Whether the description may mention accessories, issues or upgrades."""
+    text = normalize_description(description)
+    return any(not _NOT_A_LIST.search(text, max(0, match.start() - 40), match.start())
+               for match in _LIST_HINT.finditer(text))
+
+
+def merge_llm_fields(extraction: RuleExtraction, llm_result: Dict[str, Any],
+                     llm_fields: List[str]) -> Dict[str, Any]:
+    """Combine rule-based fields with the LLM answer for the fields it was asked about."""
+    details = extraction.parsed_details()
+    for name in llm_fields:
+        value = llm_result.get(name)
+        if value not in (None, ""):
+            details[name] = value
+    parameters = llm_result.get("parameters")
+    if isinstance(parameters, dict):
+        details["parameters"] = {**details["parameters"], **parameters}
+    return details
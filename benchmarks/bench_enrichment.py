@@ -0,0 +1,225 @@
+"""
+Benchmark of LLM enrichment throughput against the mock Ollama server.
+
+Starts `benchmarks/mock_ollama.py` (or uses a running server given with
+--url) and enriches synthetic bikes with `BikeDataEnricher` at each of the
+given concurrency levels. For every run it reports bikes per minute, the
+number of generations, per-call latency percentiles (client side, from the
+parser's tier statistics), retries, aborted and early-stopped generations,
+failed bikes and cache hit rates.
+
+Each run can make several passes over the same bikes with the same parser
+(`--passes 2`), so the second pass shows the effect of warm caches. Cache
+modes: `off` (no caching), `memory` (in-memory LRU only) and `disk`
+(in-memory LRU plus a fresh SQLite result cache).
+
+Results are saved as JSON in `benchmarks/results/` so runs of different
+versions can be compared.
+
+Usage:
+    python benchmarks/bench_enrichment.py --bikes 100 --concurrency 1 4 8 --slots 4
+    python benchmarks/bench_enrichment.py --mode combined --cache disk --passes 2
+    python benchmarks/bench_enrichment.py --failure-rate 0.05 --low-confidence-rate 0.2
+    python benchmarks/bench_enrichment.py --url http://localhost:11434 --bikes 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+import requests
+
+from LLM_Integration.adapter import COMBINED_MODE, PIPELINE_MODE, BikeDataEnricher, is_analysis_failed
+from LLM_Integration.model_tiers import TierStats
+from LLM_Integration.ollama_parser import LRUCache
+from LLM_Integration.result_cache import ResultCache
+from benchmarks.load_test import RESULTS_DIR, git_revision
+from benchmarks.synthetic import generate_bikes
+from olx_gravel_scraper import GravelBike
+
+CACHE_MODES = ["off", "memory", "disk"]
+
+
+def start_mock(args) -> subprocess.Popen:
+    command = [sys.executable, os.path.join("benchmarks", "mock_ollama.py"), "--port", str(args.port),
+               "--slots", str(args.slots), "--prompt-latency", str(args.prompt_latency),
+               "--token-latency", str(args.token_latency), "--failure-rate", str(args.failure_rate),
+               "--low-confidence-rate", str(args.low_confidence_rate), "--seed", str(args.seed)]
+    return subprocess.Popen(command)
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url + "/api/tags", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"Server at {url} was not ready after {timeout}s")
+
+
+def mock_stats(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        response = requests.get(url + "/mock/stats", timeout=1)
+        return response.json() if response.status_code == 200 else None
+    except requests.RequestException:
+        return None
+
+
+def hit_rate(hits: int, misses: int) -> Optional[float]:
+    return hits / (hits + misses) if hits + misses else None
+
+
+def run_pass(enricher: BikeDataEnricher, bikes: List[GravelBike], concurrency: int) -> Dict[str, Any]:
+    """Enrich all bikes once and return the numbers of this pass."""
+    parser = enricher.parser
+    parser.tier_stats = TierStats()
+    usage_before = dict(parser.usage)
+    cache_before = parser.cache_counters()
+
+    start = time.perf_counter()
+    results = asyncio.run(enricher.enrich_bikes_async(bikes, max_in_flight=concurrency))
+    elapsed = time.perf_counter() - start
+
+    usage = {key: parser.usage[key] - usage_before[key] for key in usage_before}
+    cache = {key: value - cache_before[key] for key, value in parser.cache_counters().items()}
+    tiers = parser.tier_stats.snapshot()
+    return {
+        "elapsed_s": elapsed,
+        "bikes_per_min": len(bikes) / elapsed * 60 if elapsed else 0.0,
+        "failed_bikes": sum(1 for bike in results if is_analysis_failed(bike["ai_analysis"])),
+        "generations": usage["requests"],
+        "calls": sum(stats["calls"] for stats in tiers["models"].values()),
+        "retries": usage["retries"],
+        "aborted": usage["aborted"],
+        "early_stops": usage["early_stops"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "memory_hit_rate": hit_rate(cache["memory_hits"], cache["memory_misses"]),
+        "disk_hit_rate": hit_rate(cache["disk_hits"], cache["disk_misses"]),
+        "rules": dict(enricher.rule_stats),
+        "models": tiers["models"],
+        "tasks": tiers["tasks"],
+    }
+
+
+def run_concurrency(args, url: str, bikes: List[GravelBike], concurrency: int) -> List[Dict[str, Any]]:
+    enricher = BikeDataEnricher(ollama_url=url, mode=args.mode, use_rules=not args.no_rules)
+    parser = enricher.parser
+    if not parser.is_llm_available:
+        raise SystemExit(f"Model {parser.llm_model} is not available at {url}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        parser.result_cache = ResultCache(os.path.join(directory, "llm_cache.db")) if args.cache == "disk" else None
+        if args.cache == "off":
+            parser.analysis_cache = LRUCache(max_bytes=0)
+        passes = []
+        for number in range(args.passes):
+            enricher.rule_stats = {key: 0 for key in enricher.rule_stats}
+            result = run_pass(enricher, bikes, concurrency)
+            result["pass"] = number + 1
+            passes.append(result)
+        return passes
+
+
+def format_rate(rate: Optional[float]) -> str:
+    return "-" if rate is None else f"{rate:.0%}"
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"\n{'conc':>5} {'pass':>5} {'bikes/min':>10} {'calls':>6} {'retries':>8} {'aborted':>8} "
+          f"{'early':>6} {'failed':>7} {'mem hit':>8} {'disk hit':>9}")
+    for concurrency, passes in results["runs"].items():
+        for result in passes:
+            print(f"{concurrency:>5} {result['pass']:>5} {result['bikes_per_min']:>10.1f} {result['calls']:>6} "
+                  f"{result['retries']:>8} {result['aborted']:>8} {result['early_stops']:>6} "
+                  f"{result['failed_bikes']:>7} {format_rate(result['memory_hit_rate']):>8} "
+                  f"{format_rate(result['disk_hit_rate']):>9}")
+            for model, stats in result["models"].items():
+                print(f"{'':>11} {model}: {stats['calls']} calls, latency p50 {stats['p50_seconds']:.2f} s, "
+                      f"p90 {stats['p90_seconds']:.2f} s, p99 {stats['p99_seconds']:.2f} s")
+            for kind, stats in result["tasks"].items():
+                print(f"{'':>11} {kind}: {stats['requests']} requests, "
+                      f"{format_rate(stats['escalation_rate'])} escalated")
+    server = results.get("server")
+    if server:
+        print(f"\nMock server: {server['requests']} requests, {server['failed']} failed, "
+              f"{server['cancelled']} cancelled, max {server['max_in_flight']} in flight, "
+              f"max {server['max_queued']} queued")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM enrichment against a mock Ollama server")
+    parser.add_argument("--bikes", type=int, default=100, help="Number of synthetic bikes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8],
+                        help="LLM requests kept in flight by the enricher (one run per value)")
+    parser.add_argument("--mode", default=PIPELINE_MODE, choices=[PIPELINE_MODE, COMBINED_MODE])
+    parser.add_argument("--no-rules", action="store_true", help="Disable the rule-based fast path")
+    parser.add_argument("--cache", default="off", choices=CACHE_MODES)
+    parser.add_argument("--passes", type=int, default=1, help="Passes over the same bikes per run")
+    parser.add_argument("--url", help="Use a running (mock or real) Ollama server instead of starting the mock")
+    parser.add_argument("--port", type=int, default=11435, help="Port of the started mock server")
+    parser.add_argument("--slots", type=int, default=4, help="Parallel slots of the mock server")
+    parser.add_argument("--prompt-latency", type=float, default=0.5, help="Mock seconds per 1000 prompt tokens")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Mock seconds per generated token")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of failing mock generations")
+    parser.add_argument("--low-confidence-rate", type=float, default=0.0,
+                        help="Share of mock answers with a low confidence (escalated by model tiers)")
+    parser.add_argument("--output", help="Where to save the results (default: benchmarks/results/enrichment-<time>-<rev>.json)")
+    args = parser.parse_args()
+
+    bikes = [GravelBike(**bike) for bike in generate_bikes(args.bikes, args.seed)]
+    server = None
+    url = args.url
+    try:
+        if url is None:
+            server = start_mock(args)
+            url = f"http://127.0.0.1:{args.port}"
+        wait_until_ready(url)
+
+        results = {
+            "config": {
+                "revision": git_revision(),
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "url": url,
+                "mock": args.url is None,
+                **{key: value for key, value in vars(args).items() if key not in ("url", "output")},
+            },
+            "runs": {},
+        }
+        for concurrency in args.concurrency:
+            print(f"Enriching {len(bikes)} bikes with {concurrency} requests in flight...")
+            results["runs"][concurrency] = run_concurrency(args, url, bikes, concurrency)
+        results["server"] = mock_stats(url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"enrichment-{stamp}-{results['config']['revision'] or 'unknown'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark of the binary response formats of `/api/data/bikes?include=ai`.
+
+Pulls the full dataset as JSON, MessagePack and Arrow IPC (with and without
+gzip) and measures what an analytic client pays: bytes on the wire, time to
+receive the body and time to turn it into a pandas DataFrame.
+
+In the Arrow stream the nested `parameters` and `ai_analysis` fields are JSON
+text columns, so the Arrow frame leaves them unparsed while the JSON and
+MessagePack frames hold Python dicts.
+
+Requires the optional `msgpack` and `pyarrow` packages from
+`requirements-optional.txt` (formats that are not installed are skipped).
+
+Usage:
+    python benchmarks/bench_formats.py --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+import orjson
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import server
+from dataset_cache import MEDIA_TYPES, DatasetCache, available_formats
+from storage import BikeStorage
+from benchmarks.synthetic import generate_bikes, generate_enrichments
+
+
+def decode_json(body: bytes) -> pd.DataFrame:
+    return pd.DataFrame(orjson.loads(body))
+
+
+def decode_msgpack(body: bytes) -> pd.DataFrame:
+    import msgpack
+    return pd.DataFrame(msgpack.unpackb(body, raw=False))
+
+
+def decode_arrow(body: bytes) -> pd.DataFrame:
+    import pyarrow
+    return pyarrow.ipc.open_stream(body).read_pandas()
+
+
+DECODERS = {"json": decode_json, "msgpack": decode_msgpack, "arrow": decode_arrow}
+
+
+def measure(client: TestClient, fmt: str, compressed: bool, repeat: int) -> dict:
+    headers = {"Accept": MEDIA_TYPES[fmt], "Accept-Encoding": "gzip" if compressed else "identity"}
+    # The first request encodes the format for this dataset version - not measured
+    client.get("/api/data/bikes?include=ai", headers=headers).raise_for_status()
+
+    fetch_times, decode_times = [], []
+    wire_bytes = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/api/data/bikes?include=ai", headers=headers)
+        response.raise_for_status()
+        # httpx decompresses transparently - count the compressed size separately
+        body = response.content
+        fetch_times.append((time.perf_counter() - start) * 1000)
+        wire_bytes = len(gzip.compress(body, 6)) if compressed else len(body)
+
+        start = time.perf_counter()
+        frame = DECODERS[fmt](body)
+        decode_times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "rows": len(frame),
+        "mb": wire_bytes / 1e6,
+        "fetch_ms": statistics.median(fetch_times),
+        "decode_ms": statistics.median(decode_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs MessagePack vs Arrow data pulls")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    formats = available_formats()
+    print(f"{'bikes':>8} {'format':>8} {'gzip':>5} {'MB':>8} {'fetch ms':>10} {'decode ms':>10} {'total ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            bikes = generate_bikes(size)
+            storage = BikeStorage(os.path.join(tmp, f"bikes_{size}.db"))
+            storage.upsert_bikes(bikes, record_changes=False)
+            storage.save_enrichments(generate_enrichments(bikes), record_changes=False)
+            server.bikes_ai_dataset = DatasetCache(
+                "bikes-ai", lambda: storage.version_tag("bikes", "enrichments"),
+                lambda: storage.iter_bikes(include_ai=True), server.validate_bike)
+            client = TestClient(server.app)
+
+            for fmt in formats:
+                for compressed in (False, True):
+                    result = measure(client, fmt, compressed, args.repeat)
+                    total = result["fetch_ms"] + result["decode_ms"]
+                    print(f"{size:>8} {fmt:>8} {'yes' if compressed else 'no':>5} {result['mb']:>8.2f} "
+                          f"{result['fetch_ms']:>10.1f} {result['decode_ms']:>10.1f} {total:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
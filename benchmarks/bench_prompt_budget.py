@@ -0,0 +1,137 @@
+"""
+Benchmark of prompt normalization and token budgeting.
+
+Runs offline on a scraped dataset. For every prompt type it compares the
+estimated prompt tokens with the raw description (or the full JSON dump
+for value analysis) against the normalized, budgeted input, and
+reports the time spent preparing the input per call.
+
+Prompt processing time grows with the number of prompt tokens, so the
+token reduction approximates the time saved per generation. With `--url`
+the same prompts are also sent to a server (Ollama or
+benchmarks/mock_ollama.py) with and without budgeting, and the prompt
+tokens and prompt evaluation time reported by the server are compared.
+
+Usage:
+    python benchmarks/bench_prompt_budget.py
+    python benchmarks/bench_prompt_budget.py --budget 300 --value-budget 300
+    python benchmarks/bench_prompt_budget.py --url http://127.0.0.1:11435 --live-bikes 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+from LLM_Integration.ollama_parser import LRUCache, OllamaParser
+from LLM_Integration.prompt_budget import (DESCRIPTION_TOKEN_BUDGET, VALUE_DATA_TOKEN_BUDGET, compact_json,
+                                           estimate_tokens)
+from LLM_Integration.rules import extract_fields
+
+# Category section used as a stand-in for the LLM answer in the value prompt input
+SAMPLE_CATEGORY = {"primary_category": "gravel", "subcategory": "endurance", "intended_use": "all-road",
+                   "price_category": "mid-range", "confidence": 8}
+
+
+def configure(parser: OllamaParser, budget: int, value_budget: int, raw: bool = False) -> OllamaParser:
+    parser.description_token_budget = budget
+    parser.value_data_token_budget = value_budget
+    if raw:
+        # Prompts as before budgeting: the description as is, the value data as a full JSON dump
+        parser._prepare_description = lambda description: description
+        parser._create_value_prompt = lambda data: OllamaParser._create_value_prompt(parser, data).replace(
+            compact_json(data, value_budget), json.dumps(data, sort_keys=True))
+    return parser
+
+
+def prompt_builder(budget: int, value_budget: int, raw: bool = False) -> OllamaParser:
+    """Parser used only for its prompt builders (no server needed)."""
+    return configure(OllamaParser.__new__(OllamaParser), budget, value_budget, raw)
+
+
+def live_usage(url: str, bikes: list, budget: int, value_budget: int, raw: bool) -> dict:
+    """Send the parsing, categorization and value prompts of the bikes to a server and return `parser.usage`."""
+    parser = configure(OllamaParser(ollama_url=url, cache_path=None), budget, value_budget, raw)
+    if not parser.is_llm_available:
+        raise SystemExit(f"Model {parser.llm_model} is not available at {url}")
+    # Measure the prompts, not the cache
+    parser.analysis_cache = LRUCache(max_bytes=0)
+    for bike in bikes:
+        parser.parse_bike_description(bike["description"])
+        parser.categorize_bike(bike["title"], bike["description"])
+        parser.identify_bike_value({**extract_fields(bike).parsed_details(), **SAMPLE_CATEGORY})
+    return parser.usage
+
+
+def prompts(parser: OllamaParser, bike: dict, value_data: dict) -> dict:
+    description = bike["description"]
+    return {
+        "parse": parser._create_bike_parsing_prompt(description),
+        "categorize": parser._create_categorization_prompt(bike["title"], description),
+        "combined": parser._create_combined_prompt(bike["title"], description),
+        "value": parser._create_value_prompt(value_data),
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt normalization and token budgets")
+    parser.add_argument("--input", default="data/gravel_bikes.json", help="Scraped bikes (JSON)")
+    parser.add_argument("--budget", type=int, default=DESCRIPTION_TOKEN_BUDGET, help="Description token budget")
+    parser.add_argument("--value-budget", type=int, default=VALUE_DATA_TOKEN_BUDGET, help="Value data token budget")
+    parser.add_argument("--url", help="Also compare the usage reported by this server")
+    parser.add_argument("--live-bikes", type=int, default=20, help="Bikes sent to the server with --url")
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        bikes = [bike for bike in json.load(f) if bike.get("description")]
+
+    raw = prompt_builder(args.budget, args.value_budget, raw=True)
+    budgeted = prompt_builder(args.budget, args.value_budget)
+
+    raw_tokens, budgeted_tokens, seconds = {}, {}, []
+    for bike in bikes:
+        value_data = {**extract_fields(bike).parsed_details(), **SAMPLE_CATEGORY}
+        for kind, prompt in prompts(raw, bike, value_data).items():
+            raw_tokens.setdefault(kind, []).append(estimate_tokens(prompt))
+        start = time.perf_counter()
+        built = prompts(budgeted, bike, value_data)
+        seconds.append((time.perf_counter() - start) / len(built))
+        for kind, prompt in built.items():
+            budgeted_tokens.setdefault(kind, []).append(estimate_tokens(prompt))
+
+    print(f"Bikes: {len(bikes)}, description budget {args.budget} tokens, value data budget {args.value_budget} tokens")
+    print(f"{'prompt':>11} {'raw avg':>8} {'raw p95':>8} {'budget avg':>11} {'budget p95':>11} {'saved':>6}")
+    for kind in raw_tokens:
+        before, after = raw_tokens[kind], budgeted_tokens[kind]
+        saved = 1 - sum(after) / sum(before)
+        print(f"{kind:>11} {sum(before) / len(before):>8.0f} {percentile(before, 0.95):>8} "
+              f"{sum(after) / len(after):>11.0f} {percentile(after, 0.95):>11} {saved:>6.0%}")
+    print(f"Prompt preparation: {sum(seconds) / len(seconds) * 1000:.2f} ms per call "
+          f"(p95 {percentile(seconds, 0.95) * 1000:.2f} ms)")
+
+    if args.url:
+        sample = bikes[:args.live_bikes]
+        print(f"\nReported by {args.url} for {len(sample)} bikes (parse, categorize, value):")
+        print(f"{'prompts':>9} {'calls':>6} {'prompt tok/call':>16} {'prompt s/call':>14} {'estimated':>10}")
+        reported = {}
+        for name, raw_prompts in (("raw", True), ("budgeted", False)):
+            usage = reported[name] = live_usage(args.url, sample, args.budget, args.value_budget, raw_prompts)
+            calls = max(usage["requests"], 1)
+            print(f"{name:>9} {usage['requests']:>6} {usage['prompt_tokens'] / calls:>16.0f} "
+                  f"{usage['prompt_seconds'] / calls:>14.3f} {usage['estimated']:>10}")
+        for key, label in (("prompt_tokens", "prompt tokens"), ("prompt_seconds", "prompt time")):
+            if reported["raw"][key]:
+                print(f"Saved {label}: {1 - reported['budgeted'][key] / reported['raw'][key]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
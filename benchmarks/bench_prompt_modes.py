@@ -0,0 +1,94 @@
+"""
+Benchmark of the LLM enrichment prompt modes.
+
+Compares the three-call pipeline (parse description, categorize, value
+analysis) with the combined mode (one structured prompt and one generation
+per bike). For each mode it reports wall time per bike, the number of
+generations and the tokens processed by the model (prompt and completion
+tokens as reported by Ollama). With model tiers enabled it also prints the
+calls and mean latency of every model and the escalation rate of every task.
+Calls stopped before Ollama's final chunk have estimated token counts; their
+number is printed next to the per-call times.
+
+Runs against a live Ollama server (or benchmarks/mock_ollama.py); result
+caches are disabled so every bike is sent to the model. `--no-rules` sends
+every description to the parsing prompt, so the pipeline makes all three
+calls per bike.
+
+Usage:
+    python benchmarks/bench_prompt_modes.py --bikes 20 --concurrency 1
+    python benchmarks/bench_prompt_modes.py --url http://192.168.1.100:11434 --modes combined
+    python benchmarks/bench_prompt_modes.py --url http://127.0.0.1:11435 --no-rules
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+from LLM_Integration.adapter import COMBINED_MODE, PIPELINE_MODE, BikeDataEnricher, is_analysis_failed
+from LLM_Integration.ollama_parser import LRUCache
+from olx_gravel_scraper import GravelBike
+from benchmarks.synthetic import generate_bikes
+
+
+def run_mode(url: str, mode: str, bikes: list, concurrency: int, use_rules: bool = True) -> dict:
+    enricher = BikeDataEnricher(ollama_url=url, mode=mode, use_rules=use_rules)
+    parser = enricher.parser
+    if not parser.is_llm_available:
+        raise SystemExit(f"Model {parser.llm_model} is not available at {url}")
+    # Measure the model, not the caches
+    parser.result_cache = None
+    parser.analysis_cache = LRUCache(max_bytes=0)
+
+    start = time.perf_counter()
+    results = asyncio.run(enricher.enrich_bikes_async(bikes, max_in_flight=concurrency))
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for bike in results if is_analysis_failed(bike["ai_analysis"]))
+    count = len(bikes)
+    return {
+        "s_per_bike": elapsed / count,
+        "calls_per_bike": parser.usage["requests"] / count,
+        "prompt_tokens": parser.usage["prompt_tokens"] / count,
+        "completion_tokens": parser.usage["completion_tokens"] / count,
+        "prompt_seconds": parser.usage["prompt_seconds"] / max(parser.usage["requests"], 1),
+        "generation_seconds": parser.usage["generation_seconds"] / max(parser.usage["requests"], 1),
+        "estimated": parser.usage["estimated"],
+        "failed": failed,
+        "tiers": parser.tier_stats.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark three-call vs combined LLM enrichment")
+    parser.add_argument("--url", default="http://localhost:11434", help="Ollama server URL")
+    parser.add_argument("--bikes", type=int, default=20, help="Number of synthetic bikes")
+    parser.add_argument("--concurrency", type=int, default=1, help="LLM requests kept in flight")
+    parser.add_argument("--modes", nargs="+", default=[PIPELINE_MODE, COMBINED_MODE],
+                        choices=[PIPELINE_MODE, COMBINED_MODE])
+    parser.add_argument("--no-rules", action="store_true", help="Disable the rule-based fast path in pipeline mode")
+    args = parser.parse_args()
+
+    bikes = [GravelBike(**bike) for bike in generate_bikes(args.bikes)]
+    print(f"{'mode':>10} {'s/bike':>8} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'total tok':>10} {'failed':>7}")
+    for mode in args.modes:
+        result = run_mode(args.url, mode, bikes, args.concurrency, use_rules=not args.no_rules)
+        total = result["prompt_tokens"] + result["completion_tokens"]
+        print(f"{mode:>10} {result['s_per_bike']:>8.2f} {result['calls_per_bike']:>6.1f} "
+              f"{result['prompt_tokens']:>11.0f} {result['completion_tokens']:>10.0f} {total:>10.0f} "
+              f"{result['failed']:>7}")
+        print(f"{'':>10}   per call: prompt evaluation {result['prompt_seconds']:.2f} s, "
+              f"generation {result['generation_seconds']:.2f} s ({result['estimated']} calls estimated)")
+        for model, stats in result["tiers"]["models"].items():
+            print(f"{'':>10}   {model}: {stats['calls']} calls, {stats['avg_seconds']:.2f} s avg")
+        for kind, stats in result["tiers"]["tasks"].items():
+            print(f"{'':>10}   {kind}: {stats['escalation_rate']:.0%} escalated {stats['reasons']}")
+
+
+if __name__ == "__main__":
+    main()
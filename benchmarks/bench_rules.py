@@ -0,0 +1,196 @@
+"""
+Benchmark of the rule-based extraction of parsed details.
+
+Runs offline on a scraped dataset and reports how many bikes would skip the
+LLM parsing call, need a shortened prompt for accessories/issues/upgrades
+only or for the missing fields, or still need the full prompt, together
+with the prompt characters saved and the per-field coverage.
+
+Accuracy is measured two ways:
+- against the OLX parameter table: each field is extracted again with the
+  table removed and the title/description value compared with the table;
+- against the current LLM pipeline, when a reference file with enriched
+  bikes is given (bikes whose LLM parsing failed are ignored). This also
+  checks the accessories/issues/upgrades lists: bikes that skip the LLM
+  get empty lists, which should match the reference, and bikes whose
+  reference lists are not empty should be sent to the LLM.
+
+Usage:
+    python benchmarks/bench_rules.py
+    python benchmarks/bench_rules.py --input data/gravel_bikes.json --reference data/enriched_bikes.json
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+from LLM_Integration.ollama_parser import OllamaParser
+from LLM_Integration.prompt_budget import DESCRIPTION_TOKEN_BUDGET
+from LLM_Integration.rules import PARAMETER_KEYS, REQUIRED_FIELDS, UNKNOWN_PARAMETER_VALUES, extract_fields
+
+LISTS = ("accessories", "issues", "upgrades")
+
+
+def normalize(value) -> str:
+    return str(value).strip().lower().replace(",", ".").replace("”", '"')
+
+
+def decide(bike: dict, parser: OllamaParser):
+    """Decision for one bike and the characters of the prompt it would send."""
+    extraction = extract_fields(bike)
+    missing = extraction.missing()
+    if not missing and not extraction.needs_lists:
+        return "rules", extraction, 0
+    if not missing:
+        return "lists", extraction, len(parser._create_missing_fields_prompt(bike["description"],
+                                                                           extraction.fields, []))
+    if not extraction.fields:
+        return "llm", extraction, len(parser._create_bike_parsing_prompt(bike["description"]))
+    return "partial", extraction, len(parser._create_missing_fields_prompt(bike["description"],
+                                                                          extraction.fields, missing))
+
+
+def parameter_accuracy(bikes: list) -> dict:
+    """Per field: matches / compared of trusted text-derived values against the parameter table."""
+    scores = {}
+    for name, key in PARAMETER_KEYS.items():
+        if name == "size":
+            # The table has inch ranges ("19-20\""), descriptions mostly letters or centimetres
+            continue
+        matched = compared = 0
+        for bike in bikes:
+            expected = bike["parameters"].get(key)
+            if expected in (None, "") or expected in UNKNOWN_PARAMETER_VALUES:
+                continue
+            held_out = {**bike, "parameters": {k: v for k, v in bike["parameters"].items() if k != key},
+                        name: None}
+            extraction = extract_fields(held_out)
+            if name not in extraction.fields or name in extraction.missing():
+                continue
+            compared += 1
+            matched += normalize(extraction.fields[name]) == normalize(expected)
+        scores[name] = (matched, compared)
+    return scores
+
+
+def reference_details(reference: list) -> dict:
+    """Successful LLM parsed details by bike URL."""
+    parsed_by_url = {}
+    for bike in reference:
+        parsed = (bike.get("ai_analysis") or {}).get("parsed_details") or {}
+        if parsed and "error" not in parsed:
+            parsed_by_url[bike.get("url")] = parsed
+    return parsed_by_url
+
+
+def reference_accuracy(bikes: list, parsed_by_url: dict) -> dict:
+    """Per field: matches / compared of trusted rule values against the LLM parsed details."""
+    scores = {name: [0, 0] for name in REQUIRED_FIELDS}
+    for bike in bikes:
+        parsed = parsed_by_url.get(bike.get("url"))
+        if parsed is None:
+            continue
+        extraction = extract_fields(bike)
+        trusted = set(REQUIRED_FIELDS) - set(extraction.missing())
+        for name in trusted:
+            if parsed.get(name) in (None, ""):
+                continue
+            scores[name][1] += 1
+            scores[name][0] += normalize(extraction.fields[name]) == normalize(parsed[name])
+    return {name: tuple(score) for name, score in scores.items()}
+
+
+def list_accuracy(bikes: list, parsed_by_url: dict) -> dict:
+    """
+    Per list: bikes skipping the LLM whose reference list is also empty / bikes skipping the LLM,
+    and bikes sent to the LLM for the lists / bikes with a non-empty reference list.
+    """
+    scores = {}
+    for name in LISTS:
+        scores[f"{name} empty"] = [0, 0]
+        scores[f"{name} sent"] = [0, 0]
+    for bike in bikes:
+        parsed = parsed_by_url.get(bike.get("url"))
+        if parsed is None:
+            continue
+        extraction = extract_fields(bike)
+        skipped = not extraction.missing() and not extraction.needs_lists
+        parameters = parsed.get("parameters") or {}
+        for name in LISTS:
+            mentioned = bool(parameters.get(name))
+            if skipped:
+                scores[f"{name} empty"][1] += 1
+                scores[f"{name} empty"][0] += not mentioned
+            if mentioned:
+                scores[f"{name} sent"][1] += 1
+                scores[f"{name} sent"][0] += not skipped
+    return {name: tuple(score) for name, score in scores.items()}
+
+
+def print_scores(title: str, scores: dict) -> None:
+    print(f"\n{title}")
+    for name, (matched, compared) in scores.items():
+        rate = f"{matched / compared:.0%}" if compared else "n/a"
+        print(f"  {name:>15} {rate:>6} ({matched}/{compared})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rule-based extraction of bike details")
+    parser.add_argument("--input", default="data/gravel_bikes.json", help="Scraped bikes (JSON)")
+    parser.add_argument("--reference", default="data/enriched_bikes.json",
+                        help="Bikes enriched by the LLM pipeline (JSON), used as reference if present")
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        bikes = [bike for bike in json.load(f) if bike.get("description")]
+    llm = OllamaParser.__new__(OllamaParser)  # Only the prompt builders are used - no server needed
+    llm.description_token_budget = DESCRIPTION_TOKEN_BUDGET
+
+    decisions = Counter()
+    prompt_chars = full_chars = 0
+    coverage = Counter()
+    confidence = Counter()
+    for bike in bikes:
+        decision, extraction, chars = decide(bike, llm)
+        decisions[decision] += 1
+        prompt_chars += chars
+        full_chars += len(llm._create_bike_parsing_prompt(bike["description"]))
+        trusted = set(REQUIRED_FIELDS) - set(extraction.missing())
+        for name in REQUIRED_FIELDS:
+            coverage[name] += name in trusted
+            confidence[name] += extraction.confidence.get(name, 0)
+
+    count = len(bikes)
+    print(f"Bikes with a description: {count}")
+    for decision in ("rules", "lists", "partial", "llm"):
+        print(f"  {decision:>8}: {decisions[decision]:>5} ({decisions[decision] / count:.0%})")
+    print(f"Parsing calls saved: {decisions['rules']} of {count} ({decisions['rules'] / count:.0%})")
+    print(f"Parsing prompt characters: {prompt_chars} vs {full_chars} with the full prompt "
+          f"({1 - prompt_chars / full_chars:.0%} less)")
+
+    print("\nField coverage (trusted without the LLM) and mean confidence")
+    for name in REQUIRED_FIELDS:
+        print(f"  {name:>15} {coverage[name] / count:>6.0%} {confidence[name] / count:>6.2f}")
+
+    print_scores("Accuracy of title/description rules against the parameter table", parameter_accuracy(bikes))
+
+    if args.reference and os.path.exists(args.reference):
+        with open(args.reference, encoding="utf-8") as f:
+            parsed_by_url = reference_details(json.load(f))
+        scores = reference_accuracy(bikes, parsed_by_url)
+        if any(compared for _, compared in scores.values()):
+            print_scores("Agreement of trusted rule values with the LLM pipeline", scores)
+            print_scores("Accessories/issues/upgrades against the LLM pipeline "
+                         "(empty: skipped bikes with an empty list, sent: non-empty lists sent to the LLM)",
+                         list_accuracy(bikes, parsed_by_url))
+        else:
+            print(f"\nNo successful LLM parsing results in {args.reference} - agreement not computed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of the `/api/data/bikes` response path.
+
+Compares the previous implementation (json.load + `response_model=List[GravelBike]`
+validation and serialization on every request) with the current one (data
+read from the SQLite storage, validated once per dataset version and served
+as pre-encoded orjson bytes).
+
+Usage:
+    python benchmarks/bench_serialization.py --sizes 1000 10000 100000 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import server
+from dataset_cache import DatasetCache
+from storage import BikeStorage
+from benchmarks.synthetic import write_bikes_json
+
+
+def build_legacy_app(bikes_file: str) -> FastAPI:
+    """Recreate the previous per-request validation path for comparison."""
+    app = FastAPI()
+
+    @app.get("/api/data/bikes", response_model=List[server.GravelBike])
+    async def get_bikes():
+        with open(bikes_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    return app
+
+
+def measure(client: TestClient, repeat: int) -> dict:
+    """Run the request `repeat` times and collect wall time and CPU time."""
+    # The first request pays for loading/validation - report it separately
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    response = client.get("/api/data/bikes")
+    cold_ms = (time.perf_counter() - wall_start) * 1000
+    cold_cpu_ms = (time.process_time() - cpu_start) * 1000
+    response.raise_for_status()
+
+    latencies = []
+    cpu_times = []
+    for _ in range(repeat):
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        client.get("/api/data/bikes").raise_for_status()
+        latencies.append((time.perf_counter() - wall_start) * 1000)
+        cpu_times.append((time.process_time() - cpu_start) * 1000)
+
+    return {
+        "cold_ms": cold_ms,
+        "cold_cpu_ms": cold_cpu_ms,
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+        "cpu_ms": statistics.mean(cpu_times),
+        "bytes": len(response.content),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/data/bikes serialization paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'bikes':>8} {'path':>8} {'cold ms':>10} {'p50 ms':>10} {'max ms':>10} {'cpu ms':>10} {'MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            bikes_file = os.path.join(tmp, f"bikes_{size}.json")
+            write_bikes_json(bikes_file, size)
+
+            legacy = measure(TestClient(build_legacy_app(bikes_file)), args.repeat)
+
+            storage = BikeStorage(os.path.join(tmp, f"bikes_{size}.db"))
+            storage.import_json_files(bikes_file)
+            server.bikes_dataset = DatasetCache(
+                "bikes", lambda: storage.version_tag("bikes"), storage.iter_bikes, server.validate_bike)
+            fast = measure(TestClient(server.app), args.repeat)
+
+            for name, result in (("legacy", legacy), ("fast", fast)):
+                print(f"{size:>8} {name:>8} {result['cold_ms']:>10.1f} {result['p50_ms']:>10.1f} "
+                      f"{result['max_ms']:>10.1f} {result['cpu_ms']:>10.1f} {result['bytes'] / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
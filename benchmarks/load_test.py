@@ -0,0 +1,476 @@
+"""
+Load test of the dashboard endpoints of `server.py`.
+
+Generates a synthetic dataset of the requested size into `data/loadtest/`
+(bikes, AI enrichments and statistics stored through `BikeStorage`, plus the
+same data as `gravel_bikes.json`, `enriched_bikes.json` and `statistics.json`
+for servers that read the JSON files), starts uvicorn on it with `DATA_DIR`
+pointing there and drives the endpoints with many concurrent clients:
+
+    bikes           GET /api/data/bikes
+    bikes-ai        GET /api/data/bikes?include=ai
+    statistics      GET /api/data/statistics
+    enriched-bikes  GET /api/data/enriched-bikes
+    sse             concurrent GET /api/ai-analyze/progress streams
+    mixed           all of the above at once, like dashboard users opening the page
+
+For each scenario it reports throughput, latency percentiles, errors,
+transferred bytes and the server's RSS/PSS (summed over uvicorn and its
+workers). Results are saved as JSON in `benchmarks/results/` so runs of
+different versions can be compared.
+
+The data directory is only wiped if it is empty, the default `data/loadtest/`
+or was created by this script (it holds a `.loadtest` marker), so pointing
+`--data-dir` at real data fails instead of deleting it.
+
+To compare with a version that reads the JSON files from a fixed `data/`
+directory (such as the baseline), generate the dataset with `--prepare-only`,
+copy the JSON files into that checkout's `data/`, start its server and run
+the test against it with `--url` (servers without `/ready` are considered
+ready once `/api/data/statistics` answers).
+
+Usage:
+    python benchmarks/load_test.py --bikes 10000 --concurrency 50 --duration 15
+    python benchmarks/load_test.py --bikes 10000 --prepare-only
+    python benchmarks/load_test.py --url http://localhost:8000 --server-pid 1234
+    python benchmarks/load_test.py --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+import aiohttp
+
+from benchmarks.synthetic import generate_bikes, generate_enrichments
+
+LOADTEST_DATA_DIR = os.path.join("data", "loadtest")
+# Marks a data directory created by this script (safe to wipe on the next run)
+LOADTEST_MARKER = ".loadtest"
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+ENDPOINTS = {
+    "bikes": "/api/data/bikes",
+    "bikes-ai": "/api/data/bikes?include=ai",
+    "statistics": "/api/data/statistics",
+    "enriched-bikes": "/api/data/enriched-bikes",
+}
+SSE_PATH = "/api/ai-analyze/progress"
+SCENARIOS = list(ENDPOINTS) + ["sse", "mixed"]
+
+
+# --- Dataset ---
+
+def clear_data_dir(data_dir: str) -> None:
+    """Remove a previous load test dataset; refuse directories this script did not create."""
+    if os.path.isdir(data_dir) and os.listdir(data_dir):
+        owned = (os.path.exists(os.path.join(data_dir, LOADTEST_MARKER))
+                 or os.path.abspath(data_dir) == os.path.abspath(LOADTEST_DATA_DIR))
+        if not owned:
+            raise SystemExit(f"{data_dir} is not empty and was not created by the load test - "
+                             f"refusing to delete it (use an empty directory or {LOADTEST_DATA_DIR})")
+        shutil.rmtree(data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+    open(os.path.join(data_dir, LOADTEST_MARKER), 'w').close()
+
+
+def write_json(path: str, data: Any) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        # Statistics hold numpy numbers from pandas
+        json.dump(data, f, ensure_ascii=False, default=str)
+
+
+def prepare_dataset(data_dir: str, count: int, enriched_fraction: float, seed: int) -> None:
+    """Create a fresh SQLite database and JSON files with `count` synthetic bikes in `data_dir`."""
+    from storage import BikeStorage
+    from olx_gravel_scraper import OlxGravelScraper
+
+    clear_data_dir(data_dir)
+
+    start = time.perf_counter()
+    bikes = generate_bikes(count, seed)
+    enrichments = list(generate_enrichments(bikes, enriched_fraction, seed))
+    statistics = OlxGravelScraper().generate_statistics(bikes)
+    storage = BikeStorage(os.path.join(data_dir, "bikes.db"))
+    storage.upsert_bikes(bikes, record_changes=False)
+    storage.save_enrichments(enrichments, record_changes=False)
+    storage.save_statistics(statistics)
+    storage.close()
+
+    # The same data in the files read by servers without the database
+    analyses = dict(enrichments)
+    write_json(os.path.join(data_dir, "gravel_bikes.json"), bikes)
+    write_json(os.path.join(data_dir, "enriched_bikes.json"),
+               [dict(bike, ai_analysis=analyses[bike["url"]]) for bike in bikes if bike["url"] in analyses])
+    write_json(os.path.join(data_dir, "statistics.json"), statistics)
+    print(f"Generated {count} bikes ({enriched_fraction:.0%} enriched) in {data_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+# --- Server process ---
+
+def process_tree(pid: int) -> List[int]:
+    """Return `pid` and all of its descendants (uvicorn workers)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces - the parent pid follows the closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+
+def memory_usage(pid: int) -> Dict[str, float]:
+    """RSS and PSS (in MB) summed over the server process tree.
+
+    PSS splits shared pages (e.g. memory-mapped snapshots) between the processes
+    mapping them, so it shows the real cost of running several workers.
+    """
+    rss_kb = pss_kb = 0
+    for current in process_tree(pid):
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss_kb += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return {"rss_mb": rss_kb / 1024, "pss_mb": pss_kb / 1024}
+
+
+class MemorySampler:
+    """Samples server memory in the background and keeps the peak values."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak = {"rss_mb": 0.0, "pss_mb": 0.0}
+        self._task = None
+
+    async def _run(self):
+        while True:
+            usage = memory_usage(self.pid)
+            for key, value in usage.items():
+                self.peak[key] = max(self.peak[key], value)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        if self.pid:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        if self._task:
+            self._task.cancel()
+
+
+def start_server(data_dir: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATA_DIR=data_dir, LOG_LEVEL="WARNING")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--workers", str(workers),
+         "--no-access-log", "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 120.0) -> float:
+    """Wait for `/ready` to return 200; returns the time it took in seconds.
+
+    Servers without `/ready` (404) are ready once the statistics endpoint answers.
+    """
+    start = time.perf_counter()
+    path = "/ready"
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() - start < timeout:
+            try:
+                async with session.get(base_url + path) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+                    if response.status == 404 and path == "/ready":
+                        path = ENDPOINTS["statistics"]
+                        continue
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"Server at {base_url} was not ready after {timeout}s")
+
+
+# --- Load generation ---
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, bytes_received: int, elapsed: float) -> Dict[str, Any]:
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mb_per_s": bytes_received / 1e6 / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p90_ms": percentile(latencies_ms, 90),
+        "p99_ms": percentile(latencies_ms, 99),
+        "max_ms": max(latencies_ms, default=0.0),
+        "mean_ms": statistics.mean(latencies_ms) if latencies_ms else 0.0,
+    }
+
+
+async def http_worker(session: aiohttp.ClientSession, url: str, deadline: float, headers: Dict[str, str],
+                      conditional: bool, stats: Dict[str, Any]) -> None:
+    """Request `url` in a loop until the deadline, like a user refreshing the dashboard."""
+    etag = None
+    while time.perf_counter() < deadline:
+        request_headers = dict(headers)
+        if conditional and etag:
+            request_headers["If-None-Match"] = etag
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=request_headers) as response:
+                body = await response.read()
+                if response.status not in (200, 304):
+                    stats["errors"] += 1
+                    continue
+                etag = response.headers.get("ETag", etag)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats["errors"] += 1
+            continue
+        stats["latencies"].append(time.perf_counter() - start)
+        stats["bytes"] += len(body)
+
+
+async def sse_worker(session: aiohttp.ClientSession, url: str, deadline: float, stats: Dict[str, Any]) -> None:
+    """Hold a progress stream open until the deadline; latency is the time to the first event."""
+    start = time.perf_counter()
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=None, sock_read=None)) as response:
+            if response.status != 200:
+                stats["errors"] += 1
+                return
+            first = True
+            while time.perf_counter() < deadline:
+                try:
+                    line = await asyncio.wait_for(response.content.readline(), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                stats["bytes"] += len(line)
+                if line.startswith(b"data:"):
+                    stats["events"] += 1
+                    if first:
+                        stats["latencies"].append(time.perf_counter() - start)
+                        first = False
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        stats["errors"] += 1
+
+
+async def run_scenario(base_url: str, scenario: str, concurrency: int, duration: float,
+                       accept_encoding: str, conditional: bool, server_pid: Optional[int]) -> Dict[str, Any]:
+    headers = {"Accept-Encoding": accept_encoding}
+    if scenario == "mixed":
+        # Every dashboard user loads all datasets and keeps a progress stream open
+        targets = [(name, ENDPOINTS[name]) for name in ENDPOINTS] + [("sse", SSE_PATH)]
+    elif scenario == "sse":
+        targets = [("sse", SSE_PATH)]
+    else:
+        targets = [(scenario, ENDPOINTS[scenario])]
+
+    stats = {name: {"latencies": [], "errors": 0, "bytes": 0, "events": 0} for name, _ in targets}
+    connector = aiohttp.TCPConnector(limit=0)
+    # Compressed bodies are measured as received - decompressing them would only load the client
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False,
+                                     timeout=aiohttp.ClientTimeout(total=120)) as session:
+        with MemorySampler(server_pid) as sampler:
+            start = time.perf_counter()
+            deadline = start + duration
+            tasks = []
+            for _ in range(concurrency):
+                for name, path in targets:
+                    if name == "sse":
+                        tasks.append(sse_worker(session, base_url + path, deadline, stats[name]))
+                    else:
+                        tasks.append(http_worker(session, base_url + path, deadline, headers,
+                                                 conditional, stats[name]))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+
+    result = {"elapsed_s": elapsed, "memory": dict(sampler.peak), "endpoints": {}}
+    for name, endpoint_stats in stats.items():
+        summary = summarize(endpoint_stats["latencies"], endpoint_stats["errors"], endpoint_stats["bytes"], elapsed)
+        if name == "sse":
+            # For streams "requests" are connections and latency is the time to the first event
+            summary["events"] = endpoint_stats["events"]
+        result["endpoints"][name] = summary
+    return result
+
+
+# --- Reporting ---
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"\n{'scenario':>15} {'endpoint':>15} {'req':>8} {'err':>5} {'rps':>9} {'MB/s':>8} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'RSS MB':>8} {'PSS MB':>8}")
+    for scenario, result in results["scenarios"].items():
+        memory = result["memory"]
+        for endpoint, summary in result["endpoints"].items():
+            print(f"{scenario:>15} {endpoint:>15} {summary['requests']:>8} {summary['errors']:>5} "
+                  f"{summary['throughput_rps']:>9.1f} {summary['mb_per_s']:>8.2f} {summary['p50_ms']:>9.1f} "
+                  f"{summary['p90_ms']:>9.1f} {summary['p99_ms']:>9.1f} {summary['max_ms']:>9.1f} "
+                  f"{memory['rss_mb']:>8.1f} {memory['pss_mb']:>8.1f}")
+
+
+def compare(baseline_path: str, candidate_path: str) -> None:
+    """Print the change of the main numbers between two saved runs."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline_path} (rev {baseline['config'].get('revision')})")
+    print(f"candidate: {candidate_path} (rev {candidate['config'].get('revision')})")
+    print(f"\n{'scenario':>15} {'endpoint':>15} {'metric':>15} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for scenario, result in candidate["scenarios"].items():
+        base_result = baseline["scenarios"].get(scenario)
+        if base_result is None:
+            continue
+        for endpoint, summary in result["endpoints"].items():
+            base_summary = base_result["endpoints"].get(endpoint)
+            if base_summary is None:
+                continue
+            for metric in ("throughput_rps", "p50_ms", "p99_ms", "errors"):
+                _print_change(scenario, endpoint, metric, base_summary[metric], summary[metric])
+        for metric in ("rss_mb", "pss_mb"):
+            _print_change(scenario, "server", metric, base_result["memory"][metric], result["memory"][metric])
+
+
+def _print_change(scenario: str, endpoint: str, metric: str, old: float, new: float) -> None:
+    change = f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+    print(f"{scenario:>15} {endpoint:>15} {metric:>15} {old:>10.1f} {new:>10.1f} {change:>8}")
+
+
+async def run(args) -> Dict[str, Any]:
+    server = None
+    base_url = args.url
+    server_pid = args.server_pid
+    try:
+        if base_url is None:
+            prepare_dataset(args.data_dir, args.bikes, args.enriched_fraction, args.seed)
+            server = start_server(args.data_dir, args.port, args.workers)
+            server_pid = server.pid
+            base_url = f"http://127.0.0.1:{args.port}"
+        ready_s = await wait_until_ready(base_url)
+        print(f"Server ready after {ready_s:.2f}s")
+
+        results = {
+            "config": {
+                "revision": git_revision(),
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "url": base_url,
+                "bikes": args.bikes if args.url is None else None,
+                "workers": args.workers if args.url is None else None,
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "accept_encoding": args.accept_encoding,
+                "conditional": args.conditional,
+                "ready_s": ready_s,
+            },
+            "scenarios": {},
+        }
+        if server_pid:
+            results["config"]["idle_memory"] = memory_usage(server_pid)
+
+        for scenario in args.scenarios:
+            print(f"Running {scenario} ({args.concurrency} clients, {args.duration:.0f}s)...")
+            results["scenarios"][scenario] = await run_scenario(
+                base_url, scenario, args.concurrency, args.duration, args.accept_encoding,
+                args.conditional, server_pid)
+        return results
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard API endpoints")
+    parser.add_argument("--bikes", type=int, default=10000, help="Size of the synthetic dataset")
+    parser.add_argument("--enriched-fraction", type=float, default=0.8,
+                        help="Fraction of bikes with a synthetic AI analysis")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=LOADTEST_DATA_DIR)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID of the server given with --url (for memory stats)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients per endpoint")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--accept-encoding", default="gzip, br",
+                        help='Accept-Encoding sent by the clients ("identity" disables compression)')
+    parser.add_argument("--conditional", action="store_true",
+                        help="Revalidate with If-None-Match like a browser with a warm cache")
+    parser.add_argument("--output", help="Where to save the results (default: benchmarks/results/<time>-<rev>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two saved result files and exit")
+    parser.add_argument("--prepare-only", action="store_true",
+                        help="Generate the dataset in --data-dir and exit (to test another checkout with --url)")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.prepare_only:
+        prepare_dataset(args.data_dir, args.bikes, args.enriched_fraction, args.seed)
+        return
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['config']['revision'] or 'unknown'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
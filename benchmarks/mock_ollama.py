@@ -0,0 +1,253 @@
+"""
+Mock of the Ollama API for offline LLM benchmarks.
+
+Serves `GET /api/tags` and `POST /api/generate` (streamed NDJSON or a single
+JSON response, like Ollama with `"stream": false`). Generations return canned
+JSON for the prompt types of `OllamaParser` (parsing, missing fields,
+categorization, value analysis, combined analysis), recognised by the
+request header line of the prompt.
+
+Timing imitates a local model:
+- prompt evaluation takes `--prompt-latency` seconds per 1000 prompt tokens,
+- each streamed token takes `--token-latency` seconds,
+- at most `--slots` generations run at once (OLLAMA_NUM_PARALLEL); further
+  requests wait in a queue.
+
+`--trailing-tokens` streams whitespace tokens after the object before the
+final chunk, like a model that does not stop right after the closing brace.
+`--failure-rate` makes a share of requests fail (HTTP 500, an error chunk or
+a truncated stream) and `--low-confidence-rate` makes a share of answers
+report confidence 3, which the model tiers escalate. `GET /mock/stats`
+returns request counters.
+
+Usage:
+    python benchmarks/mock_ollama.py --port 11435 --slots 4 --token-latency 0.01
+    python benchmarks/mock_ollama.py --responses canned.json --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+# Models reported by /api/tags (the parser's default small and large models)
+DEFAULT_MODELS = ["qwen2.5:3b", "deepseek-r1:14b"]
+
+# Characters per token used to report token counts
+CHARS_PER_TOKEN = 3.5
+# Characters of output sent in one streamed chunk (one "token")
+CHUNK_CHARS = 4
+
+# Prompt header -> response kind (the first matching header wins)
+PROMPT_KINDS = [
+    ("=== ALREADY KNOWN ===", "missing_fields"),
+    ("BICYCLE LISTING PARSING REQUEST", "parse"),
+    ("BICYCLE CATEGORIZATION REQUEST", "categorize"),
+    ("BICYCLE VALUE ANALYSIS REQUEST", "value"),
+    ("BICYCLE LISTING ANALYSIS REQUEST", "combined"),
+]
+
+PARSED_DETAILS = {
+    "brand": "Kross", "model": "Esker 4.0", "year": 2022, "condition": "Używane", "color": "Szary",
+    "seller_type": "Prywatne", "bike_type": "Gravel", "size": "M", "frame_size_desc": None,
+    "frame_material": "Aluminium", "wheel_size": "28\"", "derailleur_type": "Shimano GRX 400",
+    "gears": "2x10", "brake_type": "Tarczowe hydrauliczne", "weight": "10.2 kg", "suspension": None,
+    "price": {"amount": 4500, "currency": "PLN", "negotiable": True},
+    "parameters": {"accessories": ["błotniki"], "issues": [], "upgrades": ["opony Schwalbe G-One"],
+                   "is_shipping_available": True, "confidence_score": 8},
+}
+CATEGORY = {"primary_category": "gravel", "subcategory": "endurance", "intended_use": "all-road",
+            "price_category": "mid-range", "confidence": 8}
+VALUE = {
+    "value_analysis": {"estimated_value_range": {"low": 4000, "high": 5000, "currency": "PLN"},
+                       "value_assessment": "fair", "price_difference_percent": 0},
+    "selling_points": ["hydrauliczne hamulce tarczowe", "napęd GRX"],
+    "concerns": [],
+    "overall_recommendation": "Uczciwa cena za zadbany rower.",
+    "confidence": 8,
+}
+DEFAULT_RESPONSES = {
+    "parse": PARSED_DETAILS,
+    "missing_fields": {"year": 2022, "size": "M",
+                       "parameters": {"accessories": [], "issues": [], "upgrades": [], "confidence_score": 8}},
+    "categorize": CATEGORY,
+    "value": VALUE,
+    "combined": {"parsed_details": PARSED_DETAILS, "category": CATEGORY, "value": VALUE},
+    "unknown": {"result": None},
+}
+
+
+def prompt_kind(prompt: str) -> str:
+    for header, kind in PROMPT_KINDS:
+        if header in prompt:
+            return kind
+    return "unknown"
+
+
+def with_low_confidence(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a canned response with every reported confidence set to 3."""
+    def lower(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: 3 if key in ("confidence", "confidence_score") else lower(item)
+                    for key, item in value.items()}
+        return value
+    return lower(response)
+
+
+class MockOllama:
+    """State of the mock server: configuration, generation slots and counters."""
+
+    def __init__(self, models=None, slots: int = 4, prompt_latency: float = 0.5, token_latency: float = 0.01,
+                 failure_rate: float = 0.0, low_confidence_rate: float = 0.0,
+                 responses: Optional[Dict[str, Any]] = None, seed: Optional[int] = None,
+                 trailing_tokens: int = 0):
+        self.models = models or DEFAULT_MODELS
+        self.slots_count = slots
+        self.prompt_latency = prompt_latency
+        self.token_latency = token_latency
+        self.failure_rate = failure_rate
+        self.low_confidence_rate = low_confidence_rate
+        self.responses = {**DEFAULT_RESPONSES, **(responses or {})}
+        self.random = random.Random(seed)
+        self.trailing_tokens = trailing_tokens
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.stats = {"requests": 0, "completed": 0, "failed": 0, "cancelled": 0, "in_flight": 0,
+                      "max_in_flight": 0, "queued": 0, "max_queued": 0, "by_kind": {}, "by_model": {}}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_get("/mock/stats", self.get_stats)
+        app.on_startup.append(self._startup)
+        return app
+
+    async def _startup(self, app: web.Application) -> None:
+        self.slots = asyncio.Semaphore(self.slots_count)
+
+    async def tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": name, "model": name} for name in self.models]})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def _count(self, group: str, key: str) -> None:
+        self.stats[group][key] = self.stats[group].get(key, 0) + 1
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get("model")
+        if model not in self.models:
+            return web.json_response({"error": f"model '{model}' not found"}, status=404)
+        prompt = body.get("prompt", "")
+        kind = prompt_kind(prompt)
+        self.stats["requests"] += 1
+        self._count("by_kind", kind)
+        self._count("by_model", model)
+
+        response = self.responses.get(kind, DEFAULT_RESPONSES["unknown"])
+        if self.random.random() < self.low_confidence_rate:
+            response = with_low_confidence(response)
+        output = json.dumps(response, ensure_ascii=False)
+        failure = self.random.choice(["status", "error_chunk", "truncated"]) \
+            if self.random.random() < self.failure_rate else None
+
+        self.stats["queued"] += 1
+        self.stats["max_queued"] = max(self.stats["max_queued"], self.stats["queued"])
+        async with self.slots:
+            self.stats["queued"] -= 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            try:
+                return await self._run_generation(request, body, model, prompt, output, failure)
+            except (ConnectionResetError, asyncio.CancelledError):
+                # The client closed the connection (early stop) - the generation is cancelled
+                self.stats["cancelled"] += 1
+                raise
+            finally:
+                self.stats["in_flight"] -= 1
+
+    async def _run_generation(self, request: web.Request, body: Dict[str, Any], model: str, prompt: str,
+                              output: str, failure: Optional[str]) -> web.StreamResponse:
+        started = time.perf_counter()
+        prompt_tokens = int(len(prompt) / CHARS_PER_TOKEN)
+        prompt_seconds = self.prompt_latency * prompt_tokens / 1000
+        await asyncio.sleep(prompt_seconds)
+
+        if failure == "status":
+            self.stats["failed"] += 1
+            return web.json_response({"error": "mock failure"}, status=500)
+
+        chunks = [output[i:i + CHUNK_CHARS] for i in range(0, len(output), CHUNK_CHARS)]
+        chunks += ["\n"] * self.trailing_tokens
+        if failure == "truncated":
+            chunks = chunks[:len(chunks) // 2]
+
+        def final_chunk() -> Dict[str, Any]:
+            return {
+                "model": model, "response": "", "done": True,
+                "prompt_eval_count": prompt_tokens, "eval_count": len(chunks),
+                "prompt_eval_duration": int(prompt_seconds * 1e9),
+                "eval_duration": int((time.perf_counter() - started - prompt_seconds) * 1e9),
+                "total_duration": int((time.perf_counter() - started) * 1e9),
+            }
+
+        if not body.get("stream", True):
+            await asyncio.sleep(self.token_latency * len(chunks))
+            if failure is not None:
+                self.stats["failed"] += 1
+                return web.json_response({"error": "mock failure"}, status=500)
+            self.stats["completed"] += 1
+            return web.json_response({**final_chunk(), "response": output})
+
+        stream = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await stream.prepare(request)
+        for index, chunk in enumerate(chunks):
+            if failure == "error_chunk" and index == len(chunks) // 2:
+                self.stats["failed"] += 1
+                await stream.write(json.dumps({"error": "mock failure"}).encode() + b"\n")
+                return stream
+            await asyncio.sleep(self.token_latency)
+            await stream.write(json.dumps({"model": model, "response": chunk, "done": False},
+                                          ensure_ascii=False).encode() + b"\n")
+        if failure == "truncated":
+            self.stats["failed"] += 1
+        else:
+            self.stats["completed"] += 1
+        await stream.write(json.dumps(final_chunk()).encode() + b"\n")
+        await stream.write_eof()
+        return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for offline LLM benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS, help="Models reported as available")
+    parser.add_argument("--slots", type=int, default=4, help="Generations processed at once")
+    parser.add_argument("--prompt-latency", type=float, default=0.5, help="Seconds per 1000 prompt tokens")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Seconds per generated token")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of failing generations")
+    parser.add_argument("--low-confidence-rate", type=float, default=0.0,
+                        help="Share of answers reporting a low confidence")
+    parser.add_argument("--responses", help="JSON file with canned responses by prompt kind "
+                                            "(parse, missing_fields, categorize, value, combined)")
+    parser.add_argument("--trailing-tokens", type=int, default=0,
+                        help="Whitespace tokens streamed after the object before the final chunk")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+    mock = MockOllama(args.models, args.slots, args.prompt_latency, args.token_latency, args.failure_rate,
+                      args.low_confidence_rate, responses, args.seed, args.trailing_tokens)
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Generator of synthetic OLX bike listings for benchmarks and load tests.
+
+The records follow the shape of `data/gravel_bikes.json` so they can be fed
+to the API and the LLM enrichment pipeline without a live scrape.
+"""
+import json
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+BRANDS = ["Giant", "Trek", "Specialized", "Cannondale", "Kross", "Cube", "Merida",
+          "Canyon", "Orbea", "Ridley", "Romet", "Marin", "Scott", "Rose", "Focus"]
+GROUPSETS = ["Shimano GRX 400", "Shimano GRX 600", "Shimano GRX 810", "Shimano 105",
+             "Shimano Tiagra", "Shimano Sora", "Shimano Claris", "SRAM Apex 1",
+             "SRAM Rival AXS", "Shimano Ultegra"]
+MATERIALS = ["Aluminium", "Karbon", "Stal", "Tytan"]
+CONDITIONS = ["Używane", "Nowe"]
+BRAKES = ["Tarczowe mechaniczne", "Tarczowe hydrauliczne", "Szczękowe"]
+SIZES = ["S", "M", "L", "XL", "52 cm", "54 cm", "56 cm", "17-18\"", "19-20\""]
+CITIES = ["Warszawa", "Kraków", "Poznań", "Wrocław", "Gdańsk", "Łódź", "Lublin"]
+CATEGORIES = [("gravel", "endurance"), ("gravel", "race"), ("gravel", "bikepacking"), ("road", "endurance")]
+VALUE_ASSESSMENTS = ["fair", "overpriced", "underpriced"]
+
+
+def generate_bike(i: int, rng: random.Random) -> Dict[str, Any]:
+    """Generate a single synthetic bike listing."""
+    brand = rng.choice(BRANDS)
+    groupset = rng.choice(GROUPSETS)
+    material = rng.choice(MATERIALS)
+    size = rng.choice(SIZES)
+    year = rng.randint(2012, 2025)
+    condition = rng.choice(CONDITIONS)
+    brake = rng.choice(BRAKES)
+    city = rng.choice(CITIES)
+    price = float(rng.randrange(1500, 25000, 50))
+
+    description = (
+        f"Opis\nSprzedam rower gravel {brand} z {year} roku.\n"
+        f"Rama {material.lower()} w rozmiarze {size}, napęd {groupset}.\n"
+        f"Hamulce: {brake.lower()}. Stan: {condition.lower()}.\n"
+        + "Rower regularnie serwisowany, nowe opony i łańcuch.\n" * rng.randint(1, 4)
+        + "Możliwa wysyłka. Więcej informacji pod numerem telefonu."
+    )
+
+    parameters = {
+        "Typ sprzedawcy": rng.choice(["Prywatne", "Firmowe"]),
+        "Marka": brand,
+        "Stan": condition,
+        "Typ hamulca": brake,
+        "Materiał ramy": material,
+        "Rozmiar koła": "28\"",
+        "Rozmiar ramy": size,
+    }
+
+    return {
+        "title": f"Rower gravel {brand} {groupset} {size} {city} • OLX.pl",
+        "price": price,
+        "location": city,
+        "date_added": f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(2023, 2025)}",
+        "url": f"https://www.olx.pl/oferta/rower-gravel-{brand.lower()}-synthetic-CID767-ID{i:08d}.html",
+        "brand": brand,
+        "size": size,
+        "year": year,
+        "description": description,
+        "condition": condition,
+        "color": None,
+        "derailleur_type": None,
+        "brake_type": brake,
+        "frame_material": material,
+        "wheel_size": "28\"",
+        "seller_type": parameters["Typ sprzedawcy"],
+        "bike_type": None,
+        "frame_size_desc": size,
+        "gears": None,
+        "weight": None,
+        "suspension": None,
+        "parameters": parameters,
+    }
+
+
+def generate_bikes(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate `count` synthetic bike listings (deterministic for a given seed)."""
+    rng = random.Random(seed)
+    return [generate_bike(i, rng) for i in range(count)]
+
+
+def write_bikes_json(path: str, count: int, seed: int = 42) -> None:
+    """Write `count` synthetic bikes to a JSON file in the scraper's format."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(generate_bikes(count, seed), f, ensure_ascii=False, indent=2)
+
+
+def generate_ai_analysis(bike: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Generate an `ai_analysis` block shaped like the output of BikeDataEnricher."""
+    primary, subcategory = rng.choice(CATEGORIES)
+    low = round(bike["price"] * rng.uniform(0.7, 1.0), -1)
+    return {
+        "parsed_details": {
+            "title": bike["title"],
+            "brand": bike["brand"],
+            "year": bike["year"],
+            "condition": bike["condition"],
+            "frame_material": bike["frame_material"],
+            "wheel_size": bike["wheel_size"],
+            "brake_type": bike["brake_type"],
+            "bicycle_type": primary,
+            "parameters": {"accessories": [], "issues": [], "upgrades": [],
+                           "is_shipping_available": True, "confidence_score": rng.randint(5, 10)},
+        },
+        "category": {
+            "primary_category": primary,
+            "subcategory": subcategory,
+            "intended_use": "all-road",
+            "price_category": "mid-range",
+            "confidence": rng.randint(5, 10),
+        },
+        "value": {
+            "value_analysis": {
+                "estimated_value_range": {"low": low, "high": round(low * 1.3, -1), "currency": "PLN"},
+                "value_assessment": rng.choice(VALUE_ASSESSMENTS),
+                "price_difference_percent": None,
+            },
+            "selling_points": ["Regularnie serwisowany"],
+            "concerns": [],
+            "overall_recommendation": "Worth checking in person",
+            "confidence": rng.randint(5, 10),
+        },
+    }
+
+
+def generate_enrichments(bikes: List[Dict[str, Any]], fraction: float = 1.0,
+                         seed: int = 42) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield `(url, ai_analysis)` pairs for roughly `fraction` of the given bikes."""
+    rng = random.Random(seed)
+    for bike in bikes:
+        if rng.random() < fraction:
+            yield bike["url"], generate_ai_analysis(bike, rng)
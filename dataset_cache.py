@@ -0,0 +1,395 @@
+import gzip
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import orjson
+
+from snapshots import Snapshot, SnapshotStore
+
+try:
+    import brotli
+except ImportError:  # Kompresja brotli jest opcjonalna
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # Format MessagePack jest opcjonalny
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:  # Format Apache Arrow jest opcjonalny
+    pyarrow = None
+
+# Poziomy kompresji - body kompresujemy raz na wersję danych, więc stać nas na mocną kompresję
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+# Mniejszych odpowiedzi nie opłaca się kompresować
+MIN_COMPRESS_SIZE = 1024
+
+# Typy MIME obsługiwanych formatów zbiorów danych
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+# Alternatywne nazwy typów MIME spotykane w klientach
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+# Body trzymane w pamięci procesu (bytes) albo zmapowane z migawki na dysku
+Body = Union[bytes, memoryview]
+
+
+class EncodedDataset:
+    """Zwalidowany i zakodowany zbiór danych w konkretnej wersji i formacie (JSON, MessagePack, Arrow).
+
+    Skompresowane warianty body (gzip/brotli) są liczone przy pierwszym użyciu
+    i trzymane razem z danymi, więc każda wersja jest kompresowana tylko raz.
+    Jeśli podano magazyn migawek, wszystkie warianty są publikowane jako pliki
+    i mapowane w pamięci - współdzielone przez wszystkie workery serwera.
+    """
+
+    def __init__(self, name: str, version: Tuple, body: Union[bytes, Snapshot], count: Optional[int] = None,
+                 snapshots: Optional[SnapshotStore] = None, fmt: str = "json"):
+        self.name = name
+        self.version = version
+        self.count = count
+        self.snapshots = snapshots
+        self.fmt = fmt
+        self._bodies: Dict[str, Union[bytes, Snapshot]] = {"identity": body}
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self) -> str:
+        return version_key(self.version)
+
+    @property
+    def body(self) -> Body:
+        return _as_buffer(self._bodies["identity"])
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.fmt]
+
+    @property
+    def etag(self) -> str:
+        """Silny ETag wyprowadzony z nazwy, wersji i formatu zbioru danych."""
+        if self.fmt == "json":
+            return f'"{self.name}-{self.version_key}"'
+        return f'"{self.name}-{self.version_key}-{self.fmt}"'
+
+    def etag_for(self, encoding: str) -> str:
+        """ETag konkretnej reprezentacji - każde kodowanie ma własny znacznik."""
+        if encoding == "identity":
+            return self.etag
+        return self.etag[:-1] + f"-{encoding}" + '"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Sprawdza, czy nagłówek If-None-Match wskazuje na bieżącą wersję."""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        known = {self.etag_for(encoding) for encoding in ("identity", "gzip", "br")}
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag in known:
+                return True
+        return False
+
+    def encoded(self, encoding: str) -> Body:
+        """Zwraca body w podanym kodowaniu (identity, gzip lub br)."""
+        body = self._bodies.get(encoding)
+        if body is not None:
+            return _as_buffer(body)
+
+        with self._lock:
+            body = self._bodies.get(encoding)
+            if body is None:
+                # Inny worker mógł już opublikować ten wariant
+                if self.snapshots is not None:
+                    body = self.snapshots.open(self.name, self.version_key, encoding, self.fmt)
+                if body is None:
+                    if encoding == "gzip":
+                        body = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+                    elif encoding == "br" and brotli is not None:
+                        body = brotli.compress(bytes(self.body), quality=BROTLI_QUALITY)
+                    else:
+                        raise ValueError(f"Nieobsługiwane kodowanie: {encoding}")
+                    if self.snapshots is not None:
+                        body = self.snapshots.publish(self.name, self.version_key, body, encoding, self.fmt)
+                self._bodies[encoding] = body
+            return _as_buffer(body)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Wybiera najlepsze kodowanie spośród akceptowanych przez klienta."""
+        if len(self.body) < MIN_COMPRESS_SIZE or not accept_encoding:
+            return "identity"
+
+        accepted = {}
+        for part in accept_encoding.split(","):
+            fields = part.strip().split(";")
+            coding = fields[0].strip().lower()
+            quality = 1.0
+            for param in fields[1:]:
+                param = param.strip()
+                if param.startswith("q="):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            if coding:
+                accepted[coding] = quality
+
+        supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+        candidates = [c for c in supported if accepted.get(c, accepted.get("*", 0.0)) > 0]
+        if not candidates:
+            return "identity"
+        # Przy równych wagach preferujemy brotli (lepszy stopień kompresji)
+        return max(candidates, key=lambda c: (accepted.get(c, accepted.get("*", 0.0)), c == "br"))
+
+
+def available_formats(tabular: bool = True) -> List[str]:
+    """Formaty, w których można zakodować zbiór danych (zależnie od zainstalowanych pakietów).
+
+    Arrow wymaga danych tabelarycznych (listy rekordów), więc nie jest dostępny np. dla statystyk.
+    """
+    formats = ["json"]
+    if msgpack is not None:
+        formats.append("msgpack")
+    if pyarrow is not None and tabular:
+        formats.append("arrow")
+    return formats
+
+
+def negotiate_format(accept: Optional[str], formats: List[str]) -> Optional[str]:
+    """Wybiera format odpowiedzi na podstawie nagłówka Accept.
+
+    Returns:
+        Nazwa formatu lub None, jeśli klient nie akceptuje żadnego z dostępnych formatów (406)
+    """
+    if not accept:
+        return "json"
+
+    accepted = {}
+    for part in accept.split(","):
+        fields = part.strip().split(";")
+        media_type = fields[0].strip().lower()
+        quality = 1.0
+        for param in fields[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type:
+            accepted[media_type] = quality
+
+    def quality_of(fmt: str) -> float:
+        media_type = MEDIA_TYPES[fmt]
+        for alias, alias_fmt in MEDIA_TYPE_ALIASES.items():
+            if alias_fmt == fmt and alias in accepted:
+                return accepted[alias]
+        if media_type in accepted:
+            return accepted[media_type]
+        return accepted.get(media_type.split("/")[0] + "/*", accepted.get("*/*", 0.0))
+
+    candidates = [fmt for fmt in formats if quality_of(fmt) > 0]
+    if not candidates:
+        return None
+    # Przy równych wagach (np. "*/*") wybieramy JSON - format domyślny
+    return max(candidates, key=lambda fmt: (quality_of(fmt), fmt == "json"))
+
+
+def encode_format(fmt: str, data: Any) -> bytes:
+    """Koduje zdekodowany zbiór danych (listę rekordów lub słownik) w podanym formacie binarnym."""
+    if fmt == "msgpack" and msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True)
+    if fmt == "arrow" and pyarrow is not None:
+        return _encode_arrow(data)
+    raise ValueError(f"Nieobsługiwany format: {fmt}")
+
+
+def _encode_arrow(records: List[Dict[str, Any]]) -> bytes:
+    """Koduje listę rekordów jako strumień Arrow IPC (jedna tabela kolumnowa).
+
+    Zagnieżdżone pola (parameters, ai_analysis) są zapisywane jako tekst JSON -
+    ich struktura różni się między rekordami i nie ma stałego schematu.
+    """
+    if not isinstance(records, list):
+        raise ValueError("Format Arrow wymaga listy rekordów")
+    names = list(records[0]) if records else []
+    columns = {}
+    for name in names:
+        values = [record.get(name) for record in records]
+        if any(isinstance(value, (dict, list)) for value in values):
+            values = [orjson.dumps(value).decode() if value is not None else None for value in values]
+        columns[name] = values
+    table = pyarrow.Table.from_pydict(columns)
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def version_key(version: Tuple) -> str:
+    """Wersja zapisana jako tekst (używana w ETag i nazwach migawek), np. "3-1-2"."""
+    return "-".join(format(part, "x") for part in _flatten(version))
+
+
+def _as_buffer(body: Union[bytes, Snapshot]) -> Body:
+    return body.view if isinstance(body, Snapshot) else body
+
+
+def _flatten(version: Iterable) -> List[int]:
+    parts = []
+    for part in version:
+        if isinstance(part, (tuple, list)):
+            parts.extend(_flatten(part))
+        elif part is None:
+            parts.append(0)
+        else:
+            parts.append(int(part))
+    return parts
+
+
+class VersionedCache:
+    """Bazowa pamięć podręczna: trzyma zakodowany wynik dla bieżącej wersji danych.
+
+    Wynik jest budowany tylko wtedy, gdy zmieni się wersja zwracana przez
+    funkcję `version`. Z magazynem migawek wynik jest publikowany na dysk, a workery,
+    które go nie budowały, jedynie mapują gotowy plik. Formaty binarne są
+    wyprowadzane z tej samej wersji JSON przy pierwszym zapytaniu o nie.
+    """
+    # Czy wynik jest listą rekordów (wymagane przez format Arrow)
+    tabular = True
+
+    def __init__(self, name: str, version: Callable[[], Tuple], snapshots: Optional[SnapshotStore] = None):
+        self.name = name
+        self.version = version
+        self.snapshots = snapshots
+        self._entries: Dict[str, EncodedDataset] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def formats(self) -> List[str]:
+        return available_formats(self.tabular)
+
+    def _encode(self) -> Tuple[bytes, Optional[int]]:
+        """Buduje body (i liczbę rekordów) dla bieżącej wersji danych."""
+        raise NotImplementedError
+
+    def get(self, fmt: str = "json") -> EncodedDataset:
+        """Zwraca zakodowany wynik w podanym formacie, przebudowując go po zmianie wersji."""
+        if fmt != "json":
+            return self._get_derived(fmt)
+
+        version = tuple(self.version())
+
+        entry = self._entries.get(fmt)
+        if entry is not None and entry.version == version:
+            return entry
+
+        with self._lock:
+            # Inny wątek mógł już przeładować dane
+            entry = self._entries.get(fmt)
+            if entry is not None and entry.version == version:
+                return entry
+
+            key = version_key(version)
+            snapshot = None
+            if self.snapshots is not None:
+                # Inny worker mógł już opublikować tę wersję - wystarczy ją zmapować
+                snapshot = self.snapshots.open(self.name, key)
+
+            if snapshot is not None:
+                entry = EncodedDataset(self.name, version, snapshot, snapshots=self.snapshots)
+            else:
+                body, count = self._encode()
+                if self.snapshots is not None:
+                    body = self.snapshots.publish(self.name, key, body)
+                entry = EncodedDataset(self.name, version, body, count, snapshots=self.snapshots)
+
+            self._entries[fmt] = entry
+            return entry
+
+    def _get_derived(self, fmt: str) -> EncodedDataset:
+        """Zwraca wynik w formacie binarnym, zakodowany z bieżącej wersji JSON."""
+        if fmt not in self.formats:
+            raise ValueError(f"Nieobsługiwany format: {fmt}")
+        base = self.get()
+
+        entry = self._entries.get(fmt)
+        if entry is not None and entry.version == base.version:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(fmt)
+            if entry is not None and entry.version == base.version:
+                return entry
+
+            snapshot = None
+            if self.snapshots is not None:
+                snapshot = self.snapshots.open(self.name, base.version_key, fmt=fmt)
+
+            if snapshot is not None:
+                entry = EncodedDataset(self.name, base.version, snapshot, base.count, self.snapshots, fmt)
+            else:
+                body = encode_format(fmt, orjson.loads(base.body))
+                if self.snapshots is not None:
+                    body = self.snapshots.publish(self.name, base.version_key, body, fmt=fmt)
+                entry = EncodedDataset(self.name, base.version, body, base.count, self.snapshots, fmt)
+
+            self._entries[fmt] = entry
+            return entry
+
+    def invalidate(self) -> None:
+        """Wymusza ponowne wczytanie danych przy następnym odczycie."""
+        with self._lock:
+            self._entries.clear()
+
+
+class DatasetCache(VersionedCache):
+    """Pamięć podręczna zbioru danych z warstwy storage.
+
+    Dane są walidowane i kodowane do bajtów tylko raz - przy pierwszym odczycie
+    nowej wersji zbioru (wersję zwraca funkcja `version`). Kolejne zapytania
+    dostają gotowe bajty bez ponownej walidacji i serializacji.
+    """
+
+    def __init__(self, name: str, version: Callable[[], Tuple],
+                 records: Callable[[], Iterable[Dict[str, Any]]],
+                 validate: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 snapshots: Optional[SnapshotStore] = None):
+        super().__init__(name, version, snapshots)
+        self.records = records
+        self.validate = validate
+
+    def _encode(self) -> Tuple[bytes, Optional[int]]:
+        records = []
+        for record in self.records():
+            records.append(self.validate(record) if self.validate else record)
+        return orjson.dumps(records), len(records)
+
+
+class ComputedCache(VersionedCache):
+    """Pamięć podręczna wyniku obliczanego z kilku zbiorów danych (np. statystyk).
+
+    Wynik jest przeliczany tylko wtedy, gdy zmieni się wersja któregoś ze źródeł.
+    """
+    tabular = False
+
+    def __init__(self, name: str, version: Callable[[], Tuple], compute: Callable[[], Any],
+                 snapshots: Optional[SnapshotStore] = None):
+        super().__init__(name, version, snapshots)
+        self.compute = compute
+
+    def _encode(self) -> Tuple[bytes, Optional[int]]:
+        return orjson.dumps(self.compute()), None
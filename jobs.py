@@ -0,0 +1,197 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Domyślna lokalizacja bazy ze wspólnym stanem zadań
+DEFAULT_JOBS_DB_PATH = os.path.join("data", "jobs.db")
+
+# Po tylu sekundach bez aktualizacji zadanie uznajemy za porzucone
+STALE_AFTER = 15 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    is_running INTEGER NOT NULL DEFAULT 0,
+    current INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'Nie rozpoczęto',
+    owner TEXT,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS schedules (
+    name TEXT PRIMARY KEY,
+    interval REAL NOT NULL,
+    next_run_at REAL NOT NULL,
+    last_run TEXT
+);
+"""
+
+
+def current_owner() -> str:
+    """Identyfikator bieżącego procesu (host:pid) zapisywany jako właściciel zadania."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Sprawdza, czy proces-właściciel zadania nadal działa (dla procesów na tym samym hoście)."""
+    if not owner or ":" not in owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        # Procesu z innego hosta nie sprawdzimy - polegamy na heartbeat
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Wspólny dla wszystkich procesów serwera stan zadań (analiza AI, scrapowanie).
+
+    Stan trzymany jest w pliku SQLite, więc każdy worker uvicorna widzi ten sam
+    postęp. Uruchomienie zadania to atomowa operacja "sprawdź i ustaw" w transakcji
+    `BEGIN IMMEDIATE`, która działa jak blokada między procesami - dane zadanie
+    może działać tylko raz naraz. Zadanie porzucone przez martwy proces jest
+    przejmowane automatycznie.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_JOBS_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection.executescript(SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Połączenie z bazą przypisane do bieżącego wątku."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def try_start(self, name: str, status: str = "Inicjalizacja...", owner: Optional[str] = None) -> bool:
+        """Próbuje rozpocząć zadanie.
+
+        Returns:
+            True, jeśli zadanie zostało rozpoczęte; False, jeśli już działa w innym wątku lub procesie
+        """
+        owner = owner or current_owner()
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE name = ?", (name,)).fetchone()
+            if row is not None and row["is_running"]:
+                stale = now - (row["heartbeat"] or 0) > STALE_AFTER or not _owner_alive(row["owner"])
+                if not stale:
+                    return False
+
+            conn.execute(
+                "INSERT INTO jobs (name, is_running, current, total, status, owner, started_at, "
+                "finished_at, heartbeat, seq) VALUES (?, 1, 0, 0, ?, ?, ?, NULL, ?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET is_running = 1, current = 0, total = 0, "
+                "status = excluded.status, owner = excluded.owner, started_at = excluded.started_at, "
+                "finished_at = NULL, heartbeat = excluded.heartbeat, seq = seq + 1",
+                (name, status, owner, now, now),
+            )
+        return True
+
+    def update(self, name: str, current: int, total: int, status: str) -> None:
+        """Aktualizuje postęp zadania (działa również jako heartbeat)."""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET current = ?, total = ?, status = ?, heartbeat = ?, seq = seq + 1 "
+                "WHERE name = ?",
+                (current, total, status, time.time(), name),
+            )
+
+    def finish(self, name: str, status: str) -> None:
+        """Kończy zadanie (sukcesem lub błędem) i zwalnia blokadę."""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET is_running = 0, status = ?, finished_at = ?, heartbeat = ?, "
+                "seq = seq + 1 WHERE name = ?",
+                (status, now, now, name),
+            )
+
+    def get(self, name: str) -> Dict[str, Any]:
+        """Zwraca bieżący stan zadania."""
+        row = self.connection.execute("SELECT * FROM jobs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return {"name": name, "is_running": False, "current": 0, "total": 0,
+                    "status": "Nie rozpoczęto", "owner": None, "started_at": None,
+                    "finished_at": None, "seq": 0}
+        state = dict(row)
+        state["is_running"] = bool(state["is_running"])
+        return state
+
+    def init_schedule(self, name: str, interval: float, next_run_at: float) -> None:
+        """Tworzy harmonogram, jeśli jeszcze nie istnieje (np. po restarcie zachowuje poprzedni)."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO schedules (name, interval, next_run_at) VALUES (?, ?, ?)",
+                (name, interval, next_run_at),
+            )
+
+    def get_schedule(self, name: str) -> Optional[Dict[str, Any]]:
+        """Zwraca stan harmonogramu (interwał, czas następnego uruchomienia, wynik ostatniego)."""
+        row = self.connection.execute("SELECT * FROM schedules WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        schedule = dict(row)
+        schedule["last_run"] = json.loads(schedule["last_run"]) if schedule["last_run"] else None
+        return schedule
+
+    def claim_schedule(self, name: str, now: float, lease: float) -> bool:
+        """Atomowo przejmuje zaplanowane uruchomienie, jeśli jego czas już minął.
+
+        Czas następnego uruchomienia przesuwany jest o `lease` sekund, więc pozostałe
+        procesy nie uruchomią tego samego terminu drugi raz. Zwraca True, jeśli
+        uruchomienie przypadło bieżącemu procesowi.
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE schedules SET next_run_at = ? WHERE name = ? AND next_run_at <= ?",
+                (now + lease, name, now),
+            )
+            return cursor.rowcount == 1
+
+    def set_schedule(self, name: str, interval: float, next_run_at: float,
+                     last_run: Optional[Dict[str, Any]] = None) -> None:
+        """Zapisuje nowy interwał i termin; wynik ostatniego uruchomienia tylko, jeśli podano."""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE schedules SET interval = ?, next_run_at = ?, "
+                "last_run = COALESCE(?, last_run) WHERE name = ?",
+                (interval, next_run_at, json.dumps(last_run) if last_run is not None else None, name),
+            )
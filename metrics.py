@@ -0,0 +1,344 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Progi histogramu czasu odpowiedzi (w sekundach)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Progi histogramu rozmiaru odpowiedzi (w bajtach)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+# Progi histogramu czasu trwania połączeń strumieniowych (w sekundach)
+STREAM_BUCKETS = (1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Typy treści odpowiedzi strumieniowych - połączenie trwa tyle, ile klient słucha,
+# więc nie wliczamy ich do czasu odpowiedzi
+STREAMING_MEDIA_TYPES = ("text/event-stream",)
+
+# Typ treści formatu tekstowego Prometheusa
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Etykieta dla zapytań, które nie trafiły w żadną trasę API (np. pliki statyczne, 404)
+UNMATCHED_ROUTE = "other"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Bazowa metryka z etykietami; wartości trzymane są osobno dla każdej kombinacji etykiet."""
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Iterable[str]) -> Labels:
+        key = tuple(str(label) for label in labels)
+        if len(key) != len(self.label_names):
+            raise ValueError(f"Metryka {self.name} wymaga etykiet: {self.label_names}")
+        return key
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(Metric):
+    """Licznik, który tylko rośnie (np. liczba zapytań lub błędów)."""
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(Counter):
+    """Wartość, która może rosnąć i maleć (np. liczba trwających zapytań)."""
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Histogram z kumulatywnymi przedziałami zgodny z formatem Prometheusa.
+
+    Kwantyle (np. p99) wylicza się po stronie Prometheusa funkcją `histogram_quantile`,
+    a lokalnie - metodą `quantile` (interpolacja liniowa w obrębie przedziału).
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Liczniki przedziałów (ostatni to +Inf), suma i liczba obserwacji
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        """Szacuje kwantyl q (0-1) na podstawie przedziałów histogramu."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None or state[2] == 0:
+                return None
+            counts = list(state[0])
+            total = state[2]
+
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    # Wartość poza ostatnim przedziałem - zwracamy jego górną granicę
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Zbiór metryk procesu renderowany w formacie tekstowym Prometheusa.
+
+    Kolektory to funkcje wywoływane tuż przed renderowaniem - pozwalają
+    odświeżyć wskaźniki odczytywane z zewnątrz (np. stan zadań w JobStore).
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class HttpMetrics:
+    """Metryki zapytań HTTP: czas odpowiedzi, rozmiar, trwające zapytania i błędy."""
+
+    def __init__(self, registry: MetricsRegistry):
+        labels = ("method", "route")
+        self.requests = registry.counter(
+            "http_requests_total", "Liczba obsłużonych zapytań HTTP", labels + ("status",))
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "Czas obsługi zapytania (do wysłania całego body)", labels)
+        self.response_size = registry.histogram(
+            "http_response_size_bytes", "Rozmiar wysłanego body odpowiedzi", labels, SIZE_BUCKETS)
+        self.stream_duration = registry.histogram(
+            "http_stream_duration_seconds", "Czas trwania połączenia strumieniowego (SSE)", labels, STREAM_BUCKETS)
+        self.in_flight = registry.gauge(
+            "http_requests_in_flight", "Liczba aktualnie obsługiwanych zapytań", ("method",))
+        self.errors = registry.counter(
+            "http_request_errors_total", "Liczba zapytań zakończonych błędem serwera (5xx lub wyjątek)", labels)
+
+
+class LlmMetrics:
+    """Metryki analizy AI: generacje i tokeny, trafienia w cache wyników, decyzje reguł
+    oraz kaskada modeli (wywołania, opóźnienia, eskalacje).
+
+    Liczniki są zwiększane po każdym przebiegu analizy podsumowaniem
+    `BikeDataEnricher.run_summary()`. Kwantyle opóźnień modeli pochodzą
+    z ostatniego przebiegu.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.generations = registry.counter(
+            "llm_generations_total", "Liczba zakończonych generacji LLM (estimated - bez końcowego fragmentu Ollamy)",
+            ("usage",))
+        self.tokens = registry.counter(
+            "llm_tokens_total", "Liczba tokenów promptu i odpowiedzi zgłoszona przez Ollamę", ("kind",))
+        self.generation_seconds = registry.counter(
+            "llm_generation_seconds_total", "Czas przetwarzania promptu i generowania odpowiedzi", ("phase",))
+        self.generation_events = registry.counter(
+            "llm_generation_events_total", "Ponowienia, przerwane i wcześnie zakończone generacje", ("event",))
+        self.cache_lookups = registry.counter(
+            "llm_cache_lookups_total", "Odczyty cache wyników LLM (memory, disk)", ("layer", "result"))
+        self.rule_decisions = registry.counter(
+            "llm_rule_decisions_total", "Decyzje ekstrakcji regułami (rules, lists, partial, llm)", ("decision",))
+        self.model_calls = registry.counter(
+            "llm_model_calls_total", "Liczba generacji modelu (bez trafień w cache)", ("model", "status"))
+        self.model_seconds = registry.counter(
+            "llm_model_call_seconds_total", "Łączny czas generacji modelu", ("model",))
+        self.model_latency = registry.gauge(
+            "llm_model_call_latency_seconds", "Kwantyle czasu generacji modelu w ostatniej analizie",
+            ("model", "quantile"))
+        self.task_answers = registry.counter(
+            "llm_task_answers_total", "Liczba odpowiedzi na zadanie według poziomu modelu (0 - najmniejszy)",
+            ("task", "tier"))
+        self.escalations = registry.counter(
+            "llm_escalations_total", "Liczba eskalacji zadania do większego modelu według przyczyny", ("task", "reason"))
+
+    def record_run(self, summary: Dict) -> None:
+        """Dolicza podsumowanie przebiegu analizy (`BikeDataEnricher.run_summary()`)."""
+        usage = summary["usage"]
+        self.generations.inc("reported", amount=usage["requests"] - usage["estimated"])
+        self.generations.inc("estimated", amount=usage["estimated"])
+        self.tokens.inc("prompt", amount=usage["prompt_tokens"])
+        self.tokens.inc("completion", amount=usage["completion_tokens"])
+        self.generation_seconds.inc("prompt", amount=usage["prompt_seconds"])
+        self.generation_seconds.inc("generation", amount=usage["generation_seconds"])
+        for event, key in (("retry", "retries"), ("aborted", "aborted"), ("early_stop", "early_stops")):
+            self.generation_events.inc(event, amount=usage[key])
+        for layer in ("memory", "disk"):
+            self.cache_lookups.inc(layer, "hit", amount=summary["cache"][f"{layer}_hits"])
+            self.cache_lookups.inc(layer, "miss", amount=summary["cache"][f"{layer}_misses"])
+        for decision, count in summary["rules"].items():
+            self.rule_decisions.inc(decision, amount=count)
+        for model, stats in summary["tiers"]["models"].items():
+            self.model_calls.inc(model, "ok", amount=stats["calls"] - stats["failed"])
+            self.model_calls.inc(model, "failed", amount=stats["failed"])
+            self.model_seconds.inc(model, amount=stats["seconds"])
+            for quantile, name in (("0.5", "p50_seconds"), ("0.9", "p90_seconds"), ("0.99", "p99_seconds")):
+                self.model_latency.set(model, quantile, value=stats[name])
+        for task, stats in summary["tiers"]["tasks"].items():
+            for tier, count in stats["answered_by_tier"].items():
+                self.task_answers.inc(task, str(tier), amount=count)
+            for reason, count in stats["reasons"].items():
+                self.escalations.inc(task, reason, amount=count)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI mierzące każde zapytanie HTTP.
+
+    Etykietą jest szablon trasy (np. "/api/data/bikes"), a nie pełna ścieżka,
+    więc liczba serii nie rośnie wraz z parametrami zapytań. Czas jest liczony
+    do wysłania ostatniego fragmentu body. Strumienie SSE (`text/event-stream`)
+    trafiają do osobnego histogramu czasu połączenia, żeby długo otwarte
+    połączenia nie zawyżały p99 czasu odpowiedzi.
+
+    Wyjątek po wysłaniu nagłówków (np. rozłączenie klienta) nie zmienia
+    zarejestrowanego statusu - klient dostał już odpowiedź z tym statusem.
+    """
+
+    def __init__(self, app, metrics: HttpMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        self.metrics.in_flight.inc(method)
+        start = time.perf_counter()
+        status_code = 500
+        started = streaming = False
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, started, streaming, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                started = True
+                content_type = dict(message.get("headers", ())).get(b"content-type", b"").decode("latin-1")
+                streaming = content_type.split(";")[0].strip().lower() in STREAMING_MEDIA_TYPES
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            if not started:
+                status_code = 500
+            raise
+        finally:
+            self.metrics.in_flight.dec(method)
+            # Szablon trasy jest znany dopiero po routingu
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            self.metrics.requests.inc(method, route, str(status_code))
+            duration = time.perf_counter() - start
+            if streaming:
+                self.metrics.stream_duration.observe(method, route, value=duration)
+            else:
+                self.metrics.latency.observe(method, route, value=duration)
+            self.metrics.response_size.observe(method, route, value=size)
+            if status_code >= 500:
+                self.metrics.errors.inc(method, route)
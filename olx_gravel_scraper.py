@@ -5,13 +5,15 @@ import re
 from bs4 import BeautifulSoup
 from datetime import datetime
 from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict, Any
-import pandas as pd
+from typing import List, Optional, Dict, Any, Callable, Awaitable
 from pathlib import Path
 import signal
 import sys
 import platform
 
+from storage import LISTING_RETENTION, BikeStorage
+from snapshots import atomic_open
+
 @dataclass
 class GravelBike:
     """Klasa przechowująca dane o rowerze gravel."""
@@ -363,8 +365,13 @@ class OlxGravelScraper:
             print(f"Błąd podczas parsowania {url}: {e}")
             return None
     
-    async def scrape(self) -> List[GravelBike]:
-        """Główna metoda do pobierania danych."""
+    async def scrape(self, on_bike: Optional[Callable[[GravelBike], Awaitable[None]]] = None) -> List[GravelBike]:
+        """Główna metoda do pobierania danych.
+        
+        Args:
+            on_bike: Opcjonalna funkcja (async) wywoływana dla każdego roweru zaraz po
+                przetworzeniu jego ogłoszenia, np. w celu zapisania go i powiadomienia klientów
+        """
         # Semafor do ograniczenia liczby jednoczesnych połączeń
         semaphore = asyncio.Semaphore(5)  # Limit do 5 jednoczesnych połączeń
         
@@ -401,29 +408,51 @@ class OlxGravelScraper:
                         results.append(bike)
                 except Exception as e:
                     print(f"Błąd podczas przetwarzania zadania: {e}")
+                    continue
+                
+                # Błąd zapisu nie jest błędem pojedynczego ogłoszenia - przerywa scrapowanie
+                if bike and on_bike is not None:
+                    await on_bike(bike)
             
             # Filtrowanie None (błędnych wyników)
             self.bikes = [bike for bike in results if bike]
             return self.bikes
     
     def save_to_csv(self, filename: str = "gravel_bikes.csv"):
-        """Zapisuje dane do pliku CSV."""
+        """Zapisuje dane do pliku CSV (atomowo - czytelnicy nie zobaczą niepełnego pliku)."""
+        import pandas as pd
         df = pd.DataFrame([asdict(bike) for bike in self.bikes])
-        df.to_csv(filename, index=False, encoding='utf-8')
+        with atomic_open(filename, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
         print(f"Zapisano {len(self.bikes)} rowerów do pliku {filename}")
     
     def save_to_json(self, filename: str = "gravel_bikes.json"):
-        """Zapisuje dane do pliku JSON."""
-        with open(filename, 'w', encoding='utf-8') as f:
+        """Zapisuje dane do pliku JSON (atomowo - czytelnicy nie zobaczą niepełnego pliku)."""
+        with atomic_open(filename, 'w', encoding='utf-8') as f:
             json.dump([asdict(bike) for bike in self.bikes], f, ensure_ascii=False, indent=2)
         print(f"Zapisano {len(self.bikes)} rowerów do pliku {filename}")
     
-    def generate_statistics(self) -> Dict[str, Any]:
-        """Generuje podstawowe statystyki o danych."""
-        if not self.bikes:
+    def save_to_storage(self, storage: BikeStorage) -> Dict[str, int]:
+        """Zapisuje dane do bazy (nowe ogłoszenia są dodawane, zmienione aktualizowane)."""
+        counts = storage.upsert_bikes(asdict(bike) for bike in self.bikes)
+        print(f"Zapisano {len(self.bikes)} rowerów do bazy {storage.db_path} "
+              f"(nowe: {counts['new']}, zmienione: {counts['updated']})")
+        return counts
+    
+    def generate_statistics(self, records: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Generuje podstawowe statystyki o danych.
+        
+        Domyślnie liczone są dla rowerów z bieżącego scrapowania, ale można
+        przekazać dowolną listę rekordów (np. wszystkie rowery z bazy).
+        """
+        if records is None:
+            records = [asdict(bike) for bike in self.bikes]
+        if not records:
             return {}
         
-        df = pd.DataFrame([asdict(bike) for bike in self.bikes])
+        # pandas ładujemy dopiero przy pierwszym użyciu - import modułu pozostaje szybki
+        import pandas as pd
+        df = pd.DataFrame(records)
         
         # Podstawowe statystyki
         stats = {
@@ -482,10 +511,12 @@ class OlxGravelScraper:
         filename = f"data/{filename_prefix}_{timestamp}"
         
         # Zapisz dane w formacie CSV i JSON
+        import pandas as pd
         df = pd.DataFrame([asdict(bike) for bike in self.bikes])
-        df.to_csv(f"{filename}.csv", index=False, encoding='utf-8')
+        with atomic_open(f"{filename}.csv", 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
         
-        with open(f"{filename}.json", 'w', encoding='utf-8') as f:
+        with atomic_open(f"{filename}.json", 'w', encoding='utf-8') as f:
             json.dump([asdict(bike) for bike in self.bikes], f, ensure_ascii=False, indent=2)
             
         print(f"Zapisano {len(self.bikes)} częściowych wyników do plików {filename}.csv i {filename}.json")
@@ -535,7 +566,7 @@ class OlxGravelScraper:
             
         # Dodaj wynik do pliku statystyk
         stats_file = "data/parameters_summary.txt"
-        with open(stats_file, 'w', encoding='utf-8') as f:
+        with atomic_open(stats_file, 'w', encoding='utf-8') as f:
             f.write("=== PODSUMOWANIE PARAMETRÓW TECHNICZNYCH ===\n")
             f.write(f"Znaleziono {len(all_params)} różnych parametrów w {len(self.bikes)} ogłoszeniach:\n\n")
             
@@ -596,6 +627,8 @@ async def main():
     signal.signal(signal.SIGINT, signal_handler)
     
     all_bikes = []
+    # Początek scrapowania - ogłoszenia niewidziane od tej chwili (z zapasem retencji) zostaną wycofane
+    started_at = datetime.now().isoformat()
     
     # Pobieranie danych dla różnych zapytań
     for query in search_queries:
@@ -647,13 +680,21 @@ async def main():
     combined_scraper.save_to_csv("data/all_gravel_bikes.csv")
     combined_scraper.save_to_json("data/all_gravel_bikes.json")
     
+    # Zapisanie do bazy, z której korzysta serwer API
+    storage = BikeStorage()
+    combined_scraper.save_to_storage(storage)
+    removed = storage.complete_scrape(started_at)
+    print(f"Wycofano {removed} ogłoszeń niewidzianych przez {LISTING_RETENTION.total_seconds() / 3600:g} h "
+          f"przed scrapowaniem")
+    
     # Wyświetl podsumowanie parametrów
     combined_scraper.print_parameters_summary()
     
     # Generowanie i zapisanie statystyk
     stats = combined_scraper.generate_statistics()
-    with open("data/statistics.json", 'w', encoding='utf-8') as f:
+    with atomic_open("data/statistics.json", 'w', encoding='utf-8') as f:
         json.dump(stats, f, ensure_ascii=False, indent=2)
+    storage.save_statistics(combined_scraper.generate_statistics(list(storage.iter_bikes())))
     
     print(f"\nŁącznie znaleziono {len(unique_bikes)} unikalnych rowerów gravel")
     
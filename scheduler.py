@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from jobs import JobStore
+
+logger = logging.getLogger("scheduler")
+
+# Domyślny interwał scrapowania i jego granice (w sekundach)
+DEFAULT_INTERVAL = 60 * 60
+DEFAULT_MIN_INTERVAL = 15 * 60
+DEFAULT_MAX_INTERVAL = 6 * 60 * 60
+# Losowe odchylenie terminu (ułamek interwału), żeby nie odpytywać OLX w stałym rytmie
+DEFAULT_JITTER = 0.1
+# Docelowy odsetek nowych lub zmienionych ogłoszeń w jednym przebiegu
+DEFAULT_TARGET_CHURN = 0.1
+# O ile razy najwyżej interwał może się zmienić po jednym przebiegu
+MAX_STEP = 2.0
+
+# Co ile sekund proces odczytuje wspólny harmonogram (inny worker mógł go zmienić)
+POLL_INTERVAL = 30
+# Na tyle sekund przejęte uruchomienie blokuje termin dla pozostałych workerów
+RUN_LEASE = 60 * 60
+# Po tylu sekundach ponawiamy próbę, jeśli scrapowanie (np. ręczne) już trwa
+BUSY_RETRY = 5 * 60
+
+# Wynik scrapowania: liczba nowych, zmienionych i niezmienionych ogłoszeń albo None,
+# jeśli scrapowanie już trwa (blokada zajęta)
+ScrapeRun = Callable[[], Awaitable[Optional[Dict[str, int]]]]
+
+
+def churn_rate(counts: Dict[str, int]) -> Optional[float]:
+    """Odsetek nowych lub zmienionych ogłoszeń wśród przejrzanych (None, jeśli nic nie przejrzano)."""
+    scanned = counts.get("new", 0) + counts.get("updated", 0) + counts.get("unchanged", 0)
+    if not scanned:
+        return None
+    return (counts.get("new", 0) + counts.get("updated", 0)) / scanned
+
+
+class ScrapeScheduler:
+    """Okresowe scrapowanie z interwałem dopasowywanym do ruchu na rynku.
+
+    Po każdym przebiegu interwał jest skalowany o stosunek docelowego do
+    zaobserwowanego odsetka nowych/zmienionych ogłoszeń (najwyżej `MAX_STEP`
+    razy w każdą stronę): gdy dużo się zmienia, scrapujemy częściej, gdy
+    nic - coraz rzadziej, w granicach `min_interval`-`max_interval`.
+
+    Harmonogram trzymany jest we wspólnym JobStore, więc wszystkie workery
+    serwera widzą ten sam termin, a jedno uruchomienie przejmuje tylko jeden
+    z nich. Przebiegi nie nakładają się również z ręcznym `/api/scrape` -
+    oba korzystają z tej samej blokady zadania.
+    """
+
+    def __init__(self, jobs: JobStore, run: ScrapeRun, name: str = "scrape",
+                 interval: float = DEFAULT_INTERVAL, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL, jitter: float = DEFAULT_JITTER,
+                 target_churn: float = DEFAULT_TARGET_CHURN):
+        self.jobs = jobs
+        self.run = run
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = self._clamp(interval)
+        self.jitter = jitter
+        self.target_churn = target_churn
+
+    def _clamp(self, interval: float) -> float:
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def next_interval(self, interval: float, counts: Dict[str, int]) -> float:
+        """Wylicza kolejny interwał na podstawie wyniku przebiegu."""
+        churn = churn_rate(counts)
+        if not churn:
+            # Nic nowego (albo pusty wynik) - zwalniamy maksymalnie
+            factor = MAX_STEP
+        else:
+            factor = min(max(self.target_churn / churn, 1 / MAX_STEP), MAX_STEP)
+        return self._clamp(interval * factor)
+
+    async def run_forever(self) -> None:
+        """Pętla harmonogramu; działa do anulowania zadania (przy zamykaniu serwera)."""
+        await run_in_threadpool(self.jobs.init_schedule, self.name, self.interval,
+                                time.time() + self._jittered(self.interval))
+        logger.info("scheduler started name=%s interval=%.0f min=%.0f max=%.0f",
+                    self.name, self.interval, self.min_interval, self.max_interval)
+        while True:
+            try:
+                schedule = await run_in_threadpool(self.jobs.get_schedule, self.name)
+                delay = schedule["next_run_at"] - time.time()
+                if delay > 0:
+                    await asyncio.sleep(min(delay, POLL_INTERVAL))
+                    continue
+                if await run_in_threadpool(self.jobs.claim_schedule, self.name, time.time(), RUN_LEASE):
+                    await self.run_once(schedule["interval"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("scheduler loop failed name=%s error=%s", self.name, e)
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def run_once(self, interval: float) -> None:
+        """Wykonuje jeden zaplanowany przebieg i ustala termin następnego."""
+        started_at = time.time()
+        try:
+            counts = await self.run()
+        except Exception as e:
+            # Błąd (np. OLX niedostępny) - wycofujemy się jak przy braku zmian
+            logger.exception("scheduled run failed name=%s error=%s", self.name, e)
+            interval = self._clamp(interval * MAX_STEP)
+            last_run = {"started_at": started_at, "finished_at": time.time(), "error": str(e)}
+        else:
+            if counts is None:
+                logger.info("scheduled run skipped name=%s reason=busy", self.name)
+                await run_in_threadpool(self.jobs.set_schedule, self.name, interval,
+                                        time.time() + BUSY_RETRY)
+                return
+            churn = churn_rate(counts)
+            interval = self.next_interval(interval, counts)
+            last_run = {"started_at": started_at, "finished_at": time.time(), "error": None,
+                        "churn": churn, **counts}
+            logger.info("scheduled run finished name=%s new=%d updated=%d unchanged=%d "
+                        "churn=%s next_interval=%.0f", self.name, counts.get("new", 0),
+                        counts.get("updated", 0), counts.get("unchanged", 0),
+                        "n/a" if churn is None else f"{churn:.3f}", interval)
+
+        last_run["duration"] = round(last_run["finished_at"] - started_at, 1)
+        await run_in_threadpool(self.jobs.set_schedule, self.name, interval,
+                                time.time() + self._jittered(interval), last_run)
+
+    def status(self) -> Dict[str, Any]:
+        """Stan harmonogramu: konfiguracja, bieżący interwał, następne i ostatnie uruchomienie."""
+        schedule = self.jobs.get_schedule(self.name) or {}
+        next_run_at = schedule.get("next_run_at")
+        return {
+            "name": self.name,
+            "interval": schedule.get("interval", self.interval),
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "jitter": self.jitter,
+            "target_churn": self.target_churn,
+            "next_run_at": next_run_at,
+            "next_run_in": round(max(next_run_at - time.time(), 0), 1) if next_run_at else None,
+            "last_run": schedule.get("last_run"),
+        }
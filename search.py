@@ -0,0 +1,87 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional
+
+# Znaki, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+SPECIAL_CHARS = {"ł": "l", "Ł": "L", "đ": "d", "Đ": "D", "ø": "o", "Ø": "O", "ß": "ss"}
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Końcówki fleksyjne (bez polskich znaków) - wystarczające dla prostego stemmingu
+POLISH_SUFFIXES = [
+    "owych", "owymi", "owego", "owemu", "owej", "owym", "owie",
+    "ach", "ami", "ego", "emu", "ich", "ych", "imi", "ymi", "iej", "owa", "owe", "owy", "owi",
+    "ej", "om", "ow", "em", "ie",
+    "a", "e", "i", "o", "u", "y",
+]
+
+# Końcówki pogrupowane według długości - sprawdzamy najpierw najdłuższe
+SUFFIXES_BY_LENGTH = [
+    (length, {suffix for suffix in POLISH_SUFFIXES if len(suffix) == length})
+    for length in sorted({len(suffix) for suffix in POLISH_SUFFIXES}, reverse=True)
+]
+
+# Minimalna długość rdzenia po obcięciu końcówki
+MIN_STEM_LENGTH = 3
+
+
+def _build_diacritics_table() -> dict:
+    """Tablica dla str.translate mapująca litery łacińskie z diakrytykami na litery bazowe."""
+    table = {}
+    for code in range(0xC0, 0x250):
+        ch = chr(code)
+        base = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+        if base != ch:
+            table[code] = base
+    table.update({ord(ch): base for ch, base in SPECIAL_CHARS.items()})
+    return table
+
+
+DIACRITICS_TABLE = _build_diacritics_table()
+
+
+def strip_diacritics(text: str) -> str:
+    """Usuwa polskie (i inne) znaki diakrytyczne: "Kraków" -> "Krakow"."""
+    if text.isascii():
+        return text
+    return text.translate(DIACRITICS_TABLE)
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """Prosty stemmer dla języka polskiego obcinający typowe końcówki.
+
+    Tokeny zawierające cyfry (np. "1x11", "r7000") oraz krótkie tokeny (np. "grx")
+    pozostają bez zmian.
+    """
+    if not token.isalpha() or len(token) <= MIN_STEM_LENGTH:
+        return token
+    for length, suffixes in SUFFIXES_BY_LENGTH:
+        if len(token) - length >= MIN_STEM_LENGTH and token[-length:] in suffixes:
+            return token[:-length]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Dzieli tekst na znormalizowane tokeny (małe litery, bez diakrytyków, po stemmingu)."""
+    if not text:
+        return []
+    return [stem(token) for token in TOKEN_PATTERN.findall(strip_diacritics(text).lower())]
+
+
+def index_text(text: Optional[str]) -> str:
+    """Przygotowuje tekst do zapisania w indeksie pełnotekstowym."""
+    return " ".join(tokenize(text))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Buduje zapytanie FTS5 MATCH: wszystkie słowa muszą wystąpić (z dopasowaniem prefiksu).
+
+    Returns:
+        Wyrażenie MATCH lub None, jeśli zapytanie nie zawiera żadnego słowa
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return " AND ".join(f'"{token}"*' for token in tokens)
@@ -1,78 +1,168 @@
 import os
 import json
 import asyncio
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+import importlib
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-import uvicorn
+from typing import List, Dict, Any, Optional, Iterable
 from datetime import datetime
 import statistics as stats
 import time
 import threading
 
-# Import scrapera
-from olx_gravel_scraper import OlxGravelScraper
-# Import LLM Integration
-from LLM_Integration import BikeDataEnricher
+# Scraper (pandas, bs4, aiohttp) i LLM_Integration są importowane dopiero przy pierwszym użyciu,
+# dzięki czemu serwer startuje szybko
+# Warstwa przechowywania danych (SQLite)
+from storage import BikeStorage
+# Wstępnie zakodowane dane do szybkiego serwowania
+from dataset_cache import DatasetCache, ComputedCache, VersionedCache, MEDIA_TYPES, negotiate_format
+# Migawki danych mapowane w pamięci i współdzielone przez workery
+from snapshots import RETENTION_VERSIONS, SnapshotStore
+# Wspólny stan zadań dla wielu procesów serwera
+from jobs import JobStore
+# Okresowe scrapowanie z interwałem dopasowywanym do liczby zmian
+from scheduler import (DEFAULT_INTERVAL, DEFAULT_JITTER, DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL,
+                       DEFAULT_TARGET_CHURN, ScrapeScheduler)
+# Metryki zapytań i zadań w formacie Prometheusa
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, HttpMetrics, LlmMetrics, MetricsMiddleware, MetricsRegistry
 
-app = FastAPI(title="OLX Gravel Bike Scraper API")
+# Poziom logowania można zmienić zmienną środowiskową, np. LOG_LEVEL=DEBUG
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+    force=True,
+)
+logger = logging.getLogger("server")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Rozgrzewa dane w tle - serwer przyjmuje zapytania od razu po starcie."""
+    tasks = [asyncio.create_task(run_in_threadpool(warmup))]
+    if SCRAPE_SCHEDULE:
+        tasks.append(asyncio.create_task(scrape_scheduler.run_forever()))
+    yield
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
+
+app = FastAPI(title="OLX Gravel Bike Scraper API", lifespan=lifespan)
+
+# Metryki są liczone osobno w każdym procesie serwera
+metrics_registry = MetricsRegistry()
+http_metrics = HttpMetrics(metrics_registry)
+# Podsumowania analiz AI (tokeny, cache, kaskada modeli) - w procesie, który wykonał analizę
+llm_metrics = LlmMetrics(metrics_registry)
+app.add_middleware(MetricsMiddleware, metrics=http_metrics)
 
 # Montowanie folderu statycznego
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Ścieżki do plików danych
-DATA_DIR = "data"
+# Katalog danych można zmienić zmienną środowiskową (np. dla testów obciążeniowych)
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+DB_FILE = os.path.join(DATA_DIR, "bikes.db")
+JOBS_DB_FILE = os.path.join(DATA_DIR, "jobs.db")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+# Trwały cache wyników LLM - współdzielony przez procesy korzystające z tego samego katalogu danych
+LLM_CACHE_FILE = os.path.join(DATA_DIR, "llm_cache.db")
+# Liczba zachowywanych wersji każdej migawki (starsze są usuwane)
+SNAPSHOT_RETENTION = int(os.environ.get("SNAPSHOT_RETENTION", RETENTION_VERSIONS))
+# Pliki JSON z poprzednich wersji - importowane jednorazowo do bazy
 BIKES_FILE = os.path.join(DATA_DIR, "gravel_bikes.json")
 STATS_FILE = os.path.join(DATA_DIR, "statistics.json")
 ENRICHED_BIKES_FILE = os.path.join(DATA_DIR, "enriched_bikes.json")
 HTML_FILE = os.path.join("static", "index.html")
 
-# Globalny obiekt do śledzenia postępu analizy AI
-class AnalysisProgress:
-    def __init__(self):
-        self.current = 0
-        self.total = 0
-        self.status = "Nie rozpoczęto"
-        self.is_running = False
-        self.clients = set()
+# Liczba rekordów wysyłanych w jednym fragmencie odpowiedzi strumieniowej
+STREAM_BATCH_SIZE = 50
+
+# Harmonogram scrapowania (interwały w sekundach); przebieg obejmuje tylko najnowsze strony wyników
+SCRAPE_SCHEDULE = os.environ.get("SCRAPE_SCHEDULE", "0").lower() in ("1", "true", "yes")
+SCRAPE_SCHEDULE_PAGES = int(os.environ.get("SCRAPE_SCHEDULE_PAGES", 2))
+SCRAPE_INTERVAL = float(os.environ.get("SCRAPE_INTERVAL", DEFAULT_INTERVAL))
+SCRAPE_MIN_INTERVAL = float(os.environ.get("SCRAPE_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+SCRAPE_MAX_INTERVAL = float(os.environ.get("SCRAPE_MAX_INTERVAL", DEFAULT_MAX_INTERVAL))
+SCRAPE_JITTER = float(os.environ.get("SCRAPE_JITTER", DEFAULT_JITTER))
+SCRAPE_TARGET_CHURN = float(os.environ.get("SCRAPE_TARGET_CHURN", DEFAULT_TARGET_CHURN))
+
+# Co ile sekund strumienie SSE sprawdzają wspólny stan zadań
+PROGRESS_POLL_INTERVAL = 0.5
+
+# Co ile sekund strumień /api/live sprawdza dziennik zmian i po ilu sekundach ciszy wysyła keepalive
+LIVE_POLL_INTERVAL = 0.5
+LIVE_KEEPALIVE_INTERVAL = 15
+
+# Przeglądarka zawsze rewaliduje dane (tanio, dzięki ETag i odpowiedzi 304)
+DATA_CACHE_CONTROL = "no-cache"
+
+# Baza danych z rowerami, wynikami analizy AI i statystykami
+storage = BikeStorage(DB_FILE)
+
+# Zakodowane wersje zbiorów danych publikowane jako pliki i mapowane przez wszystkie workery
+snapshots = SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_RETENTION)
+
+# Wspólny dla wszystkich workerów stan zadań (analiza AI, scrapowanie)
+jobs = JobStore(JOBS_DB_FILE)
+
+
+# Obiekt do śledzenia postępu zadania - stan trzymany jest we wspólnym JobStore,
+# więc postęp i blokada działają również przy wielu procesach serwera
+class JobProgress:
+    def __init__(self, job_store: JobStore, name: str):
+        self.jobs = job_store
+        self.name = name
         
-    def reset(self):
-        self.current = 0
-        self.total = 0
-        self.status = "Inicjalizacja analizy..."
-        self.is_running = True
+    def start(self, status: str) -> bool:
+        """Rozpoczyna zadanie; zwraca False, jeśli już działa w którymkolwiek procesie."""
+        return self.jobs.try_start(self.name, status)
         
     def update(self, current, total, status):
-        self.current = current
-        self.total = total
-        self.status = status
-        self.notify_clients()
+        self.jobs.update(self.name, current, total, status)
         
-    def complete(self):
-        self.status = "Zakończono analizę"
-        self.is_running = False
-        self.notify_clients()
+    def complete(self, status):
+        self.jobs.finish(self.name, status)
         
-    def add_client(self, client):
-        self.clients.add(client)
-        return client
+    @property
+    def is_running(self) -> bool:
+        return self.jobs.get(self.name)["is_running"]
         
-    def remove_client(self, client):
-        self.clients.discard(client)
-        
-    def notify_clients(self):
-        message = json.dumps({
-            "current": self.current,
-            "total": self.total,
-            "status": self.status
-        })
-        for client in self.clients:
-            client.put(f"data: {message}\n\n")
+    def snapshot(self) -> Dict[str, Any]:
+        return self.jobs.get(self.name)
 
-# Inicjalizacja obiektu postępu
-analysis_progress = AnalysisProgress()
+
+# Inicjalizacja obiektów postępu
+analysis_progress = JobProgress(jobs, "analysis")
+scrape_progress = JobProgress(jobs, "scrape")
+
+# Wskaźniki zadań odczytywane ze wspólnego JobStore przy każdym odczycie /metrics
+job_running = metrics_registry.gauge("job_running", "Czy zadanie jest w trakcie (1/0)", ("job",))
+job_progress_current = metrics_registry.gauge("job_progress_current", "Liczba przetworzonych elementów", ("job",))
+job_progress_total = metrics_registry.gauge("job_progress_total", "Liczba elementów do przetworzenia", ("job",))
+job_duration = metrics_registry.gauge(
+    "job_duration_seconds", "Czas trwania bieżącego lub ostatniego uruchomienia zadania", ("job",))
+
+
+def collect_job_metrics():
+    now = time.time()
+    for progress in (scrape_progress, analysis_progress):
+        state = progress.snapshot()
+        job_running.set(progress.name, value=int(state["is_running"]))
+        job_progress_current.set(progress.name, value=state["current"])
+        job_progress_total.set(progress.name, value=state["total"])
+        if state["started_at"]:
+            finished_at = now if state["is_running"] else (state["finished_at"] or now)
+            job_duration.set(progress.name, value=finished_at - state["started_at"])
+
+
+metrics_registry.add_collector(collect_job_metrics)
 
 # Model danych roweru
 class GravelBike(BaseModel):
@@ -101,23 +191,88 @@ class GravelBike(BaseModel):
     ai_analysis: Optional[Dict[str, Any]] = None
 
 
+def validate_bike(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Waliduje pojedynczy rekord roweru zgodnie z modelem GravelBike."""
+    return GravelBike.model_validate(record).model_dump()
+
+
+# Zbiory danych walidowane raz przy wczytaniu i serwowane jako gotowe bajty JSON
+bikes_dataset = DatasetCache(
+    "bikes", lambda: storage.version_tag("bikes"), storage.iter_bikes, validate_bike, snapshots)
+# Widok rowerów z dołączonym wynikiem analizy AI (złączenie po URL, liczone raz na wersję danych)
+bikes_ai_dataset = DatasetCache(
+    "bikes-ai", lambda: storage.version_tag("bikes", "enrichments"),
+    lambda: storage.iter_bikes(include_ai=True), validate_bike, snapshots)
+enriched_dataset = DatasetCache(
+    "enriched-bikes", lambda: storage.version_tag("bikes", "enrichments"),
+    storage.iter_enriched_bikes, validate_bike, snapshots)
+
+
+class BufferResponse(Response):
+    """Odpowiedź wysyłająca body z bufora (np. zmapowanej migawki) w kawałkach.
+
+    Body nie jest kopiowane w całości do pamięci procesu - kopiowany jest tylko
+    bieżący kawałek wysyłany do klienta.
+    """
+    chunk_size = 256 * 1024
+    
+    def __init__(self, buffer, status_code: int = 200, headers: Optional[Dict[str, str]] = None,
+                 media_type: Optional[str] = None):
+        self.buffer = memoryview(buffer)
+        super().__init__(content=b"", status_code=status_code, headers=headers, media_type=media_type)
+        self.headers["content-length"] = str(len(self.buffer))
+    
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") != "HEAD":
+            for offset in range(0, len(self.buffer), self.chunk_size):
+                await send({
+                    "type": "http.response.body",
+                    "body": bytes(self.buffer[offset:offset + self.chunk_size]),
+                    "more_body": True,
+                })
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def dataset_response(request: Request, cache: VersionedCache) -> Response:
+    """Tworzy odpowiedź z obsługą ETag/If-None-Match oraz negocjacją formatu i kompresji.
+    
+    Format wybierany jest nagłówkiem Accept: JSON (domyślnie), MessagePack
+    (application/msgpack) lub Arrow IPC (application/vnd.apache.arrow.stream).
+    """
+    fmt = negotiate_format(request.headers.get("accept"), cache.formats)
+    if fmt is None:
+        supported = ", ".join(MEDIA_TYPES[name] for name in cache.formats)
+        return JSONResponse(status_code=406, content={"detail": f"Obsługiwane formaty: {supported}"})
+    
+    dataset = await run_in_threadpool(cache.get, fmt)
+    logger.debug("serving dataset name=%s format=%s version=%s", dataset.name, fmt, dataset.version_key)
+    
+    encoding = dataset.negotiate(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": dataset.etag_for(encoding),
+        "Cache-Control": DATA_CACHE_CONTROL,
+        "Vary": "Accept, Accept-Encoding",
+    }
+
+    # Klient ma aktualną wersję - wystarczy odpowiedź 304 bez body
+    if dataset.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+
+    body = await run_in_threadpool(dataset.encoded, encoding)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return BufferResponse(body, media_type=dataset.media_type, headers=headers)
+
 # Funkcja do rozszerzania statystyk
 def enhance_statistics():
-    """Rozszerza statystyki o dodatkowe dane na podstawie enriched_bikes."""
+    """Rozszerza statystyki o dodatkowe dane na podstawie wzbogaconych rowerów."""
     try:
         # Wczytaj podstawowe statystyki, jeśli istnieją
-        base_stats = {}
-        if os.path.exists(STATS_FILE):
-            with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                base_stats = json.load(f)
-        
-        # Jeśli nie ma wzbogaconych danych, zwróć podstawowe statystyki
-        if not os.path.exists(ENRICHED_BIKES_FILE):
-            return base_stats
+        base_stats = storage.load_statistics()
         
         # Wczytaj wzbogacone dane rowerów
-        with open(ENRICHED_BIKES_FILE, 'r', encoding='utf-8') as f:
-            bikes = json.load(f)
+        bikes = list(storage.iter_enriched_bikes())
         
         # Jeśli nie ma żadnych danych, zwróć podstawowe statystyki
         if not bikes:
@@ -253,12 +408,60 @@ def enhance_statistics():
         return base_stats
     
     except Exception as e:
-        print(f"Błąd podczas rozszerzania statystyk: {str(e)}")
+        logger.exception("enhance_statistics failed error=%s", e)
         # W przypadku błędu zwróć podstawowe statystyki
-        if os.path.exists(STATS_FILE):
-            with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        return storage.load_statistics()
+
+
+# Rozszerzone statystyki przeliczane tylko po zmianie plików źródłowych
+statistics_dataset = ComputedCache(
+    "statistics", lambda: storage.version_tag("statistics", "bikes", "enrichments"),
+    enhance_statistics, snapshots)
+
+
+# Stan rozgrzewania serwera raportowany przez /ready
+warmup_state: Dict[str, Any] = {"ready": False, "error": None, "took_ms": None}
+
+
+def warmup():
+    """Importuje stare pliki JSON i przygotowuje zakodowane zbiory danych oraz statystyki.
+
+    Zbiory są budowane (lub mapowane z migawek opublikowanych przez inny worker)
+    razem z preferowanym wariantem skompresowanym, więc pierwsze zapytania
+    nie płacą za walidację, serializację ani kompresję. Na starcie usuwane są
+    migawki wersji spoza manifestu, które zostały po poprzednich uruchomieniach.
+    """
+    start = time.perf_counter()
+    try:
+        removed = snapshots.collect_garbage()
+        if removed:
+            logger.info("warmup removed stale snapshots count=%s", removed)
+        if storage.import_json_files(BIKES_FILE, ENRICHED_BIKES_FILE, STATS_FILE):
+            logger.info("warmup imported legacy json files")
+        for cache in (bikes_dataset, bikes_ai_dataset, enriched_dataset, statistics_dataset):
+            dataset = cache.get()
+            dataset.encoded(dataset.negotiate("br, gzip"))
+        warmup_state["took_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        warmup_state["ready"] = True
+        logger.info("warmup finished took_ms=%s", warmup_state["took_ms"])
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        logger.exception("warmup failed error=%s", e)
+
+
+@app.get("/health")
+async def health():
+    """Liveness - proces działa i obsługuje zapytania."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness - dane zostały rozgrzane i serwer jest gotowy na ruch."""
+    if warmup_state["ready"]:
+        return {"status": "ready", "warmup_ms": warmup_state["took_ms"]}
+    status = "error" if warmup_state["error"] else "warming_up"
+    return JSONResponse(status_code=503, content={"status": status, "error": warmup_state["error"]})
 
 
 @app.get("/")
@@ -267,108 +470,190 @@ async def get_index():
     return FileResponse(HTML_FILE)
 
 
+async def run_scrape(pages: int) -> Dict[str, Any]:
+    """Scrapuje OLX i zapisuje wyniki w bazie; wywołujący musi wcześniej przejąć blokadę scrape_progress."""
+    logger.info("scrape started pages=%d", pages)
+    # Utworzenie katalogu danych, jeśli nie istnieje
+    os.makedirs(DATA_DIR, exist_ok=True)
+    
+    # Inicjalizacja i uruchomienie scrapera (moduł ładowany przy pierwszym scrapowaniu)
+    scraper_module = await run_in_threadpool(importlib.import_module, "olx_gravel_scraper")
+    scraper = scraper_module.OlxGravelScraper(max_pages=pages)
+    
+    # Każdy rower jest zapisywany w bazie zaraz po przetworzeniu ogłoszenia (nowe są dopisywane,
+    # zmienione aktualizowane), więc klienci /api/live dostają go od razu jako deltę
+    counts = {"new": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    started_at = datetime.now().isoformat()
+    
+    async def save_bike(bike):
+        result = await run_in_threadpool(storage.upsert_bikes, [bike.__dict__])
+        for key, value in result.items():
+            counts[key] += value
+        saved = sum(counts.values())
+        await run_in_threadpool(scrape_progress.update, saved, 0, f"Zapisano {saved} ogłoszeń...")
+    
+    bikes = await scraper.scrape(on_bike=save_bike)
+    if bikes:
+        # Ogłoszenia dawno niewidziane przestają być aktualne
+        # (pusty wynik, np. przy blokadzie OLX, niczego nie wycofuje)
+        counts["removed"] = await run_in_threadpool(storage.complete_scrape, started_at)
+    logger.info("scrape saved bikes=%d new=%d updated=%d unchanged=%d removed=%d",
+                len(bikes), counts["new"], counts["updated"], counts["unchanged"], counts["removed"])
+    
+    # Generowanie i zapisanie statystyk dla aktualnych rowerów
+    def update_statistics():
+        storage.save_statistics(scraper.generate_statistics(list(storage.iter_bikes())))
+    await run_in_threadpool(update_statistics)
+    
+    await run_in_threadpool(
+        scrape_progress.complete,
+        f"Zakończono scrapowanie: {len(bikes)} ogłoszeń (nowe: {counts['new']}, zmienione: {counts['updated']}, "
+        f"wycofane: {counts['removed']})")
+    return {"bikes": bikes, "counts": counts}
+
+
 @app.get("/api/scrape")
 async def scrape_data(pages: int = Query(5, ge=1, le=20)):
     """Pobiera nowe dane z OLX."""
+    # Tylko jedno scrapowanie naraz - niezależnie od liczby workerów serwera i harmonogramu
+    if not await run_in_threadpool(scrape_progress.start, "Scrapowanie OLX..."):
+        raise HTTPException(status_code=409, detail="Scrapowanie już jest w trakcie")
+    
     try:
-        # Utworzenie katalogu danych, jeśli nie istnieje
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
-        # Inicjalizacja i uruchomienie scrapera
-        scraper = OlxGravelScraper(max_pages=pages)
-        bikes = await scraper.scrape()
-        
-        # Zapisanie danych
-        scraper.save_to_csv(os.path.join(DATA_DIR, "gravel_bikes.csv"))
-        scraper.save_to_json(BIKES_FILE)
-        
-        # Generowanie i zapisanie statystyk
-        stats = scraper.generate_statistics()
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, ensure_ascii=False, indent=2)
-        
+        result = await run_scrape(pages)
         # Zwrócenie danych jako JSON
-        return JSONResponse(content=[bike.__dict__ for bike in bikes])
+        return JSONResponse(content=[bike.__dict__ for bike in result["bikes"]])
     
     except Exception as e:
+        logger.exception("scrape failed error=%s", e)
+        await run_in_threadpool(scrape_progress.complete, f"Błąd scrapowania: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Błąd scraping'u: {str(e)}")
 
 
+async def scheduled_scrape() -> Optional[Dict[str, int]]:
+    """Przebieg harmonogramu; zwraca None, jeśli scrapowanie już trwa."""
+    if not await run_in_threadpool(scrape_progress.start, "Zaplanowane scrapowanie OLX..."):
+        return None
+    try:
+        result = await run_scrape(SCRAPE_SCHEDULE_PAGES)
+    except Exception as e:
+        await run_in_threadpool(scrape_progress.complete, f"Błąd scrapowania: {str(e)}")
+        raise
+    return result["counts"]
+
+
+# Okresowe scrapowanie (domyślnie wyłączone, np. SCRAPE_SCHEDULE=1)
+scrape_scheduler = ScrapeScheduler(
+    jobs, scheduled_scrape,
+    interval=SCRAPE_INTERVAL, min_interval=SCRAPE_MIN_INTERVAL, max_interval=SCRAPE_MAX_INTERVAL,
+    jitter=SCRAPE_JITTER, target_churn=SCRAPE_TARGET_CHURN)
+
+
+@app.get("/api/scheduler")
+async def scheduler_status():
+    """Zwraca stan harmonogramu scrapowania: interwał, następne i ostatnie uruchomienie."""
+    status = await run_in_threadpool(scrape_scheduler.status)
+    return {"enabled": SCRAPE_SCHEDULE, "pages": SCRAPE_SCHEDULE_PAGES, **status}
+
+
+@app.get("/api/scrape/progress")
+async def scrape_progress_stream(request: Request):
+    """Strumieniuje stan scrapowania za pomocą SSE."""
+    return progress_stream_response(request, scrape_progress)
+
+
 @app.get("/api/data/bikes", response_model=List[GravelBike])
-async def get_bikes():
-    """Zwraca zapisane dane rowerów."""
+async def get_bikes(request: Request, include: Optional[str] = Query(None, pattern="^ai$")):
+    """Zwraca zapisane dane rowerów; z include=ai razem z wynikami analizy AI."""
     try:
-        print(f"API: get_bikes called, checking if {BIKES_FILE} exists")
-        if not os.path.exists(BIKES_FILE):
-            print(f"API: {BIKES_FILE} does not exist, returning empty list")
-            return []
-        
-        print(f"API: Reading data from {BIKES_FILE}")
-        with open(BIKES_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            print(f"API: Loaded {len(data)} bikes from file")
-            return data
+        # Dane są walidowane raz przy wczytaniu nowej wersji, tu wysyłamy gotowe bajty
+        cache = bikes_ai_dataset if include == "ai" else bikes_dataset
+        return await dataset_response(request, cache)
     
     except Exception as e:
-        print(f"API: Error reading bike data: {str(e)}")
+        logger.exception("get_bikes failed error=%s", e)
         raise HTTPException(status_code=500, detail=f"Błąd odczytu danych: {str(e)}")
 
 
 @app.get("/api/data/statistics", response_model=Dict[str, Any])
-async def get_statistics():
+async def get_statistics(request: Request):
     """Zwraca rozszerzone statystyki."""
     try:
-        print("API: get_statistics called")
-        # Używamy funkcji rozszerzającej statystyki
-        extended_stats = enhance_statistics()
-        print(f"API: Enhanced statistics: {extended_stats}")
-        return extended_stats
+        # Statystyki są przeliczane tylko po zmianie danych źródłowych
+        return await dataset_response(request, statistics_dataset)
     
     except Exception as e:
-        print(f"API: Error reading statistics: {str(e)}")
+        logger.exception("get_statistics failed error=%s", e)
         raise HTTPException(status_code=500, detail=f"Błąd odczytu statystyk: {str(e)}")
 
 
-@app.get("/api/ai-analyze")
-async def analyze_bikes():
-    """Analizuje zapisane dane rowerów za pomocą LLM."""
-    global analysis_progress
+@app.get("/api/search")
+async def search_bikes(
+    q: str = Query(..., min_length=1, description="Szukane słowa, np. GRX carbon"),
+    brand: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """Wyszukuje rowery pełnotekstowo po tytule, opisie i parametrach."""
+    try:
+        start = time.perf_counter()
+        results = await run_in_threadpool(
+            storage.search_bikes, q, brand, min_price, max_price, limit, offset)
+        return JSONResponse(content={
+            "query": q,
+            "count": len(results),
+            "took_ms": round((time.perf_counter() - start) * 1000, 2),
+            "results": results,
+        })
     
+    except Exception as e:
+        logger.exception("search failed query=%r error=%s", q, e)
+        raise HTTPException(status_code=500, detail=f"Błąd wyszukiwania: {str(e)}")
+
+
+@app.get("/api/ai-analyze")
+async def analyze_bikes(full: bool = Query(False, description="Analizuj wszystkie rowery, także te z aktualnym wynikiem")):
+    """Analizuje zapisane dane rowerów za pomocą LLM.
+
+    Domyślnie analiza jest przyrostowa: do modelu trafiają tylko nowe lub zmienione
+    ogłoszenia (oraz te z nieudaną albo nieaktualną analizą).
+    """
     try:
-        if not os.path.exists(BIKES_FILE):
+        if await run_in_threadpool(storage.count_bikes) == 0:
             raise HTTPException(status_code=404, detail="Brak danych do analizy. Najpierw pobierz dane z OLX.")
         
-        # Jeśli analiza już jest w trakcie, zwróć informację
-        if analysis_progress.is_running:
+        # Rozpocznij analizę; jeśli już jest w trakcie (w tym lub innym workerze), zwróć informację
+        if not await run_in_threadpool(analysis_progress.start, "Inicjalizacja analizy..."):
             return JSONResponse(content={"status": "Analiza już jest w trakcie"})
         
-        # Resetuj postęp
-        analysis_progress.reset()
-        
         # Uruchom analizę w osobnym wątku
         def run_analysis():
             try:
-                # Wczytaj dane rowerów
-                with open(BIKES_FILE, 'r', encoding='utf-8') as f:
-                    bikes = json.load(f)
-                
                 # Ustaw całkowitą liczbę rowerów
-                analysis_progress.update(0, len(bikes), "Przygotowanie do analizy...")
+                analysis_progress.update(0, storage.count_bikes(), "Przygotowanie do analizy...")
                 
-                # Inicjalizacja BikeDataEnricher
-                enricher = BikeDataEnricher()
+                # Inicjalizacja BikeDataEnricher (moduł ładowany przy pierwszej analizie)
+                from LLM_Integration import BikeDataEnricher
+                enricher = BikeDataEnricher(cache_path=LLM_CACHE_FILE)
                 enricher.set_progress_callback(lambda current, total, status: 
                     analysis_progress.update(current, total, status))
                 
-                # Analiza danych
-                enriched_bikes = enricher.process_bikes_from_json(BIKES_FILE, ENRICHED_BIKES_FILE)
+                # Analiza danych - wyniki trafiają bezpośrednio do bazy
+                try:
+                    enricher.process_bikes_from_storage(storage, incremental=not full)
+                finally:
+                    # Tokeny, wywołania i eskalacje trafiają do /metrics także po przerwanej analizie
+                    llm_metrics.record_run(enricher.run_summary())
                 
                 # Zakończ postęp
-                analysis_progress.complete()
+                analysis_progress.complete("Zakończono analizę")
+                logger.info("analysis finished")
                 
             except Exception as e:
-                analysis_progress.status = f"Błąd analizy: {str(e)}"
-                analysis_progress.is_running = False
+                logger.exception("analysis failed error=%s", e)
+                analysis_progress.complete(f"Błąd analizy: {str(e)}")
         
         # Uruchom wątek
         threading.Thread(target=run_analysis).start()
@@ -376,33 +661,110 @@ async def analyze_bikes():
         # Zwróć natychmiast status, analiza będzie kontynuowana w tle
         return JSONResponse(content={"status": "Rozpoczęto analizę AI"})
     
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.exception("analysis start failed error=%s", e)
         raise HTTPException(status_code=500, detail=f"Błąd analizy AI: {str(e)}")
 
 
+def progress_stream_response(request: Request, progress: JobProgress) -> StreamingResponse:
+    """Tworzy strumień SSE z postępem zadania.
+    
+    Stan jest odczytywany ze wspólnego JobStore, więc każdy worker serwera
+    wysyła ten sam postęp, niezależnie od tego, który proces wykonuje zadanie.
+    """
+    async def event_generator():
+        last_seq = None
+        while not await request.is_disconnected():
+            state = await run_in_threadpool(progress.snapshot)
+            # Wysyłamy tylko zmiany (i zawsze stan początkowy)
+            if state["seq"] != last_seq:
+                last_seq = state["seq"]
+                data = json.dumps({
+                    "current": state["current"],
+                    "total": state["total"],
+                    "status": state["status"],
+                    "is_running": state["is_running"],
+                })
+                yield f"data: {data}\n\n"
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
 @app.get("/api/ai-analyze/progress")
-async def analysis_progress_stream():
+async def analysis_progress_stream(request: Request):
     """Strumieniuje aktualizacje postępu analizy AI za pomocą SSE."""
+    return progress_stream_response(request, analysis_progress)
+
+
+def live_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Formatuje zdarzenie SSE."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def live_change_event(change: Dict[str, Any]) -> str:
+    """Zamienia wpis dziennika zmian na zdarzenie SSE z deltą."""
+    data = change["data"]
+    if change["kind"] == "bike" and data["op"] == "removed":
+        # Ogłoszenie zniknęło z OLX - klient usuwa je po URL
+        data = {"op": "removed", "url": data["url"]}
+    elif change["kind"] == "bike":
+        # Ten sam kształt rekordu co w /api/data/bikes
+        data = {"op": data["op"], "bike": validate_bike(data["bike"])}
+    return live_event(change["kind"], data, change["seq"])
+
+
+@app.get("/api/live")
+async def live_feed(request: Request, since: Optional[int] = Query(None, ge=0)):
+    """Strumieniuje zmiany danych (nowe/zmienione/wycofane ogłoszenia i wyniki analizy AI) jako delty SSE.
+    
+    Zdarzenia `bike` i `enrichment` mają id równe numerowi zmiany, więc po
+    zerwaniu połączenia przeglądarka wznawia strumień od ostatniej odebranej zmiany
+    (nagłówek Last-Event-ID). Bez `since` strumień zaczyna od bieżącego stanu:
+    pierwsze zdarzenie `hello` podaje numer ostatniej zmiany. Zdarzenie `reset`
+    oznacza, że brakujące zmiany zostały już usunięte z dziennika i klient musi
+    pobrać pełne dane.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
     async def event_generator():
-        queue = asyncio.Queue()
-        client = analysis_progress.add_client(queue)
+        seq = since
+        latest = await run_in_threadpool(storage.latest_change_seq)
+        if seq is None:
+            seq = latest
+        elif seq > latest or seq < await run_in_threadpool(storage.oldest_change_seq) - 1:
+            # Klient ma dane z innej bazy albo brakujące zmiany zostały już usunięte z dziennika
+            yield live_event("reset", {"seq": latest}, latest)
+            seq = latest
+        yield live_event("hello", {"seq": seq}, seq)
         
-        # Wyślij początkowe dane postępu
-        initial_data = json.dumps({
-            "current": analysis_progress.current,
-            "total": analysis_progress.total,
-            "status": analysis_progress.status
-        })
-        yield f"data: {initial_data}\n\n"
-        
-        try:
-            while True:
-                data = await queue.get()
-                yield data
-        except asyncio.CancelledError:
-            # Usuń klienta przy zamknięciu połączenia
-            analysis_progress.remove_client(client)
-            raise
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            changes = await run_in_threadpool(storage.changes_since, seq)
+            if changes:
+                yield "".join(live_change_event(change) for change in changes)
+                seq = changes[-1]["seq"]
+                last_sent = time.monotonic()
+                # Przy zaległościach od razu pobieramy kolejną porcję
+                continue
+            if time.monotonic() - last_sent >= LIVE_KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(LIVE_POLL_INTERVAL)
     
     return StreamingResponse(
         event_generator(),
@@ -415,25 +777,75 @@ async def analysis_progress_stream():
 
 
 @app.get("/api/data/enriched-bikes")
-async def get_enriched_bikes():
+async def get_enriched_bikes(request: Request):
     """Zwraca wzbogacone dane rowerów."""
     try:
-        print(f"API: get_enriched_bikes called, checking if {ENRICHED_BIKES_FILE} exists")
-        if not os.path.exists(ENRICHED_BIKES_FILE):
-            print(f"API: {ENRICHED_BIKES_FILE} does not exist, returning empty list")
-            return []
-        
-        print(f"API: Reading enriched data from {ENRICHED_BIKES_FILE}")
-        with open(ENRICHED_BIKES_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            print(f"API: Loaded {len(data)} enriched bikes from file")
-            return data
+        return await dataset_response(request, enriched_dataset)
     
     except Exception as e:
-        print(f"API: Error reading enriched bike data: {str(e)}")
+        logger.exception("get_enriched_bikes failed error=%s", e)
         raise HTTPException(status_code=500, detail=f"Błąd odczytu wzbogaconych danych: {str(e)}")
 
 
+def stream_records(records: Iterable[Dict[str, Any]], fmt: str):
+    """Generuje fragmenty odpowiedzi strumieniowej prosto z warstwy storage.
+
+    Format "ndjson" wysyła jeden obiekt JSON na linię, format "json" wysyła
+    tablicę JSON w kawałkach (chunked transfer encoding).
+    """
+    batch = []
+    first = True
+
+    if fmt == "json":
+        yield "["
+
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False)
+        if fmt == "json":
+            batch.append(line if first else "," + line)
+        else:
+            batch.append(line + "\n")
+        first = False
+
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield "".join(batch)
+            batch = []
+
+    if batch:
+        yield "".join(batch)
+
+    if fmt == "json":
+        yield "]"
+
+
+def streaming_data_response(records: Iterable[Dict[str, Any]], fmt: str) -> StreamingResponse:
+    """Tworzy odpowiedź strumieniową dla podanego iteratora rekordów."""
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return StreamingResponse(stream_records(records, fmt), media_type=media_type)
+
+
+@app.get("/api/data/bikes/stream")
+async def stream_bikes(format: str = Query("ndjson", pattern="^(ndjson|json)$"),
+                       include: Optional[str] = Query(None, pattern="^ai$")):
+    """Strumieniuje zapisane dane rowerów jako NDJSON lub tablicę JSON w kawałkach."""
+    return streaming_data_response(storage.iter_bikes(include_ai=include == "ai"), format)
+
+
+@app.get("/api/data/enriched-bikes/stream")
+async def stream_enriched_bikes(format: str = Query("ndjson", pattern="^(ndjson|json)$")):
+    """Strumieniuje wzbogacone dane rowerów jako NDJSON lub tablicę JSON w kawałkach."""
+    return streaming_data_response(storage.iter_enriched_bikes(), format)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Zwraca metryki serwera (czasy odpowiedzi, rozmiary, błędy, stan zadań) w formacie Prometheusa."""
+    body = await run_in_threadpool(metrics_registry.render)
+    return Response(content=body, media_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
+    import uvicorn
+    
     # Uruchomienie serwera
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,208 @@
+import json
+import mmap
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows - manifest aktualizowany bez blokady międzyprocesowej
+    fcntl = None
+
+# Domyślny katalog z opublikowanymi migawkami zbiorów danych
+DEFAULT_SNAPSHOT_DIR = os.path.join("data", "snapshots")
+
+# Plik wskazujący bieżącą wersję każdego zbioru danych
+MANIFEST_FILE = "manifest.json"
+MANIFEST_LOCK_FILE = "manifest.lock"
+# Liczba ostatnich wersji zbioru danych, których migawki są zachowywane
+RETENTION_VERSIONS = 3
+# Pliki spoza manifestu (np. porzucone pliki tymczasowe) są usuwane dopiero po tym czasie (w sekundach),
+# żeby nie skasować migawki, którą inny worker właśnie publikuje
+ORPHAN_GRACE_PERIOD = 600
+
+# Rozszerzenia plików dla poszczególnych kodowań body
+ENCODING_SUFFIXES = {"identity": "", "gzip": ".gz", "br": ".br"}
+# Rozszerzenia plików dla poszczególnych formatów zbioru danych
+FORMAT_EXTENSIONS = {"json": ".json", "msgpack": ".msgpack", "arrow": ".arrows"}
+
+
+def _fsync_directory(directory: str) -> None:
+    """Utrwala wpis katalogu po zmianie nazwy pliku (na systemach, które to wspierają)."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "w", encoding: Optional[str] = None,
+                newline: Optional[str] = None) -> Iterator[Any]:
+    """Otwiera plik do zapisu tak, żeby czytelnicy widzieli starą albo nową, kompletną wersję.
+
+    Dane trafiają do pliku tymczasowego w tym samym katalogu, który po zamknięciu
+    jest utrwalany (fsync) i atomowo podmieniany (`os.replace`). Jeśli zapis się
+    nie powiedzie, plik docelowy pozostaje nietknięty.
+    """
+    directory = os.path.dirname(path) or "."
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, mode, encoding=encoding, newline=newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_directory(directory)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Atomowo zapisuje bajty do pliku (plik tymczasowy + fsync + `os.replace`)."""
+    with atomic_open(path, 'wb') as f:
+        f.write(data)
+
+
+class Snapshot:
+    """Niezmienna migawka zbioru danych zmapowana w pamięci tylko do odczytu.
+
+    Strony pliku trzyma pamięć podręczna systemu operacyjnego, więc wszystkie
+    procesy mapujące ten sam plik współdzielą jedną kopię danych w RAM.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+
+class SnapshotStore:
+    """Katalog z niezmiennymi, wersjonowanymi migawkami zbiorów danych.
+
+    Każda wersja zbioru danych (w każdym formacie i kodowaniu) to osobny plik
+    publikowany atomowo: zapis do pliku tymczasowego, fsync i `os.replace`.
+    Czytelnicy widzą więc albo kompletny plik, albo żaden, a przełączenie na
+    nową wersję polega jedynie na otwarciu innego pliku - bez blokad.
+
+    Manifest (`manifest.json`) wskazuje bieżącą wersję każdego zbioru oraz
+    kilka poprzednich; migawki starszych wersji są usuwane. Procesy, które
+    wciąż mają je zmapowane, czytają dalej - system zwalnia plik dopiero
+    po zamknięciu ostatniego mapowania.
+    """
+
+    def __init__(self, directory: str = DEFAULT_SNAPSHOT_DIR, retention: int = RETENTION_VERSIONS):
+        self.directory = directory
+        self.retention = max(1, retention)
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name: str, version_key: str, encoding: str = "identity", fmt: str = "json") -> str:
+        """Ścieżka pliku migawki dla danej wersji, formatu i kodowania."""
+        return os.path.join(self.directory,
+                            f"{name}-{version_key}{FORMAT_EXTENSIONS[fmt]}{ENCODING_SUFFIXES[encoding]}")
+
+    def open(self, name: str, version_key: str, encoding: str = "identity", fmt: str = "json") -> Optional[Snapshot]:
+        """Mapuje istniejącą migawkę lub zwraca None, jeśli nie została jeszcze opublikowana."""
+        try:
+            return Snapshot(self.path(name, version_key, encoding, fmt))
+        except FileNotFoundError:
+            return None
+
+    def publish(self, name: str, version_key: str, body: bytes, encoding: str = "identity",
+                fmt: str = "json") -> Snapshot:
+        """Publikuje migawkę (zapis do pliku tymczasowego + fsync + atomowa zmiana nazwy) i ją mapuje.
+
+        Publikacja podstawowego wariantu (JSON bez kompresji) to nowa wersja
+        zbioru - trafia do manifestu, a najstarsze wersje spoza retencji są usuwane.
+        """
+        path = self.path(name, version_key, encoding, fmt)
+        atomic_write(path, body)
+        if encoding == "identity" and fmt == "json":
+            self._set_current(name, version_key)
+        return Snapshot(path)
+
+    def read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Zwraca manifest: dla każdego zbioru bieżącą wersję i listę zachowanych wersji."""
+        try:
+            with open(self.manifest_path, 'rb') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def current_version(self, name: str) -> Optional[str]:
+        """Klucz bieżącej wersji zbioru danych według manifestu."""
+        return self.read_manifest().get(name, {}).get("current")
+
+    @contextmanager
+    def _manifest_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, MANIFEST_LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _set_current(self, name: str, version_key: str) -> None:
+        with self._manifest_lock():
+            manifest = self.read_manifest()
+            entry = manifest.setdefault(name, {"current": None, "versions": []})
+            versions = [version for version in entry["versions"] if version["key"] != version_key]
+            versions.append({"key": version_key, "published_at": time.time()})
+            expired = versions[:-self.retention]
+            entry["versions"] = versions[-self.retention:]
+            entry["current"] = version_key
+            atomic_write(self.manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+
+        for version in expired:
+            self._remove_version(name, version["key"])
+
+    def _remove_version(self, name: str, version_key: str) -> int:
+        prefix = f"{name}-{version_key}."
+        removed = 0
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix):
+                removed += self._remove(filename)
+        return removed
+
+    def _remove(self, filename: str) -> int:
+        try:
+            os.remove(os.path.join(self.directory, filename))
+            return 1
+        except OSError:
+            # Np. plik zmapowany przez inny proces w Windows - spróbujemy przy kolejnym sprzątaniu
+            return 0
+
+    def collect_garbage(self, grace_period: float = ORPHAN_GRACE_PERIOD) -> int:
+        """Usuwa migawki wersji spoza manifestu i porzucone pliki tymczasowe.
+
+        Pliki młodsze niż `grace_period` sekund zostają - mogą należeć do
+        wersji, którą inny worker właśnie publikuje. Zwraca liczbę usuniętych plików.
+        """
+        manifest = self.read_manifest()
+        retained = tuple(f"{name}-{version['key']}." for name, entry in manifest.items()
+                         for version in entry["versions"])
+        cutoff = time.time() - grace_period
+        removed = 0
+        for filename in os.listdir(self.directory):
+            if filename in (MANIFEST_FILE, MANIFEST_LOCK_FILE) or filename.startswith(retained):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self.directory, filename)) > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            removed += self._remove(filename)
+        return removed
@@ -25,11 +25,21 @@ document.addEventListener('DOMContentLoaded', () => {
     let brandChart = null;
     let priceChart = null;
     
+    // Strumień zmian na żywo (/api/live) - nowe ogłoszenia i wyniki analizy AI przychodzą jako delty
+    let liveSource = null;
+    let liveReady = null;
+    let liveBuffer = null;
+    let liveRenderTimer = null;
+    const LIVE_RENDER_DELAY = 300;
+    
     // Pobieranie danych z OLX
     scrapeBtn.addEventListener('click', async () => {
         const pages = pagesInput.value;
         statisticsDiv.innerHTML = '<div class="loading">Pobieranie danych...</div>';
-        bikesTableDiv.innerHTML = '<div class="loading">Pobieranie danych...</div>';
+        // Przy aktywnym strumieniu zmian tabela zostaje - nowe ogłoszenia dochodzą do niej na bieżąco
+        if (!liveSource || allBikes.length === 0) {
+            bikesTableDiv.innerHTML = '<div class="loading">Pobieranie danych...</div>';
+        }
         
         // Wyłącz przycisk podczas pobierania
         scrapeBtn.disabled = true;
@@ -41,7 +51,13 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error('Błąd podczas pobierania danych');
             }
             
-            await loadData();
+            // Rowery dotarły już przez strumień zmian - wystarczy odświeżyć statystyki
+            if (liveSource) {
+                const stats = await loadStatistics();
+                generateCharts(allBikes, stats);
+            } else {
+                await loadData();
+            }
         } catch (error) {
             alert(`Błąd: ${error.message}`);
             statisticsDiv.innerHTML = '<div class="loading">Wystąpił błąd</div>';
@@ -86,81 +102,141 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
+    // Ładowanie i wyświetlanie statystyk
+    async function loadStatistics() {
+        console.log('Fetching statistics...');
+        const statsResponse = await fetch('/api/data/statistics');
+        if (!statsResponse.ok) {
+            throw new Error('Błąd podczas ładowania statystyk');
+        }
+        const stats = await statsResponse.json();
+        console.log('Statistics loaded:', stats);
+        displayStatistics(stats);
+        return stats;
+    }
+    
+    // Zastosowanie delty ze strumienia zmian (delty są idempotentne - klucz to URL)
+    function applyLiveEvent(type, data) {
+        if (type === 'enrichment') {
+            const bike = allBikes.find(item => item.url === data.url);
+            if (bike) {
+                bike.ai_analysis = data.ai_analysis;
+                scheduleLiveRender();
+            }
+            return;
+        }
+        const { op, bike, url } = data;
+        if (op === 'removed') {
+            // Ogłoszenie zniknęło z OLX przy ostatnim scrapowaniu
+            allBikes = allBikes.filter(item => item.url !== url);
+            scheduleLiveRender();
+            return;
+        }
+        const existing = allBikes.find(item => item.url === bike.url);
+        if (existing) {
+            // Zachowaj wynik analizy AI - delta roweru go nie zawiera
+            Object.assign(existing, bike, { ai_analysis: existing.ai_analysis || bike.ai_analysis });
+        } else {
+            allBikes.push(bike);
+        }
+        scheduleLiveRender();
+    }
+    
+    // W trakcie pobierania pełnych danych delty są buforowane i stosowane po ich wczytaniu
+    function onLiveEvent(type) {
+        return (event) => {
+            const data = JSON.parse(event.data);
+            if (liveBuffer) {
+                liveBuffer.push([type, data]);
+            } else {
+                applyLiveEvent(type, data);
+            }
+        };
+    }
+    
+    // Połączenie ze strumieniem zmian. Zwraca obietnicę spełnianą po zdarzeniu `hello`:
+    // pełne dane pobrane później zawierają wszystkie zmiany sprzed połączenia, a nowsze
+    // przychodzą strumieniem, więc żadna zmiana nie zostanie pominięta
+    function connectLiveFeed() {
+        if (liveReady) {
+            return liveReady;
+        }
+        if (!window.EventSource) {
+            return Promise.resolve();
+        }
+        liveSource = new EventSource('/api/live');
+        liveReady = new Promise(resolve => {
+            liveSource.addEventListener('hello', resolve, { once: true });
+            // Bez strumienia dane i tak muszą się wczytać
+            liveSource.addEventListener('error', resolve, { once: true });
+        });
+        
+        liveSource.addEventListener('bike', onLiveEvent('bike'));
+        liveSource.addEventListener('enrichment', onLiveEvent('enrichment'));
+        
+        // Serwer nie ma już brakujących zmian - potrzebne pełne dane
+        liveSource.addEventListener('reset', () => loadData());
+        return liveReady;
+    }
+    
+    // Odświeżenie tabeli po serii delt (najwyżej raz na LIVE_RENDER_DELAY ms)
+    function scheduleLiveRender() {
+        if (liveRenderTimer) {
+            return;
+        }
+        liveRenderTimer = setTimeout(() => {
+            liveRenderTimer = null;
+            const selectedBrand = brandFilter.value;
+            const selectedSize = sizeFilter.value;
+            updateFilterOptions();
+            brandFilter.value = selectedBrand;
+            sizeFilter.value = selectedSize;
+            applyFilters();
+        }, LIVE_RENDER_DELAY);
+    }
+    
     // Funkcja ładująca dane
     async function loadData() {
         try {
             console.log('Starting data loading process...');
+            liveBuffer = [];
+            await connectLiveFeed();
             
             // Ładowanie statystyk
-            console.log('Fetching statistics...');
-            const statsResponse = await fetch('/api/data/statistics');
-            if (!statsResponse.ok) {
-                throw new Error('Błąd podczas ładowania statystyk');
+            const stats = await loadStatistics();
+            
+            // Ładowanie danych o rowerach - jeden widok z dołączonymi wynikami analizy AI,
+            // bez łączenia danych po stronie klienta
+            console.log('Loading bike data...');
+            const bikesResponse = await fetch('/api/data/bikes?include=ai');
+            if (!bikesResponse.ok) {
+                throw new Error('Błąd podczas ładowania danych o rowerach');
             }
-            const stats = await statsResponse.json();
-            console.log('Statistics loaded:', stats);
-            displayStatistics(stats);
+            allBikes = await bikesResponse.json();
+            console.log('Bikes data loaded:', allBikes);
             
-            let shouldLoadBasicData = true;
-                        
-            // Ładowanie podstawowych danych o rowerach (jeśli nie ma wzbogaconych)
-            if (shouldLoadBasicData) {
-                console.log('Loading basic bike data...');
-                const bikesResponse = await fetch('/api/data/bikes');
-                if (!bikesResponse.ok) {
-                    throw new Error('Błąd podczas ładowania danych o rowerach');
-                }
-                allBikes = await bikesResponse.json();
-                console.log('Basic bikes data loaded:', allBikes);
-                
-                if (!allBikes || !Array.isArray(allBikes)) {
-                    throw new Error('Nieprawidłowy format danych');
-                }
-                
-                filteredBikes = [...allBikes];
-                
-                // Aktualizacja filtrów
-                updateFilterOptions();
-                
-                // Wyświetlanie danych
-                displayBikes(filteredBikes);
-                
-                // Generowanie wykresów
-                generateCharts(allBikes, stats);
+            if (!allBikes || !Array.isArray(allBikes)) {
+                throw new Error('Nieprawidłowy format danych');
             }
             
-            // // Najpierw sprawdź, czy są dostępne wzbogacone dane
-            // console.log('Checking for enriched data...');
-            // const enrichedResponse = await fetch('/api/data/enriched-bikes');
-            // if (enrichedResponse.ok) {
-            //     const enrichedBikes = await enrichedResponse.json();
-            //     console.log('Enriched bikes data:', enrichedBikes);
-            //     if (enrichedBikes && Array.isArray(enrichedBikes) && enrichedBikes.length > 0) {
-            //         console.log(`Found ${enrichedBikes.length} enriched bikes`);
-            //         // Jeśli są wzbogacone dane, używamy ich
-            //         allBikes = enrichedBikes;
-            //         filteredBikes = [...allBikes];
-                    
-            //         // Aktualizacja filtrów
-            //         updateFilterOptions();
-                    
-            //         // Wyświetlanie danych
-            //         displayBikes(filteredBikes);
-                    
-            //         // Generowanie wykresów
-            //         generateCharts(allBikes, stats);
-                    
-            //         shouldLoadBasicData = false; // Nie ładuj podstawowych danych
-            //     } else {
-            //         console.log('No valid enriched bikes found, will load basic data');
-            //     }
-            // } else {
-            //     console.log('Enriched bikes endpoint returned error:', enrichedResponse.status);
-            // }
-
-
+            // Delty odebrane w trakcie pobierania - po kolei, więc kończą na najnowszym stanie
+            const buffered = liveBuffer;
+            liveBuffer = null;
+            buffered.forEach(([type, data]) => applyLiveEvent(type, data));
+            
+            filteredBikes = [...allBikes];
+            
+            // Aktualizacja filtrów
+            updateFilterOptions();
+            
+            // Wyświetlanie danych
+            displayBikes(filteredBikes);
+            
+            // Generowanie wykresów
+            generateCharts(allBikes, stats);
         } catch (error) {
             console.error('Error loading data:', error);
+            liveBuffer = null;
             bikesTableDiv.innerHTML = `<div class="loading">Błąd podczas ładowania danych: ${error.message}</div>`;
         }
     }
@@ -0,0 +1,681 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from search import build_match_query, index_text
+
+# Rozmiar bloku odczytu przy strumieniowym parsowaniu plików JSON
+READ_CHUNK_SIZE = 64 * 1024
+
+# Domyślna lokalizacja bazy danych
+DEFAULT_DB_PATH = os.path.join("data", "bikes.db")
+
+# Kolumny tabeli bikes odpowiadające polom GravelBike (poza słownikiem parameters)
+BIKE_COLUMNS = [
+    "title", "price", "location", "date_added", "url", "brand", "size", "year",
+    "description", "condition", "color", "derailleur_type", "brake_type",
+    "frame_material", "wheel_size", "seller_type", "bike_type", "frame_size_desc",
+    "gears", "weight", "suspension",
+]
+
+# Wagi kolumn indeksu pełnotekstowego w rankingu BM25 (tytuł, opis, parametry)
+SEARCH_WEIGHTS = (10.0, 1.0, 3.0)
+
+# Liczba ostatnich zmian trzymanych w dzienniku (dla klientów strumienia /api/live)
+CHANGES_RETENTION = 10000
+
+# Ogłoszenia niewidziane przez tyle godzin przed ostatnim zakończonym scrapowaniem przestają być
+# aktualne (znikają z danych, wyszukiwania i statystyk); 0 - tylko wynik ostatniego scrapowania.
+# Zapas pozwala przebiegom harmonogramu obejmującym tylko najnowsze strony nie wycofywać starszych ogłoszeń
+LISTING_RETENTION = timedelta(hours=float(os.environ.get("LISTING_RETENTION_HOURS", 72)))
+
+# Formaty dat spotykane w ogłoszeniach OLX
+DATE_FORMATS = ["%d.%m.%Y", "%d-%m-%Y", "%Y-%m-%d", "%Y.%m.%d"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bikes (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    price REAL,
+    location TEXT,
+    date_added TEXT,
+    date_iso TEXT,
+    brand TEXT,
+    size TEXT,
+    year INTEGER,
+    description TEXT,
+    condition TEXT,
+    color TEXT,
+    derailleur_type TEXT,
+    brake_type TEXT,
+    frame_material TEXT,
+    wheel_size TEXT,
+    seller_type TEXT,
+    bike_type TEXT,
+    frame_size_desc TEXT,
+    gears TEXT,
+    weight TEXT,
+    suspension TEXT,
+    parameters TEXT,
+    content_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bikes_brand ON bikes(brand COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_bikes_price ON bikes(price);
+CREATE INDEX IF NOT EXISTS idx_bikes_date ON bikes(date_iso);
+CREATE INDEX IF NOT EXISTS idx_bikes_last_seen ON bikes(last_seen);
+
+-- Indeks pełnotekstowy (tekst znormalizowany i po stemmingu, patrz search.py);
+-- rowid odpowiada rowid w tabeli bikes
+CREATE VIRTUAL TABLE IF NOT EXISTS bikes_fts USING fts5(
+    title, description, params,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+
+-- fingerprint: skrót danych wejściowych analizy i wersji promptów (NULL dla nieudanych analiz),
+-- pozwala pominąć przy kolejnej analizie ogłoszenia, które się nie zmieniły
+CREATE TABLE IF NOT EXISTS enrichments (
+    url TEXT PRIMARY KEY,
+    ai_analysis TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    fingerprint TEXT
+);
+
+CREATE TABLE IF NOT EXISTS statistics (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+-- Dziennik zmian (nowe/zmienione ogłoszenia i wyniki analizy AI) wysyłanych
+-- klientom jako delty; seq rośnie monotonicznie i służy jako id zdarzenia SSE
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dataset_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+def iter_json_array(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Strumieniowo odczytuje tablicę obiektów JSON z pliku, rekord po rekordzie.
+
+    W pamięci trzymany jest tylko bieżący blok pliku i jeden rekord, więc zużycie
+    pamięci nie zależy od liczby ogłoszeń zapisanych w pliku.
+    """
+    if not os.path.exists(path):
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        while True:
+            # Pomijanie białych znaków i separatorów między rekordami
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos >= len(buffer):
+                if eof or not fill():
+                    break
+                continue
+
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Plik {path} nie zawiera tablicy JSON")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == ']':
+                break
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Rekord przecina granicę bloku - doczytaj kolejny fragment
+                if eof or not fill():
+                    raise
+                continue
+
+            pos = end
+            yield record
+
+
+def normalize_date(date_str: Optional[str]) -> Optional[str]:
+    """Zamienia datę z ogłoszenia na format ISO (RRRR-MM-DD) na potrzeby indeksu."""
+    if not date_str:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str.strip(), date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def content_hash(bike: Dict[str, Any]) -> str:
+    """Skrót treści ogłoszenia - pozwala odróżnić zmienione ogłoszenia od niezmienionych."""
+    payload = {column: bike.get(column) for column in BIKE_COLUMNS}
+    payload["parameters"] = bike.get("parameters")
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def change_record(bike: Dict[str, Any]) -> Dict[str, Any]:
+    """Rekord roweru zapisywany w dzienniku zmian (kolumny tabeli bikes i parameters)."""
+    record = {column: bike.get(column) for column in BIKE_COLUMNS}
+    record["parameters"] = bike.get("parameters")
+    return record
+
+
+class BikeStorage:
+    """Warstwa dostępu do danych oparta o wbudowaną bazę SQLite.
+
+    Baza działa w trybie WAL, więc czytelnicy nie blokują zapisujących (i odwrotnie),
+    a każdy zapis wykonywany jest w jednej transakcji. Każdy wątek korzysta
+    z własnego połączenia.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection.executescript(SCHEMA)
+        self.instance_id = self._get_instance_id()
+        self._ensure_enrichment_fingerprint()
+        self._ensure_search_index()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Połączenie z bazą przypisane do bieżącego wątku."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _iter_query(self, query: str, params: Iterable[Any] = ()) -> Iterator[sqlite3.Row]:
+        """Iteruje po wynikach zapytania na osobnym połączeniu.
+
+        Generator może być wznawiany z różnych wątków (np. w odpowiedzi strumieniowej),
+        więc nie może współdzielić połączenia wątku z innymi zapytaniami.
+        """
+        conn = self._connect()
+        try:
+            for row in conn.execute(query, list(params)):
+                yield row
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Transakcja zapisu - blokada zapisu jest brana od razu, aby uniknąć zakleszczeń."""
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Zamyka połączenie bieżącego wątku."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Wersje zbiorów danych ---
+
+    def _get_instance_id(self) -> int:
+        """Losowy identyfikator bazy nadawany przy jej utworzeniu.
+
+        Odróżnia wersje zbiorów danych z różnych baz (np. po usunięciu pliku bazy
+        liczniki wersji zaczynają się od nowa).
+        """
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('instance_id', ?)",
+                (str(int.from_bytes(os.urandom(4), "big")),),
+            )
+            return int(conn.execute("SELECT value FROM meta WHERE key = 'instance_id'").fetchone()[0])
+
+    def _bump_version(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO dataset_versions (name, version, updated_at) VALUES (?, 1, ?) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+            (name, datetime.now().isoformat()),
+        )
+
+    def dataset_version(self, name: str) -> int:
+        """Zwraca numer wersji zbioru danych (rośnie przy każdej zmianie)."""
+        row = self.connection.execute(
+            "SELECT version FROM dataset_versions WHERE name = ?", (name,)
+        ).fetchone()
+        return row["version"] if row else 0
+
+    def dataset_versions(self, *names: str) -> Tuple[int, ...]:
+        """Zwraca wersje kilku zbiorów danych jednym zapytaniem."""
+        rows = self.connection.execute("SELECT name, version FROM dataset_versions").fetchall()
+        versions = {row["name"]: row["version"] for row in rows}
+        return tuple(versions.get(name, 0) for name in names)
+
+    def version_tag(self, *names: str) -> Tuple[int, ...]:
+        """Wersja złożona z identyfikatora bazy i wersji podanych zbiorów danych.
+
+        Jednoznacznie identyfikuje zawartość - służy jako klucz pamięci podręcznej,
+        ETag i nazwa migawki.
+        """
+        return (self.instance_id,) + self.dataset_versions(*names)
+
+    # --- Rowery ---
+
+    def upsert_bikes(self, bikes: Iterable[Dict[str, Any]], record_changes: bool = True) -> Dict[str, int]:
+        """Zapisuje ogłoszenia (wstawia nowe, aktualizuje zmienione) w jednej transakcji.
+
+        Nowe i zmienione ogłoszenia trafiają do dziennika zmian, chyba że
+        `record_changes` jest False (np. przy jednorazowym imporcie).
+
+        Returns:
+            Liczniki nowych, zmienionych i niezmienionych ogłoszeń
+        """
+        counts = {"new": 0, "updated": 0, "unchanged": 0}
+        now = datetime.now().isoformat()
+        columns = BIKE_COLUMNS + ["parameters", "date_iso", "content_hash"]
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "url")
+
+        revived = 0
+        with self.transaction() as conn:
+            current_since = conn.execute("SELECT value FROM meta WHERE key = 'current_since'").fetchone()
+            for bike in bikes:
+                digest = content_hash(bike)
+                row = conn.execute("SELECT content_hash, last_seen FROM bikes WHERE url = ?",
+                                   (bike["url"],)).fetchone()
+
+                if row is not None and row["content_hash"] == digest:
+                    counts["unchanged"] += 1
+                    conn.execute("UPDATE bikes SET last_seen = ? WHERE url = ?", (now, bike["url"]))
+                    if current_since is not None and row["last_seen"] < current_since["value"]:
+                        # Wycofane ogłoszenie wróciło - klienci muszą je dostać z powrotem
+                        revived += 1
+                        if record_changes:
+                            self._record_change(conn, "bike", bike["url"], {"op": "new", "bike": change_record(bike)})
+                    continue
+
+                counts["new" if row is None else "updated"] += 1
+                values = [bike.get(column) for column in BIKE_COLUMNS]
+                parameters = bike.get("parameters")
+                values.append(orjson.dumps(parameters).decode() if parameters is not None else None)
+                values.append(normalize_date(bike.get("date_added")))
+                values.append(digest)
+                conn.execute(
+                    f"INSERT INTO bikes ({', '.join(columns)}, first_seen, last_seen) "
+                    f"VALUES ({placeholders}, ?, ?) "
+                    f"ON CONFLICT(url) DO UPDATE SET {updates}, last_seen = excluded.last_seen",
+                    values + [now, now],
+                )
+                # Indeks pełnotekstowy jest aktualizowany w tej samej transakcji
+                rowid = conn.execute("SELECT rowid FROM bikes WHERE url = ?", (bike["url"],)).fetchone()[0]
+                self._index_bike(conn, rowid, bike)
+
+                if record_changes:
+                    self._record_change(conn, "bike", bike["url"],
+                                        {"op": "new" if row is None else "updated", "bike": change_record(bike)})
+
+            if counts["new"] or counts["updated"] or revived:
+                self._bump_version(conn, "bikes")
+                self._prune_changes(conn)
+
+        return counts
+
+    def _index_bike(self, conn: sqlite3.Connection, rowid: int, bike: Dict[str, Any]) -> None:
+        parameters = bike.get("parameters") or {}
+        conn.execute("DELETE FROM bikes_fts WHERE rowid = ?", (rowid,))
+        conn.execute(
+            "INSERT INTO bikes_fts (rowid, title, description, params) VALUES (?, ?, ?, ?)",
+            (rowid, index_text(bike.get("title")), index_text(bike.get("description")),
+             index_text(" ".join(str(value) for value in parameters.values()))),
+        )
+
+    def _ensure_search_index(self) -> None:
+        """Odbudowuje indeks pełnotekstowy dla bazy utworzonej przed jego dodaniem."""
+        conn = self.connection
+        indexed = conn.execute("SELECT COUNT(*) FROM bikes_fts").fetchone()[0]
+        if indexed == self.count_bikes(include_stale=True):
+            return
+        rows = conn.execute(f"SELECT rowid, {', '.join(BIKE_COLUMNS)}, parameters FROM bikes").fetchall()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM bikes_fts")
+            for row in rows:
+                self._index_bike(conn, row["rowid"], self._bike_from_row(row))
+
+    def search_bikes(self, query: str, brand: Optional[str] = None, min_price: Optional[float] = None,
+                     max_price: Optional[float] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Wyszukuje aktualne rowery pełnotekstowo (tytuł, opis, parametry) z rankingiem BM25.
+
+        Returns:
+            Lista rowerów posortowana od najlepiej dopasowanych, z polem "score"
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        conditions, params = self._filters(brand, min_price, max_price, table="b")
+        columns = ", ".join(f"b.{column}" for column in BIKE_COLUMNS)
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        sql = (
+            f"SELECT {columns}, b.parameters, bm25(bikes_fts, {weights}) AS rank "
+            "FROM bikes_fts JOIN bikes b ON b.rowid = bikes_fts.rowid "
+            "WHERE bikes_fts MATCH ?"
+        )
+        if conditions:
+            sql += " AND " + " AND ".join(conditions)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+
+        results = []
+        for row in self.connection.execute(sql, [match] + params + [limit, offset]):
+            bike = self._bike_from_row(row)
+            # bm25 zwraca wartości ujemne - im mniejsza, tym lepsze dopasowanie
+            bike["score"] = round(-row["rank"], 4)
+            results.append(bike)
+        return results
+
+    def _bike_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        bike = {column: row[column] for column in BIKE_COLUMNS}
+        bike["parameters"] = orjson.loads(row["parameters"]) if row["parameters"] is not None else None
+        return bike
+
+    def iter_bikes(self, brand: Optional[str] = None, min_price: Optional[float] = None,
+                   max_price: Optional[float] = None, include_ai: bool = False,
+                   include_stale: bool = False) -> Iterator[Dict[str, Any]]:
+        """Iteruje po aktualnych rowerach (w kolejności dodania), opcjonalnie filtrując.
+
+        Z `include_stale` zwraca także ogłoszenia, których ostatnie scrapowanie już nie widziało.
+
+        Z `include_ai` każdy rower ma pole ai_analysis dołączone z tabeli enrichments
+        (None, jeśli rower nie był jeszcze analizowany).
+        """
+        conditions, params = self._filters(brand, min_price, max_price, include_stale=include_stale)
+        columns = ", ".join(f"bikes.{column}" for column in BIKE_COLUMNS + ["parameters"])
+        if include_ai:
+            query = (f"SELECT {columns}, enrichments.ai_analysis FROM bikes "
+                     "LEFT JOIN enrichments ON enrichments.url = bikes.url")
+        else:
+            query = f"SELECT {columns} FROM bikes"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY bikes.rowid"
+        for row in self._iter_query(query, params):
+            bike = self._bike_from_row(row)
+            if include_ai:
+                bike["ai_analysis"] = orjson.loads(row["ai_analysis"]) if row["ai_analysis"] is not None else None
+            yield bike
+
+    def _filters(self, brand: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                 table: str = "bikes", include_stale: bool = False) -> Tuple[List[str], List[Any]]:
+        conditions, params = self._current_filter(include_stale, table)
+        if brand:
+            conditions.append(f"{table}.brand = ? COLLATE NOCASE")
+            params.append(brand)
+        if min_price is not None:
+            conditions.append(f"{table}.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append(f"{table}.price <= ?")
+            params.append(max_price)
+        return conditions, params
+
+    def get_bike(self, url: str) -> Optional[Dict[str, Any]]:
+        """Zwraca pojedynczy rower po adresie ogłoszenia."""
+        row = self.connection.execute(
+            f"SELECT {', '.join(BIKE_COLUMNS)}, parameters FROM bikes WHERE url = ?", (url,)
+        ).fetchone()
+        return self._bike_from_row(row) if row else None
+
+    def count_bikes(self, include_stale: bool = False) -> int:
+        """Zwraca liczbę aktualnych rowerów (z `include_stale` - wszystkich zapisanych)."""
+        conditions, params = self._current_filter(include_stale)
+        query = "SELECT COUNT(*) FROM bikes"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.connection.execute(query, params).fetchone()[0]
+
+    # --- Aktualne ogłoszenia ---
+
+    def current_since(self) -> Optional[str]:
+        """Granica aktualności ogłoszeń (None, jeśli nie zarejestrowano żadnego scrapowania).
+
+        Aktualne są ogłoszenia widziane od tej chwili (`last_seen`); starsze zniknęły
+        z OLX i nie trafiają do odczytów ani statystyk, ale zostają w bazie.
+        """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'current_since'").fetchone()
+        return row["value"] if row else None
+
+    def _current_filter(self, include_stale: bool, table: str = "bikes") -> Tuple[List[str], List[Any]]:
+        current_since = None if include_stale else self.current_since()
+        if current_since is None:
+            return [], []
+        return [f"{table}.last_seen >= ?"], [current_since]
+
+    def complete_scrape(self, started_at: str, retention: timedelta = LISTING_RETENTION) -> int:
+        """Rejestruje zakończone scrapowanie rozpoczęte w chwili `started_at` (ISO).
+
+        Ogłoszenia niewidziane przez `retention` przed tą chwilą przestają być
+        aktualne. Przy zerowym `retention` zostają tylko ogłoszenia z tego
+        scrapowania - jak przy dawnym nadpisywaniu plików jego wynikiem. Każde
+        wycofane ogłoszenie trafia do dziennika zmian (op "removed").
+
+        Returns:
+            Liczba wycofanych ogłoszeń
+        """
+        started_at = (datetime.fromisoformat(started_at) - retention).isoformat()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'current_since'").fetchone()
+            previous = row["value"] if row else ""
+            if started_at <= previous:
+                return 0
+            rows = conn.execute(
+                "SELECT url FROM bikes WHERE last_seen < ? AND last_seen >= ? ORDER BY rowid",
+                (started_at, previous),
+            ).fetchall()
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('current_since', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (started_at,),
+            )
+            for stale in rows:
+                self._record_change(conn, "bike", stale["url"], {"op": "removed", "url": stale["url"]})
+            if rows:
+                self._bump_version(conn, "bikes")
+                self._prune_changes(conn)
+        return len(rows)
+
+    # --- Wyniki analizy AI ---
+
+    def _ensure_enrichment_fingerprint(self) -> None:
+        """Dodaje kolumnę fingerprint do tabeli enrichments bazy utworzonej przed jej dodaniem."""
+        columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(enrichments)")}
+        if "fingerprint" not in columns:
+            with self.transaction() as conn:
+                conn.execute("ALTER TABLE enrichments ADD COLUMN fingerprint TEXT")
+
+    def save_enrichments(self, enrichments: Iterable[Tuple[Any, ...]], record_changes: bool = True) -> int:
+        """Zapisuje wyniki analizy AI w jednej transakcji.
+
+        Elementy to krotki (url, ai_analysis) albo (url, ai_analysis, fingerprint);
+        bez fingerprintu wynik zostanie przeanalizowany ponownie przy analizie przyrostowej.
+        """
+        now = datetime.now().isoformat()
+        saved = 0
+        with self.transaction() as conn:
+            for item in enrichments:
+                url, ai_analysis = item[0], item[1]
+                fingerprint = item[2] if len(item) > 2 else None
+                conn.execute(
+                    "INSERT INTO enrichments (url, ai_analysis, updated_at, fingerprint) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET ai_analysis = excluded.ai_analysis, "
+                    "updated_at = excluded.updated_at, fingerprint = excluded.fingerprint",
+                    (url, orjson.dumps(ai_analysis).decode(), now, fingerprint),
+                )
+                if record_changes:
+                    self._record_change(conn, "enrichment", url, {"url": url, "ai_analysis": ai_analysis})
+                saved += 1
+            if saved:
+                self._bump_version(conn, "enrichments")
+                self._prune_changes(conn)
+        return saved
+
+    def get_enrichment(self, url: str) -> Optional[Dict[str, Any]]:
+        """Zwraca wynik analizy AI dla ogłoszenia."""
+        row = self.connection.execute(
+            "SELECT ai_analysis FROM enrichments WHERE url = ?", (url,)
+        ).fetchone()
+        return orjson.loads(row["ai_analysis"]) if row else None
+
+    def enrichment_fingerprints(self) -> Dict[str, str]:
+        """Zwraca fingerprinty zapisanych wyników analizy (url -> fingerprint), bez nieudanych analiz."""
+        rows = self.connection.execute(
+            "SELECT url, fingerprint FROM enrichments WHERE fingerprint IS NOT NULL"
+        ).fetchall()
+        return {row["url"]: row["fingerprint"] for row in rows}
+
+    def iter_enriched_bikes(self, include_stale: bool = False) -> Iterator[Dict[str, Any]]:
+        """Iteruje po aktualnych rowerach, które mają wynik analizy AI (złączenie po URL)."""
+        columns = ", ".join(f"b.{column}" for column in BIKE_COLUMNS)
+        conditions, params = self._current_filter(include_stale, table="b")
+        query = (
+            f"SELECT {columns}, b.parameters, e.ai_analysis FROM bikes b "
+            "JOIN enrichments e ON e.url = b.url"
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY b.rowid"
+        for row in self._iter_query(query, params):
+            bike = self._bike_from_row(row)
+            bike["ai_analysis"] = orjson.loads(row["ai_analysis"])
+            yield bike
+
+    # --- Dziennik zmian ---
+
+    def _record_change(self, conn: sqlite3.Connection, kind: str, url: str, payload: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT INTO changes (kind, url, payload, created_at) VALUES (?, ?, ?, ?)",
+            (kind, url, orjson.dumps(payload).decode(), datetime.now().isoformat()),
+        )
+
+    def _prune_changes(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (CHANGES_RETENTION,)
+        )
+
+    def latest_change_seq(self) -> int:
+        """Numer ostatniej zapisanej zmiany (0, jeśli dziennik jest pusty)."""
+        row = self.connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row["seq"] if row else 0
+
+    def oldest_change_seq(self) -> int:
+        """Numer najstarszej zmiany nadal trzymanej w dzienniku (0, jeśli dziennik jest pusty)."""
+        return self.connection.execute("SELECT COALESCE(MIN(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """Zwraca zmiany zapisane po zmianie o numerze `seq` (najstarsze najpierw)."""
+        rows = self.connection.execute(
+            "SELECT seq, kind, url, payload, created_at FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit),
+        ).fetchall()
+        return [
+            {"seq": row["seq"], "kind": row["kind"], "url": row["url"],
+             "data": orjson.loads(row["payload"]), "created_at": row["created_at"]}
+            for row in rows
+        ]
+
+    # --- Statystyki ---
+
+    def save_statistics(self, stats: Dict[str, Any]) -> None:
+        """Zapisuje podstawowe statystyki wygenerowane przez scraper."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO statistics (id, data, updated_at) VALUES (1, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (json.dumps(stats, ensure_ascii=False, default=str), datetime.now().isoformat()),
+            )
+            self._bump_version(conn, "statistics")
+
+    def load_statistics(self) -> Dict[str, Any]:
+        """Zwraca zapisane podstawowe statystyki (pusty słownik, jeśli ich brak)."""
+        row = self.connection.execute("SELECT data FROM statistics WHERE id = 1").fetchone()
+        return json.loads(row["data"]) if row else {}
+
+    # --- Import starych plików ---
+
+    def import_json_files(self, bikes_file: str, enriched_file: Optional[str] = None,
+                          stats_file: Optional[str] = None) -> bool:
+        """Jednorazowo importuje dane z plików JSON do pustej bazy.
+
+        Returns:
+            True, jeśli import został wykonany
+        """
+        if self.count_bikes(include_stale=True) > 0 or not os.path.exists(bikes_file):
+            return False
+
+        self.upsert_bikes(iter_json_array(bikes_file), record_changes=False)
+
+        if enriched_file and os.path.exists(enriched_file):
+            self.save_enrichments(
+                ((bike["url"], bike["ai_analysis"])
+                 for bike in iter_json_array(enriched_file)
+                 if bike.get("url") and bike.get("ai_analysis") is not None),
+                record_changes=False,
+            )
+
+        if stats_file and os.path.exists(stats_file):
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                self.save_statistics(json.load(f))
+
+        return True